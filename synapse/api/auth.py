@@ -70,7 +70,7 @@ class Auth(object):
         self.store = hs.get_datastore()
         self.state = hs.get_state_handler()
 
-        self.token_cache = LruCache(CACHE_SIZE_FACTOR * 10000)
+        self.token_cache = LruCache(CACHE_SIZE_FACTOR * 10000, name="token_cache")
         register_cache("cache", "token_cache", self.token_cache)
 
         self._account_validity = hs.config.account_validity
@@ -45,6 +45,9 @@ from synapse.replication.slave.storage.receipts import SlavedReceiptsStore
 from synapse.replication.slave.storage.registration import SlavedRegistrationStore
 from synapse.replication.slave.storage.room import RoomStore
 from synapse.replication.slave.storage.transactions import SlavedTransactionStore
+from synapse.replication.slave.storage.voltage_control import (
+    SlavedVoltageControlStore,
+)
 from synapse.replication.tcp.client import ReplicationClientHandler
 from synapse.rest.client.v1.login import LoginRestServlet
 from synapse.rest.client.v1.push_rule import PushRuleRestServlet
@@ -59,7 +62,13 @@ from synapse.rest.client.v1.room import (
 from synapse.rest.client.v1.voip import VoipRestServlet
 from synapse.rest.client.v2_alpha.account import ThreepidRestServlet
 from synapse.rest.client.v2_alpha.keys import KeyChangesServlet, KeyQueryServlet
-from synapse.rest.client.v2_alpha.register import RegisterRestServlet, UserUpdateTablesServlet
+from synapse.rest.client.v2_alpha.register import RegisterRestServlet
+from synapse.rest.client.v2_alpha.tables import FilterTableServlet
+from synapse.rest.client.v2_alpha.voltage_control import (
+    VoltageControlSolicitationHistoryServlet,
+    VoltageControlSolicitationListServlet,
+    VoltageControlSolicitationSummaryServlet,
+)
 from synapse.rest.client.versions import VersionsRestServlet
 from synapse.server import HomeServer
 from synapse.storage.engines import create_engine
@@ -86,6 +95,7 @@ class ClientReaderSlavedStore(
     SlavedTransactionStore,
     SlavedProfileStore,
     SlavedClientIpStore,
+    SlavedVoltageControlStore,
     BaseSlavedStore,
 ):
     pass
@@ -113,13 +123,16 @@ class ClientReaderServer(HomeServer):
                     RoomEventContextServlet(self).register(resource)
                     RoomMessageListRestServlet(self).register(resource)
                     RegisterRestServlet(self).register(resource)
-                    UserUpdateTablesServlet(self).register(resource)
                     LoginRestServlet(self).register(resource)
                     ThreepidRestServlet(self).register(resource)
                     KeyQueryServlet(self).register(resource)
                     KeyChangesServlet(self).register(resource)
                     VoipRestServlet(self).register(resource)
                     PushRuleRestServlet(self).register(resource)
+                    FilterTableServlet(self).register(resource)
+                    VoltageControlSolicitationListServlet(self).register(resource)
+                    VoltageControlSolicitationHistoryServlet(self).register(resource)
+                    VoltageControlSolicitationSummaryServlet(self).register(resource)
                     VersionsRestServlet().register(resource)
 
                     resources.update({"/_matrix/client": resource})
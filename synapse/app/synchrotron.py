@@ -43,16 +43,23 @@ from synapse.replication.slave.storage.events import SlavedEventStore
 from synapse.replication.slave.storage.filtering import SlavedFilteringStore
 from synapse.replication.slave.storage.groups import SlavedGroupServerStore
 from synapse.replication.slave.storage.presence import SlavedPresenceStore
+from synapse.replication.slave.storage.profile import SlavedProfileStore
 from synapse.replication.slave.storage.push_rule import SlavedPushRuleStore
 from synapse.replication.slave.storage.receipts import SlavedReceiptsStore
 from synapse.replication.slave.storage.registration import SlavedRegistrationStore
 from synapse.replication.slave.storage.room import RoomStore
+from synapse.replication.slave.storage.voltage_control import (
+    SlavedVoltageControlStore,
+)
 from synapse.replication.tcp.client import ReplicationClientHandler
 from synapse.replication.tcp.streams.events import EventsStreamEventRow
 from synapse.rest.client.v1 import events
 from synapse.rest.client.v1.initial_sync import InitialSyncRestServlet
 from synapse.rest.client.v1.room import RoomInitialSyncRestServlet
 from synapse.rest.client.v2_alpha import sync
+from synapse.rest.client.v2_alpha.voltage_control import (
+    VoltageControlSolicitationEventsServlet,
+)
 from synapse.server import HomeServer
 from synapse.storage.engines import create_engine
 from synapse.storage.presence import UserPresenceState
@@ -77,6 +84,8 @@ class SynchrotronSlavedStore(
     SlavedPushRuleStore,
     SlavedEventStore,
     SlavedClientIpStore,
+    SlavedProfileStore,
+    SlavedVoltageControlStore,
     RoomStore,
     BaseSlavedStore,
 ):
@@ -287,6 +296,7 @@ class SynchrotronServer(HomeServer):
                     events.register_servlets(self, resource)
                     InitialSyncRestServlet(self).register(resource)
                     RoomInitialSyncRestServlet(self).register(resource)
+                    VoltageControlSolicitationEventsServlet(self).register(resource)
                     resources.update(
                         {
                             "/_matrix/client/r0": resource,
@@ -358,6 +368,7 @@ class SyncReplicationHandler(ReplicationClientHandler):
         # NB this is a SynchrotronPresence, not a normal PresenceHandler
         self.presence_handler = hs.get_presence_handler()
         self.notifier = hs.get_notifier()
+        self.voltage_control_handler = hs.get_voltage_control_handler()
 
     @defer.inlineCallbacks
     def on_rdata(self, stream_name, token, rows):
@@ -418,6 +429,13 @@ class SyncReplicationHandler(ReplicationClientHandler):
                 self.notifier.on_new_event("device_list_key", token, rooms=all_room_ids)
             elif stream_name == "presence":
                 yield self.presence_handler.process_replication_rows(token, rows)
+            elif stream_name == "solicitation":
+                users = yield self.voltage_control_handler.get_users_to_notify(
+                    [row.substation_code for row in rows], None
+                )
+                users = set(users)
+                users.update(row.user_id for row in rows if row.user_id)
+                self.notifier.on_new_event("solicitations_key", token, users=users)
             elif stream_name == "receipts":
                 self.notifier.on_new_event(
                     "groups_key", token, users=[row.user_id for row in rows]
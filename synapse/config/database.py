@@ -13,14 +13,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+from collections import namedtuple
 
-from ._base import Config
+from ._base import Config, ConfigError
+
+# How long the entries of a cache are kept, in milliseconds: `ttl` since they
+# were set, and `idle_time` since they were last read. Either may be None.
+CacheExpiry = namedtuple("CacheExpiry", ["ttl", "idle_time"])
 
 
 class DatabaseConfig(Config):
     def read_config(self, config, **kwargs):
         self.event_cache_size = self.parse_size(config.get("event_cache_size", "10K"))
 
+        self.cache_expiry = {}
+        expiry_config = config.get("cache_expiry") or {}
+        self.cache_sweep_interval = self.parse_duration(
+            expiry_config.get("sweep_interval", "30s")
+        )
+        for cache_name, cache_config in (expiry_config.get("caches") or {}).items():
+            if not isinstance(cache_config, dict):
+                raise ConfigError(
+                    "cache_expiry.caches.%s must be a dictionary" % (cache_name,)
+                )
+            ttl = cache_config.get("ttl")
+            idle_time = cache_config.get("idle_time")
+            self.cache_expiry[cache_name] = CacheExpiry(
+                ttl=self.parse_duration(ttl) if ttl else None,
+                idle_time=self.parse_duration(idle_time) if idle_time else None,
+            )
+
+        shared_event_cache = config.get("shared_event_cache") or {}
+        self.shared_event_cache_path = shared_event_cache.get("path")
+        self.shared_event_cache_max_entries = self.parse_size(
+            shared_event_cache.get("max_entries", "1M")
+        )
+        self.shared_event_cache_mmap_size = self.parse_size(
+            shared_event_cache.get("mmap_size", "512M")
+        )
+
         self.database_config = config.get("database")
 
         if self.database_config is None:
@@ -55,6 +86,38 @@ class DatabaseConfig(Config):
         # Number of events to cache in memory.
         #
         #event_cache_size: 10K
+
+        # Drop the entries of some caches once they are older than 'ttl', or
+        # haven't been read for 'idle_time', so that the caches of long-running
+        # processes don't keep the rooms and users which are no longer in use.
+        # The caches are named as in the synapse_util_caches_cache:size metric.
+        # The expired entries are swept in the background every
+        # 'sweep_interval'.
+        #
+        #cache_expiry:
+        #  sweep_interval: 30s
+        #  caches:
+        #    "*getEvent*":
+        #      idle_time: 1h
+        #    get_users_in_room:
+        #      ttl: 1d
+        #      idle_time: 2h
+
+        # Keep the events which have been read from the database in a file
+        # shared by the processes on this host, so that the workers don't each
+        # fetch the same events from the database. The file is memory-mapped,
+        # and is best put on a tmpfs such as /dev/shm. Each host gets its own
+        # file: the workers drop the redacted and purged events from it as they
+        # learn of them, and a process which starts replays the changes it
+        # missed (or, on SQLite, empties the file).
+        #
+        # 'max_entries' is the number of events kept in the file, and
+        # 'mmap_size' how much of the file is mapped into each process.
+        #
+        #shared_event_cache:
+        #  path: /dev/shm/synapse_event_cache.db
+        #  max_entries: 1M
+        #  mmap_size: 512M
         """
             % locals()
         )
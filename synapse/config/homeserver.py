@@ -43,6 +43,7 @@ from .tls import TlsConfig
 from .tracer import TracerConfig
 from .user_directory import UserDirectoryConfig
 from .voip import VoipConfig
+from .voltage_control import VoltageControlConfig
 from .workers import WorkerConfig
 
 
@@ -77,5 +78,6 @@ class HomeServerConfig(
     RoomDirectoryConfig,
     ThirdPartyRulesConfig,
     TracerConfig,
+    VoltageControlConfig,
 ):
     pass
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ._base import Config
+
+
+class VoltageControlConfig(Config):
+    """Voltage Control Configuration
+    Configuration for the voltage control solicitations.
+    """
+
+    def read_config(self, config, **kwargs):
+        self.solicitation_archive_enabled = False
+        self.solicitation_archive_retention = self.parse_duration("30d")
+        archive_config = config.get("solicitation_archive", None)
+        if archive_config:
+            self.solicitation_archive_enabled = archive_config.get(
+                "enabled", self.solicitation_archive_enabled
+            )
+            self.solicitation_archive_retention = self.parse_duration(
+                archive_config.get("retention_period", "30d")
+            )
+
+    def generate_config_section(self, config_dir_path, server_name, **kwargs):
+        return """\
+        ## Voltage Control ##
+
+        # Move the solicitations which have been EXECUTED, CANCELED or BLOCKED
+        # for longer than 'retention_period' out of the live tables, into the
+        # archive. Archived solicitations are no longer part of the listings
+        # nor of /sync, and are read from the history API instead.
+        #
+        # 'retention_period' can be defined in a human readable short form --
+        # e.g. "1d", "1y".
+        #
+        #solicitation_archive:
+        #   enabled: true
+        #   retention_period: 30d
+        """
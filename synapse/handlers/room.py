@@ -470,7 +470,7 @@ class RoomCreationHandler(BaseHandler):
             # we returned the new room to the client at this point.
             logger.error("Unable to send updated alias events in new room: %s", e)
 
-    def _get_room_default_config(self, name, users):
+    def _get_room_default_config(self, name):
         """
         Default configuration to create a room.
          
@@ -485,13 +485,21 @@ class RoomCreationHandler(BaseHandler):
                     {'content': {'guest_access': 'can_join'},
                      'type': 'm.room.guest_access',
                      'state_key': ''}
-                ],
-                'invite': users}
+                ]}
 
     @defer.inlineCallbacks
     def create_room_for_solicitation(self, requester, name, users):
-        info = yield self.create_room(requester, self._get_room_default_config(name, users))
-        return info['room_id']
+        info = yield self.create_room(
+            requester, self._get_room_default_config(name), ratelimit=False
+        )
+        room_id = info['room_id']
+
+        # The users are invited and joined in one batch, rather than through
+        # an update_membership call per user.
+        room_member_handler = self.hs.get_room_member_handler()
+        yield room_member_handler.join_local_users_to_room(requester, room_id, users)
+
+        return room_id
 
     @defer.inlineCallbacks
     def create_room(self, requester, config, ratelimit=True, creator_join_profile=None):
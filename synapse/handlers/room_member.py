@@ -26,9 +26,12 @@ from unpaddedbase64 import decode_base64
 
 from twisted.internet import defer
 
-from synapse import types
+from synapse import event_auth, types
 from synapse.api.constants import EventTypes, Membership
 from synapse.api.errors import AuthError, Codes, HttpResponseException, SynapseError
+from synapse.api.room_versions import KNOWN_ROOM_VERSIONS, EventFormatVersions
+from synapse.events.builder import create_local_event_from_event_dict
+from synapse.events.snapshot import EventContext
 from synapse.types import RoomID, UserID
 from synapse.util.async_helpers import Linearizer
 from synapse.util.distributor import user_joined_room, user_left_room
@@ -944,6 +947,183 @@ class RoomMemberMasterHandler(RoomMemberHandler):
         self.distributor.declare("user_joined_room")
         self.distributor.declare("user_left_room")
 
+        self.notifier = hs.get_notifier()
+        self.event_builder_factory = hs.get_event_builder_factory()
+
+    @defer.inlineCallbacks
+    def join_local_users_to_room(self, requester, room_id, user_ids):
+        """Invite and join local users to a room which the server has just
+        created on behalf of `requester`.
+
+        Unlike calling update_membership for each user, the state of the room
+        is only resolved once, and all the membership events are persisted as
+        a single batch: each event follows the previous one, so the state
+        after each of them is known without asking the state handler.
+
+        This skips the rate limiting, spam checks, third party rules and push
+        rule evaluation of update_membership, and the invites carry no
+        invite_room_state, so it must only be used for rooms created by the
+        server itself.
+
+        Args:
+            requester (Requester): the creator of the room, who sends the
+                invites.
+            room_id (str)
+            user_ids (iterable[str]): the local users to join to the room.
+
+        Returns:
+            Deferred
+        """
+        inviter = requester.user.to_string()
+        user_ids = [user_id for user_id in user_ids if user_id != inviter]
+
+        room_version = yield self.store.get_room_version(room_id)
+        format_version = KNOWN_ROOM_VERSIONS[room_version].event_format
+        if format_version == EventFormatVersions.V1:
+            # V1 events refer to their prev and auth events by hash, which we
+            # only know for persisted events, so fall back to one at a time.
+            for user_id in user_ids:
+                target = UserID.from_string(user_id)
+                for membership in (Membership.INVITE, Membership.JOIN):
+                    yield self.update_membership(
+                        requester, target, room_id, membership, ratelimit=False
+                    )
+            return
+
+        latest = yield self.store.get_prev_events_for_room(room_id)
+        prev_event_ids = [event_id for event_id, _, _ in latest]
+        depth = max(depth for _, _, depth in latest)
+
+        entry = yield self.state_handler.resolve_state_groups_for_events(
+            room_id, prev_event_ids
+        )
+        state_ids = dict(entry.state)
+
+        # The state events the membership events can be authed against.
+        auth_keys = [
+            (EventTypes.Create, ""),
+            (EventTypes.PowerLevels, ""),
+            (EventTypes.JoinRules, ""),
+            (EventTypes.Member, inviter),
+        ] + [(EventTypes.Member, user_id) for user_id in user_ids]
+        auth_state = yield self.store.get_events(
+            [state_ids[key] for key in auth_keys if key in state_ids]
+        )
+        auth_state = {(e.type, e.state_key): e for e in auth_state.values()}
+
+        profiles = yield self.store.get_profiles_for_localparts(
+            [UserID.from_string(user_id).localpart for user_id in user_ids]
+        )
+
+        events = []
+        for user_id in user_ids:
+            key = (EventTypes.Member, user_id)
+            member_event = auth_state.get(key)
+            membership = member_event.membership if member_event else None
+            if membership == Membership.JOIN:
+                continue
+
+            memberships = []
+            if membership != Membership.INVITE:
+                memberships.append((inviter, {"membership": Membership.INVITE}))
+
+            content = {"membership": Membership.JOIN}
+            profile = profiles.get(UserID.from_string(user_id).localpart)
+            if profile:
+                content["displayname"] = profile["displayname"]
+                content["avatar_url"] = profile["avatar_url"]
+            memberships.append((user_id, content))
+
+            for sender, content in memberships:
+                event_dict = {
+                    "type": EventTypes.Member,
+                    "room_id": room_id,
+                    "sender": sender,
+                    "state_key": user_id,
+                    "content": content,
+                }
+                builder = self.event_builder_factory.new(room_version, event_dict)
+                auth_event_ids = yield self.auth.compute_auth_events(
+                    builder, state_ids
+                )
+
+                depth += 1
+                event_dict.update(
+                    {
+                        "auth_events": auth_event_ids,
+                        "prev_events": prev_event_ids,
+                        "depth": depth,
+                        "prev_state": [],
+                    }
+                )
+                if key in state_ids:
+                    event_dict["unsigned"] = {"replaces_state": state_ids[key]}
+
+                event = create_local_event_from_event_dict(
+                    clock=self.clock,
+                    hostname=self.hs.hostname,
+                    signing_key=self.config.signing_key[0],
+                    format_version=format_version,
+                    event_dict=event_dict,
+                )
+                event_auth.check(
+                    room_version,
+                    event,
+                    auth_events={
+                        k: e
+                        for k, e in auth_state.items()
+                        if e.event_id in auth_event_ids
+                    },
+                    do_sig_check=False,
+                )
+
+                prev_state_ids = state_ids
+                state_ids = dict(state_ids)
+                state_ids[key] = event.event_id
+                auth_state[key] = event
+                prev_event_ids = [event.event_id]
+
+                events.append((event, prev_state_ids, state_ids))
+
+        if not events:
+            return
+
+        state_groups = yield self.store.store_state_groups_for_event_chain(
+            room_id,
+            entry.state_group,
+            [
+                (event.event_id, {(event.type, event.state_key): event.event_id}, ids)
+                for event, _, ids in events
+            ],
+        )
+
+        events_and_contexts = [
+            (
+                event,
+                EventContext.with_state(
+                    state_group=state_group,
+                    current_state_ids=current_state_ids,
+                    prev_state_ids=prev_state_ids,
+                ),
+            )
+            for (event, prev_state_ids, current_state_ids), state_group in zip(
+                events, state_groups
+            )
+        ]
+
+        max_stream_id = yield self.store.persist_events(events_and_contexts)
+
+        for event, _ in events_and_contexts:
+            target = UserID.from_string(event.state_key)
+            self.notifier.on_new_room_event(
+                event,
+                event.internal_metadata.stream_ordering,
+                max_stream_id,
+                extra_users=[target],
+            )
+            if event.membership == Membership.JOIN:
+                yield self._user_joined_room(target, room_id)
+
     @defer.inlineCallbacks
     def _is_remote_room_too_complex(self, room_id, remote_room_hosts):
         """
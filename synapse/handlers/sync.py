@@ -704,7 +704,12 @@ class SyncHandler(object):
         cache = self.lazy_loaded_members_cache.get(cache_key)
         if cache is None:
             logger.debug("creating LruCache for %r", cache_key)
-            cache = LruCache(LAZY_LOADED_MEMBERS_CACHE_MAX_SIZE)
+            # These caches are dropped whole by the ExpiringCache, so they
+            # stay out of the memory budget, which would otherwise keep
+            # their entries alive.
+            cache = LruCache(
+                LAZY_LOADED_MEMBERS_CACHE_MAX_SIZE, use_memory_budget=False
+            )
             self.lazy_loaded_members_cache[cache_key] = cache
         else:
             logger.debug("found LruCache for %r", cache_key)
@@ -1079,20 +1084,25 @@ class SyncHandler(object):
     @defer.inlineCallbacks
     def _generate_sync_entry_for_solicitations(self, sync_result_builder):
         user_id = sync_result_builder.sync_config.user.to_string()
+        since_token = sync_result_builder.since_token
+        now_token = sync_result_builder.now_token
 
-
-        # TODO Aplicar lazy loading no futuro.
-        # Por enquanto, os parâmetros não estão sendo usados.
-
-        '''if since_token and since_token.solicitations_key:
-            results = yield self.store.get_all_solicitation_updates(
-                user_id, since_token.solicitations_key, now_token.solicitations_key
+        if (
+            since_token
+            and since_token.solicitations_key
+            and not sync_result_builder.full_state
+        ):
+            # Incremental sync: only the solicitations that changed since the
+            # last sync, the client already holds the rest.
+            results = yield self.voltage_control_handler.get_solicitation_changes(
+                since_token.solicitations_key, now_token.solicitations_key
+            )
+        else:
+            user_company_code = yield self.store.get_company_code(user_id)
+            is_order_by_cteep = Companies.CTEEP == user_company_code
+            results, _ = yield self.voltage_control_handler.get_solicitations(
+                is_order_by_cteep
             )
-        '''
-
-        user_company_code = yield self.store.get_company_code(user_id)
-        is_order_by_cteep = Companies.CTEEP == user_company_code
-        results = yield self.voltage_control_handler.get_solicitations(is_order_by_cteep)
 
         sync_result_builder.solicitations = SolicitationsSyncResult(
             events=results
@@ -21,24 +21,41 @@ class TableHandler(BaseHandler):
         self.hs = hs
         self.store = hs.get_datastore()
 
-    @defer.inlineCallbacks
     def associate_tables_to_user(self, user_id, tables):
+        return self.associate_tables_to_users({user_id: tables})
+
+    @defer.inlineCallbacks
+    def associate_tables_to_users(self, tables_by_user, replace=False):
+        """Associate tables to many users at once, e.g. for a new shift of
+        operators. Either all the associations are made, or none is.
 
-        users = yield self.store.get_users_by_id_case_insensitive(user_id)
-        if not users:
+        Args:
+            tables_by_user (dict[str, list[str]]): map from user id to the
+                codes of the tables to associate to the user.
+            replace (bool): whether the given tables replace those the users
+                already have, rather than being added to them.
+
+        Raises:
+            SynapseError if a user or a table does not exist
+        """
+        # User ids have always been matched case insensitively here.
+        existing_user_ids = yield self.store.get_existing_user_ids_case_insensitive(
+            tables_by_user
+        )
+        if any(user_id.lower() not in existing_user_ids for user_id in tables_by_user):
             raise SynapseError(
                 400, "User not found.", Codes.BAD_JSON
             )
 
-        for code in tables:
-            result = yield self.store.get_table_by_code(code)
-            if not result:
-                raise SynapseError(
-                    400, "One or more invalid table!", Codes.BAD_JSON
-                )
+        catalogue = yield self.store.get_table_catalogue()
+        for tables in tables_by_user.values():
+            for code in tables:
+                if code not in catalogue:
+                    raise SynapseError(
+                        400, "One or more invalid table!", Codes.BAD_JSON
+                    )
 
-        for code in tables:
-            self.store.associate_table_to_user(user_id, code)
+        yield self.store.associate_tables_to_users(tables_by_user, replace=replace)
 
     @defer.inlineCallbacks
     def filter_tables_by_company_code(self, company_code):
@@ -15,12 +15,12 @@
 # limitations under the License.
 
 import logging
-from synapse.api.constants import EventTypes
 
 from ._base import BaseHandler
 from twisted.internet import defer
 
 from synapse.api.constants import (
+    EventTypes,
     SolicitationStatus,
     SolicitationActions,
     EquipmentTypes,
@@ -34,15 +34,30 @@ from synapse.api.errors import (
     SynapseError,
 )
 
+from synapse.logging.context import make_deferred_yieldable, run_in_background
 from synapse.types import UserID
+from synapse.util import unwrapFirstError
+from synapse.util.caches.response_cache import ResponseCache
+from synapse.util.metrics import Measure, measure_func
+from synapse.util.wheel_timer import WheelTimer
 
+import base64
 import calendar
 import time
 
+from canonicaljson import json
+
+from synapse.logging.opentracing import trace
+from synapse.metrics import LaterGauge
+from synapse.notifier import EventStreamResult
 from synapse.metrics.background_process_metrics import run_as_background_process
+from synapse.storage.voltage_control import FIVE_MINUTES_IN_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# How long to wait before trying again to mark solicitations late, if it failed.
+LATE_SOLICITATION_RETRY_MS = 1000
+
 
 class VoltageControlHandler(BaseHandler):
     __STATE_MACHINE_ONS = {
@@ -93,56 +108,70 @@ class VoltageControlHandler(BaseHandler):
         self.profiler_handler = hs.get_profile_handler()
         self.store = hs.get_datastore()
         self.notifier = hs.get_notifier()
+        self.clock = hs.get_clock()
+
+        # The ACCEPTED solicitations, by the time at which they become LATE.
+        # Only used on the process which runs start_late_solicitation_timer.
+        self._late_timer = WheelTimer(bucket_size=1000)
+        # The position in the solicitations stream up to which the accepted
+        # solicitations have been added to the timer.
+        self._late_timer_stream_pos = None
+        self._late_timer_updating = False
+
+        self._solicitations_response_cache = ResponseCache(
+            hs, "solicitations", timeout_ms=1000
+        )
 
+        # The number of solicitations by substation and status, as last read
+        # for the metrics.
+        self._solicitation_counts = {}
+        if not hs.config.worker_app:
+            LaterGauge(
+                "synapse_voltage_control_solicitations",
+                "Number of solicitations which have not been archived",
+                ["substation", "status"],
+                lambda: {
+                    (substation_code, status): count
+                    for substation_code, counts in self._solicitation_counts.items()
+                    for status, count in counts.items()
+                },
+            )
+            self.clock.looping_call(self._start_update_solicitation_counts, 60 * 1000)
+
+    @trace
     @defer.inlineCallbacks
     def create_solicitations(self, requester, solicitations, creation_total_time):
         check_param_create_total_time(creation_total_time)
-        group_id = yield self.store.create_solicitation_group(creation_total_time)
 
         user_id = requester.user.to_string()
-        for solicitation in solicitations:
-            treat_solicitation_data(solicitation)
-            yield self.check_substation(solicitation['company_code'], solicitation['substation'])
-            yield check_solicitation_params(solicitation)
-
-        # Enquanto não tem as permissões, recupera todos os usuários.
-        users = yield self.store.get_users()
-
-        for solicitation in solicitations:
-            solicitation_created = yield self._create_solicitation(solicitation, user_id, group_id, None)
-
-            token = yield self.store.create_solicitation_updated_event(EventTypes.CreateSolicitation,
-                                                                       solicitation_created['id'],
-                                                                       user_id, solicitation)
-
-            self.notifier.on_new_event("solicitations_key", token, [user["name"] for user in users])
-
-            #self.create_room_and_join_users(requester, users, solicitation_created['id'],
-            #                                solicitation_created['substation_code'],
-            #                                solicitation_created['equipment_code'])
-
-    @defer.inlineCallbacks
-    def _create_solicitation(self, solicitation, user_id, group_id, room_id):
-        ts = calendar.timegm(time.gmtime())
-
-        solicitation_id = yield self.store.create_solicitation(
-            action=solicitation["action"],
-            equipment=solicitation["equipment"],
-            substation=solicitation["substation"],
-            staggered=solicitation["staggered"],
-            amount=solicitation["amount"],
-            voltage=solicitation["voltage"],
-            at=solicitation["at"],
-            bt=solicitation["bt"],
-            user_id=user_id,
-            ts=ts,
-            status=SolicitationStatus.NEW,
-            group_id=group_id,
-            room_id=room_id)
+        with Measure(self.clock, "create_solicitations_validate"):
+            substations = yield self.store.get_substation_catalogue()
+            for solicitation in solicitations:
+                treat_solicitation_data(solicitation)
+                check_substation(substations, solicitation['company_code'], solicitation['substation'])
+                check_solicitation_params(solicitation)
+
+        # The whole group is created in a single transaction, so that a batch
+        # is either fully visible to the other users or not at all.
+        with Measure(self.clock, "create_solicitations_persist"):
+            ts = int(self.clock.time())
+            ids, token = yield self.store.create_solicitation_group_with_solicitations(
+                creation_total_time, solicitations, user_id, ts, SolicitationStatus.NEW
+            )
 
-        solicitation = yield self.get_solicitation_by_id(solicitation_id)
+        users = yield self.get_users_to_notify(
+            [solicitation["substation"] for solicitation in solicitations], user_id
+        )
+        self.notifier.on_new_event("solicitations_key", token, users)
 
-        return solicitation
+        with Measure(self.clock, "create_solicitations_rooms"):
+            for solicitation_id, solicitation in zip(ids, solicitations):
+                room_users = yield self.get_users_to_notify(
+                    [solicitation["substation"]], user_id
+                )
+                self.create_room_and_join_users(requester, room_users, solicitation_id,
+                                                solicitation['substation'],
+                                                solicitation['equipment'])
 
     @defer.inlineCallbacks
     def create_room_for_solicitation(self, requester, users, substation, equipment):
@@ -156,105 +185,508 @@ class VoltageControlHandler(BaseHandler):
                 return event["time_stamp"]
         return 0
 
+    @measure_func("solicitation_creator_profiles")
     @defer.inlineCallbacks
     def add_creators_to_solicitations(self, solicitations):
         creation_index = -1
+        creator_ids = set()
         for solicitation in solicitations:
             creator_id = solicitation['events'][creation_index]['user_id']
             if creator_id:
-                creator_profile = yield self.profiler_handler.get_profile(creator_id)
-                solicitation['created_by'] = creator_profile
+                creator_ids.add(creator_id)
+
+        profiles = yield self._get_profiles(creator_ids)
+
+        for solicitation in solicitations:
+            creator_id = solicitation['events'][creation_index]['user_id']
+            if creator_id in profiles:
+                solicitation['created_by'] = profiles[creator_id]
+
+    @defer.inlineCallbacks
+    def _get_profiles(self, user_ids):
+        """Get the profiles of the given users, with a single query for all the
+        local ones.
+
+        Returns:
+            Deferred[dict[str, dict]]: user id to profile, for the users which
+            have one.
+        """
+        local_users = {}
+        remote_user_ids = []
+        for user_id in user_ids:
+            if self.hs.is_mine_id(user_id):
+                local_users[UserID.from_string(user_id).localpart] = user_id
+            else:
+                remote_user_ids.append(user_id)
+
+        local_profiles = yield self.store.get_profiles_for_localparts(list(local_users))
+        profiles = {
+            local_users[localpart]: profile
+            for localpart, profile in local_profiles.items()
+            if profile is not None
+        }
+
+        if remote_user_ids:
+            remote_profiles = yield make_deferred_yieldable(defer.gatherResults(
+                [
+                    run_in_background(self.profiler_handler.get_profile, user_id)
+                    for user_id in remote_user_ids
+                ],
+                consumeErrors=True,
+            ).addErrback(unwrapFirstError))
+            profiles.update(zip(remote_user_ids, remote_profiles))
+
+        return profiles
+
+    @trace
+    def get_solicitations(self, is_order_by_cteep, substation_codes=None, exclude_expired=False,
+                          sort=None, from_token=None, from_id=None, limit=1000):
+        """Get a page of solicitations.
+
+        Identical requests made while the solicitations stream is at the same
+        position share the same computation, and its result for a second.
+
+        Args:
+            is_order_by_cteep (bool): whether to use the CTEEP status ordering
+                rather than the ONS one.
+            substation_codes (set[str]|None): if given, only return the
+                solicitations of these substations.
+            exclude_expired (bool): whether to skip the solicitations which
+                have not been accepted in time.
+            sort (list[str]|None): the SolicitationSortParams to order by.
+            from_token (str|None): the `next_batch` token of the previous page.
+            from_id (int|None): only return solicitations with an id of at
+                least this.
+            limit (int)
+
+        Returns:
+            Deferred[tuple[list[dict], str|None]]: the solicitations, and the
+            token of the next page, if any.
+        """
+        key = (
+            is_order_by_cteep,
+            frozenset(substation_codes) if substation_codes is not None else None,
+            exclude_expired,
+            tuple(sort or ()),
+            from_token,
+            from_id,
+            limit,
+            self.store.get_solicitation_stream_token(),
+        )
+        return self._solicitations_response_cache.wrap(
+            key,
+            self._get_solicitations,
+            is_order_by_cteep,
+            substation_codes,
+            exclude_expired,
+            sort,
+            from_token,
+            from_id,
+            limit,
+        )
+
+    @defer.inlineCallbacks
+    def _get_solicitations(self, is_order_by_cteep, substation_codes, exclude_expired,
+                           sort, from_token, from_id, limit):
+        """Get a page of solicitations. See `get_solicitations`."""
+        from_key = None
+        if from_token is not None:
+            from_key = decode_pagination_token(from_token)
+
+        expired_before_ts = None
+        if exclude_expired:
+            expired_before_ts = int(self.clock.time()) - FIVE_MINUTES_IN_SECONDS
+
+        with Measure(self.clock, "list_solicitations_query"):
+            result, next_key = yield self.store.get_solicitations(
+                is_order_by_cteep=is_order_by_cteep,
+                substation_codes=substation_codes,
+                expired_before_ts=expired_before_ts,
+                sort=sort,
+                from_key=from_key,
+                from_id=from_id,
+                limit=limit
+            )
+        yield self.add_creators_to_solicitations(result)
+
+        next_token = None
+        if next_key is not None:
+            next_token = encode_pagination_token(next_key)
+        return result, next_token
+
+    def _start_update_solicitation_counts(self):
+        return run_as_background_process(
+            "update_solicitation_counts", self._update_solicitation_counts
+        )
+
+    @defer.inlineCallbacks
+    def _update_solicitation_counts(self):
+        self._solicitation_counts = yield self.store.get_solicitation_status_counts()
 
+    @trace
     @defer.inlineCallbacks
-    def get_solicitations(self, is_order_by_cteep, from_id=0, limit=1000):
-        result = yield self.store.get_solicitations(
-            is_order_by_cteep=is_order_by_cteep,
-            from_id=from_id,
-            limit=limit
+    def get_solicitation_summary(self, substation_codes=None):
+        """Count the solicitations which have not been archived, by status and
+        by substation.
+
+        Args:
+            substation_codes (set[str]|None): if given, only count the
+                solicitations of these substations.
+
+        Returns:
+            Deferred[dict]: the `total` number of solicitations, their number
+            `by_status`, and their number by status of each substation in
+            `by_substation`.
+        """
+        counts = yield self.store.get_solicitation_status_counts()
+
+        total = 0
+        by_status = {status: 0 for status in SolicitationStatus.ALL_SOLICITATION_TYPES}
+        by_substation = {}
+        for substation_code, substation_counts in counts.items():
+            if substation_codes is not None and substation_code not in substation_codes:
+                continue
+            by_substation[substation_code] = dict(substation_counts)
+            for status, count in substation_counts.items():
+                by_status[status] = by_status.get(status, 0) + count
+                total += count
+
+        return {"total": total, "by_status": by_status, "by_substation": by_substation}
+
+    @trace
+    @defer.inlineCallbacks
+    def get_solicitation_history(self, substation_codes=None, from_token=None, limit=100):
+        """Get a page of the archived solicitations, most recent first.
+
+        Args:
+            substation_codes (set[str]|None): if given, only return the
+                solicitations of these substations.
+            from_token (str|None): the `next_batch` token of the previous page.
+            limit (int)
+
+        Returns:
+            Deferred[tuple[list[dict], str|None]]: the solicitations, and the
+            token of the next page, if any.
+        """
+        from_id = None
+        if from_token is not None:
+            from_key = decode_pagination_token(from_token)
+            if len(from_key) != 1 or not isinstance(from_key[0], int):
+                raise SynapseError(400, "Invalid pagination token", Codes.INVALID_PARAM)
+            from_id = from_key[0]
+
+        result, next_id = yield self.store.get_archived_solicitations(
+            substation_codes=substation_codes, from_id=from_id, limit=limit
         )
         yield self.add_creators_to_solicitations(result)
+
+        next_token = None
+        if next_id is not None:
+            next_token = encode_pagination_token([next_id])
+        return result, next_token
+
+    @defer.inlineCallbacks
+    def get_substations_to_filter(self, company_code, table_code, substation_codes):
+        """Get the substations matching the filters of a solicitation listing.
+
+        Args:
+            company_code (str|None): only the substations of this company.
+            table_code (str|None): only the substations of this table of
+                `company_code`.
+            substation_codes (list[str]|None): only these substations of
+                `company_code`.
+
+        Returns:
+            Deferred[set[str]|None]: the substation codes, or None if there is
+            no filter.
+
+        Raises:
+            SynapseError if the table or one of the substations does not exist
+        """
+        if company_code is None and table_code is None and not substation_codes:
+            return None
+
+        substations = yield self.store.get_substation_catalogue()
+        result = set(
+            code for code, substation in substations.items()
+            if substation["company_code"] == company_code
+        )
+
+        if table_code is not None:
+            tables = yield self.store.get_table_catalogue()
+            table = tables.get(table_code)
+            if table is None or table["company_code"] != company_code:
+                raise SynapseError(404, "Table not found", Codes.NOT_FOUND)
+            result &= table["substations"]
+
+        if substation_codes:
+            for substation_code in substation_codes:
+                substation = substations.get(substation_code)
+                if substation is None or substation["company_code"] != company_code:
+                    raise SynapseError(404, "Substation %r not found" % substation_code, Codes.NOT_FOUND)
+            result &= set(substation_codes)
+
         return result
 
+    @trace
+    @defer.inlineCallbacks
+    def get_solicitation_changes(self, from_token, to_token):
+        """Get the current state of the solicitations updated between two
+        positions of the solicitations stream.
+
+        Args:
+            from_token (int): exclusive lower bound of the stream
+            to_token (int): inclusive upper bound of the stream
+
+        Returns:
+            Deferred[list[dict]]: the changed solicitations, ordered by their
+            latest update.
+        """
+        with Measure(self.clock, "solicitation_changes_query"):
+            updates = yield self.store.get_all_solicitation_updates(from_token, to_token)
+
+            # Later updates win, so a solicitation is placed by its latest change.
+            latest_update_by_id = {}
+            for update in updates:
+                latest_update_by_id[update["solicitation_id"]] = update["stream_id"]
+            changed_ids = sorted(latest_update_by_id, key=latest_update_by_id.get)
+
+            result = yield self.store.get_solicitations_by_ids(changed_ids)
+        yield self.add_creators_to_solicitations(result)
+        return result
+
+    @trace
+    @defer.inlineCallbacks
+    def wait_for_solicitation_changes(self, user_id, from_key, timeout):
+        """Wait for solicitations to change after a position of the
+        solicitations stream, without computing the rest of a /sync.
+
+        Args:
+            user_id (str): the user waiting, whose notifier stream is woken up.
+            from_key (int|None): the position the client is at. If None, only
+                the current position is returned.
+            timeout (int): how long to wait for changes, in milliseconds.
+
+        Returns:
+            Deferred[tuple[list[dict], int]]: the changed solicitations, as in
+            `get_solicitation_changes`, and the position to ask from next.
+        """
+        current_key = self.store.get_solicitation_stream_token()
+        if from_key is None:
+            return [], current_key
+
+        # The notifier only wakes the users which can see a change up, so we
+        # don't wait if anything has already happened since `from_key`.
+        if from_key < current_key or not timeout:
+            changes = yield self.get_solicitation_changes(from_key, current_key)
+            return changes, current_key
+
+        @defer.inlineCallbacks
+        def check_for_updates(before_token, after_token):
+            # The user's notifier stream may be behind the client, e.g. if this
+            # worker is lagging, in which case the client has already seen the
+            # changes up to `from_key`.
+            before_key = max(from_key, int(before_token.solicitations_key))
+            after_key = int(after_token.solicitations_key)
+            if after_key <= before_key:
+                return EventStreamResult([], (before_token, after_token))
+
+            changes = yield self.get_solicitation_changes(before_key, after_key)
+            return EventStreamResult(changes, (before_token, after_token))
+
+        from_token = yield self.hs.get_event_sources().get_current_token()
+        from_token = from_token.copy_and_replace("solicitations_key", from_key)
+
+        result = yield self.notifier.wait_for_events(
+            user_id, timeout, check_for_updates, from_token=from_token
+        )
+
+        next_key = max(from_key, int(result.tokens[1].solicitations_key))
+        return result.events, next_key
+
     @defer.inlineCallbacks
     def get_solicitation_by_id(self, id):
         solicitation = yield self.store.get_solicitation_by_id(id=id)
         return solicitation
 
+    @trace
     @defer.inlineCallbacks
     def change_solicitation_status(self, new_status, justification, id, user_id):
-        solicitation = yield self.get_solicitation_by_id(id)
+        with Measure(self.clock, "change_solicitation_status_validate"):
+            solicitation = yield self.get_solicitation_by_id(id)
 
-        if not solicitation:
-            raise SynapseError(404, "Solicitation not found.", Codes.NOT_FOUND)
+            if not solicitation:
+                raise SynapseError(404, "Solicitation not found.", Codes.NOT_FOUND)
 
-        if new_status not in SolicitationStatus.ALL_SOLICITATION_TYPES:
-            raise SynapseError(400, "Invalid status.", Codes.INVALID_PARAM)
+            if new_status not in SolicitationStatus.ALL_SOLICITATION_TYPES:
+                raise SynapseError(400, "Invalid status.", Codes.INVALID_PARAM)
 
-        last_event_index = 0
-        first_event_index = -1
-        current_status = solicitation["events"][last_event_index]["status"]
-        creation_ts = solicitation["events"][first_event_index]["time_stamp"]
+            last_event_index = 0
+            first_event_index = -1
+            current_status = solicitation["events"][last_event_index]["status"]
+            creation_ts = solicitation["events"][first_event_index]["time_stamp"]
 
-        user_company_code = yield self.store.get_company_code(user_id)
+            user_company_code = yield self.store.get_company_code(user_id)
 
-        self._validate_status_change(current_status, new_status, user_company_code, creation_ts)
+            self._validate_status_change(current_status, new_status, user_company_code, creation_ts)
 
-        ts = calendar.timegm(time.gmtime())
-        yield self.store.create_solicitation_status_signature(id, user_id, new_status, ts, justification)
+        # The change only goes through if no one else changed the status since
+        # we validated it, otherwise this fails with a 409.
+        with Measure(self.clock, "change_solicitation_status_persist"):
+            ts = int(self.clock.time())
+            token = yield self.store.change_solicitation_status(
+                int(id), current_status, new_status, user_id, ts, justification
+            )
 
-        token = yield self.store.create_solicitation_updated_event(
-            EventTypes.ChangeSolicitationStatus, id, user_id, {"status": new_status}
-        )
+        users = yield self.get_users_to_notify([solicitation["substation_code"]], user_id)
+        self.notifier.on_new_event("solicitations_key", token, users)
+
+    @measure_func("solicitation_notify_fanout")
+    @defer.inlineCallbacks
+    def get_users_to_notify(self, substation_codes, user_id):
+        """Get the users whose sync streams must be woken up by a change to
+        solicitations of the given substations.
+
+        These are the users with a table covering one of the substations, the
+        ONS users, who follow every solicitation, and the user who made the
+        change.
+
+        Args:
+            substation_codes (iterable[str])
+            user_id (str|None): the user who made the change, if any.
+
+        Returns:
+            Deferred[set[str]]: the user ids.
+        """
+        users = set()
+        for substation_code in set(substation_codes):
+            interested = yield self.store.get_users_interested_in_substation(substation_code)
+            users.update(interested)
+
+        ons_users = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        users.update(ons_users)
+
+        if user_id:
+            users.add(user_id)
+
+        return users
+
+    @defer.inlineCallbacks
+    def start_late_solicitation_timer(self):
+        """Start moving ACCEPTED solicitations to LATE once their deadline to
+        be executed has passed.
+
+        This must only be called on a single process, as it keeps the deadlines
+        in memory. They are loaded from the database here, and then kept up to
+        date from the solicitations stream, whichever process accepted the
+        solicitations.
+        """
+        self._late_timer_stream_pos = self.store.get_solicitation_stream_token()
+        solicitations = yield self.store.get_accepted_solicitations()
+
+        now = self.clock.time_msec()
+        for solicitation in solicitations:
+            self._insert_late_solicitation_deadline(
+                now, solicitation["id"], solicitation["time_stamp"]
+            )
 
-        # Enquanto não tem as permissões, recupera todos os usuários.
-        users = yield self.store.get_users()
+        self.clock.looping_call(self._handle_late_solicitation_deadlines, 1000)
 
-        self.notifier.on_new_event("solicitations_key", token, [user["name"] for user in users])
+    def _insert_late_solicitation_deadline(self, now, solicitation_id, accepted_ts):
+        deadline = (int(accepted_ts) + FIVE_MINUTES_IN_SECONDS) * 1000
+        self._late_timer.insert(now, int(solicitation_id), deadline)
+
+    def _handle_late_solicitation_deadlines(self):
+        # Don't start another update while the last one is still running.
+        if self._late_timer_updating:
+            return
+        self._late_timer_updating = True
 
-    def start_updating_late_solicitations(self):
         run_as_background_process(
-            "sync_late_solicitations", self._update_status_from_late_solicitations
+            "update_late_solicitations", self._update_late_solicitations
         )
 
     @defer.inlineCallbacks
-    def _update_status_from_late_solicitations(self):
-        current_time = calendar.timegm(time.gmtime())
-        solicitations = yield self.store.get_late_solicitations_with_status_new(current_time)
-        for solicitation in solicitations:
-            # TODO Put the bot user_id correct in the future
-            yield self.change_solicitation_status(SolicitationStatus.LATE, solicitation['id'], None)
+    def _add_accepted_solicitation_deadlines(self):
+        """Add the deadlines of the solicitations accepted since we last read
+        the solicitations stream to the timer.
+        """
+        from_token = self._late_timer_stream_pos
+        to_token = self.store.get_solicitation_stream_token()
+        if from_token == to_token:
+            return
+
+        updates = yield self.store.get_all_solicitation_updates(from_token, to_token)
+        accepted_ids = set(
+            update["solicitation_id"]
+            for update in updates
+            if update["type"] == EventTypes.ChangeSolicitationStatus
+            and update["content"].get("status") == SolicitationStatus.ACCEPTED
+        )
+        if accepted_ids:
+            # They may have moved on since, in which case there is nothing to
+            # schedule.
+            solicitations = yield self.store.get_accepted_solicitations(accepted_ids)
+
+            now = self.clock.time_msec()
+            for solicitation in solicitations:
+                self._insert_late_solicitation_deadline(
+                    now, solicitation["id"], solicitation["time_stamp"]
+                )
+
+        self._late_timer_stream_pos = to_token
 
+    @measure_func("update_late_solicitations")
     @defer.inlineCallbacks
-    def _join_users_to_room(self, requester, users, room_id):
-        for user in users:
-            user_object = UserID.from_string(user)
-            yield self._room_member_handler.update_membership(requester, user_object, room_id, 'join')
+    def _update_late_solicitations(self):
+        try:
+            yield self._add_accepted_solicitation_deadlines()
+
+            solicitation_ids = self._late_timer.fetch(self.clock.time_msec())
+            if not solicitation_ids:
+                return
+
+            ts = int(self.clock.time())
+            try:
+                late, token = yield self.store.mark_solicitations_late(
+                    solicitation_ids, ts
+                )
+            except Exception:
+                # They have been taken out of the timer, so put them back or
+                # they won't be marked late until we restart.
+                logger.exception(
+                    "Failed to mark %d solicitations late, retrying",
+                    len(solicitation_ids),
+                )
+                now = self.clock.time_msec()
+                for solicitation_id in solicitation_ids:
+                    self._late_timer.insert(
+                        now, solicitation_id, now + LATE_SOLICITATION_RETRY_MS
+                    )
+                return
+
+            if not late:
+                return
+
+            users = yield self.get_users_to_notify(
+                [solicitation["substation_code"] for solicitation in late], None
+            )
+            self.notifier.on_new_event("solicitations_key", token, users)
+        finally:
+            self._late_timer_updating = False
 
     @defer.inlineCallbacks
     def _create_room_and_join_users(self, requester, users, solicitation_id, substation, equipment):
-        requester_user_id = requester.user.to_string()
-        users_to_invite = self._get_users_name_to_invite(users, requester_user_id)
-
-        room_id = yield self.create_room_for_solicitation(requester, users_to_invite, substation, equipment)
+        room_id = yield self.create_room_for_solicitation(requester, users, substation, equipment)
 
         yield self.store.update_solicitation_room(solicitation_id, room_id)
 
-        yield self._join_users_to_room(requester, users_to_invite, room_id)
-
     def create_room_and_join_users(self, requester, users, solicitation_id, substation, equipment):
         run_as_background_process(
             "create_room_and_join_users", self._create_room_and_join_users, requester, users,
             solicitation_id, substation, equipment
         )
 
-    @classmethod
-    def _get_users_name_to_invite(cls, users, user_to_remove):
-        users_to_invite = []
-        for user in users:
-            if user['name'] != user_to_remove:
-                users_to_invite.append(user['name'])
-        return users_to_invite
-
     @classmethod
     def _get_state_machine_by_user_company(cls, company_code):
         if company_code == Companies.ONS:
@@ -285,13 +717,6 @@ class VoltageControlHandler(BaseHandler):
         if result > 300:  # 300 = 5 minutes in timestamp
             raise SynapseError(400, "Expired solicitation!", Codes.INVALID_PARAM)
 
-    @defer.inlineCallbacks
-    def check_substation(self, company_code, substation):
-        substation_object = yield self.substation_handler. \
-            get_substation_by_company_code_and_substation_code(company_code, substation)
-        if substation_object is None:
-            raise SynapseError(400, "Invalid substation!", Codes.INVALID_PARAM)
-
 
 def treat_solicitation_data(solicitation):
     if "voltage" not in solicitation:
@@ -317,6 +742,29 @@ def treat_solicitation_data(solicitation):
         solicitation["bt"] = None
 
 
+def check_substation(substations, company_code, substation):
+    substation_object = substations.get(substation)
+    if substation_object is None or substation_object["company_code"] != company_code:
+        raise SynapseError(400, "Invalid substation!", Codes.INVALID_PARAM)
+
+
+def encode_pagination_token(key):
+    """Encode the sort key of the last solicitation of a page as an opaque
+    token, safe to use in a query string.
+    """
+    return base64.urlsafe_b64encode(json.dumps(key).encode("ascii")).decode("ascii")
+
+
+def decode_pagination_token(token):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("ascii"))
+    except Exception:
+        raise SynapseError(400, "Invalid pagination token", Codes.INVALID_PARAM)
+    if not isinstance(key, list) or not all(isinstance(k, (int, str)) for k in key):
+        raise SynapseError(400, "Invalid pagination token", Codes.INVALID_PARAM)
+    return key
+
+
 def check_param_create_total_time(create_total_time):
     try:
         int(create_total_time)
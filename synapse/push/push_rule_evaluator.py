@@ -149,7 +149,7 @@ class PushRuleEvaluatorForEvent(object):
 
 
 # Caches (glob, word_boundary) -> regex for push. See _glob_matches
-regex_cache = LruCache(50000 * CACHE_SIZE_FACTOR)
+regex_cache = LruCache(50000 * CACHE_SIZE_FACTOR, name="regex_cache")
 register_cache("cache", "regex_push_cache", regex_cache)
 
 
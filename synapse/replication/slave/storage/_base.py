@@ -42,6 +42,8 @@ class BaseSlavedStore(SQLBaseStore):
         else:
             self._cache_id_gen = None
 
+        self._catch_up_shared_event_cache(db_conn)
+
         self.hs = hs
 
     def stream_positions(self):
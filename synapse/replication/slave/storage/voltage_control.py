@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from synapse.storage.substation import SubstationStore
+from synapse.storage.table_data import TableWorkerStore
+from synapse.storage.voltage_control import VoltageControlWorkerStore
+from synapse.util.caches.stream_change_cache import StreamChangeCache
+
+from ._base import BaseSlavedStore
+from ._slaved_id_tracker import SlavedIdTracker
+
+
+class SlavedVoltageControlStore(
+    VoltageControlWorkerStore, TableWorkerStore, SubstationStore, BaseSlavedStore
+):
+    def __init__(self, db_conn, hs):
+        super(SlavedVoltageControlStore, self).__init__(db_conn, hs)
+
+        self._solicitation_updates_id_gen = SlavedIdTracker(
+            db_conn, "solicitation_updates", "stream_id"
+        )
+        self._solicitation_updates_stream_cache = StreamChangeCache(
+            "_solicitation_updates_stream_cache",
+            self._solicitation_updates_id_gen.get_current_token(),
+        )
+
+    def stream_positions(self):
+        result = super(SlavedVoltageControlStore, self).stream_positions()
+        result["solicitation"] = self._solicitation_updates_id_gen.get_current_token()
+        return result
+
+    def process_replication_rows(self, stream_name, token, rows):
+        if stream_name == "solicitation":
+            self._solicitation_updates_id_gen.advance(token)
+            for row in rows:
+                self._solicitation_updates_stream_cache.entity_has_changed(
+                    row.solicitation_id, token
+                )
+
+        return super(SlavedVoltageControlStore, self).process_replication_rows(
+            stream_name, token, rows
+        )
@@ -98,7 +98,13 @@ GroupsStreamRow = namedtuple(
 
 SolicitationStreamRow = namedtuple(
     "SolicitationStreamRow",
-    ("solicitation_id", "user_id", "type", "content"),  # str  # str  # str  # dict
+    (
+        "solicitation_id",  # int
+        "substation_code",  # str
+        "user_id",  # str, optional
+        "type",  # str
+        "content",  # dict
+    ),
 )
 
 
@@ -446,6 +452,9 @@ class GroupServerStream(Stream):
 
 
 class SolicitationServerStream(Stream):
+    """A voltage control solicitation was created or changed status
+    """
+
     NAME = "solicitation"
     ROW_TYPE = SolicitationStreamRow
 
@@ -453,6 +462,6 @@ class SolicitationServerStream(Stream):
         store = hs.get_datastore()
 
         self.current_token = store.get_solicitation_stream_token
-        self.update_function = store.get_all_solicitation_updates
+        self.update_function = store.get_all_solicitation_changes
 
         super(SolicitationServerStream, self).__init__(hs)
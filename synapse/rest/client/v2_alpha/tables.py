@@ -1,5 +1,7 @@
 import logging
 
+from six import string_types
+
 from synapse.api.constants import Companies
 from synapse.rest.admin._base import assert_requester_is_admin
 from synapse.api.errors import SynapseError
@@ -39,6 +41,50 @@ class AssociateTableServlet(RestServlet):
             raise SynapseError(400, "Empty tables!")
 
 
+class BulkAssociateTablesServlet(RestServlet):
+    """Associates tables to many users at once, e.g. to onboard a shift of
+    operators. With `replace`, the users lose the tables which are not listed.
+    """
+
+    PATTERNS = client_patterns("/associate_tables$")
+
+    def __init__(self, hs):
+        """
+        Args:
+            hs (synapse.server.HomeServer): server
+        """
+        super(BulkAssociateTablesServlet, self).__init__()
+
+        self.hs = hs
+        self.auth = hs.get_auth()
+        self.table_handler = hs.get_table_handler()
+
+    @defer.inlineCallbacks
+    def on_PUT(self, request):
+        yield assert_requester_is_admin(self.auth, request)
+        content = parse_json_object_from_request(request)
+
+        tables_by_user = content.get("users")
+        if not isinstance(tables_by_user, dict) or not tables_by_user:
+            raise SynapseError(400, "Empty users!", Codes.BAD_JSON)
+        for tables in tables_by_user.values():
+            if not isinstance(tables, list) or not all(
+                isinstance(code, string_types) for code in tables
+            ):
+                raise SynapseError(
+                    400, "Tables must be a list of table codes!", Codes.BAD_JSON
+                )
+
+        replace = content.get("replace", False)
+        if not isinstance(replace, bool):
+            raise SynapseError(400, "'replace' must be a boolean!", Codes.BAD_JSON)
+
+        yield self.table_handler.associate_tables_to_users(
+            tables_by_user, replace=replace
+        )
+        return 200, "The tables were associated with the users!"
+
+
 class FilterTableServlet(RestServlet):
     PATTERNS = client_patterns("/tables$")
 
@@ -76,4 +122,5 @@ class FilterTableServlet(RestServlet):
 
 def register_servlets(hs, http_server):
     AssociateTableServlet(hs).register(http_server)
+    BulkAssociateTablesServlet(hs).register(http_server)
     FilterTableServlet(hs).register(http_server)
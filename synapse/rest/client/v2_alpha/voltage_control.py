@@ -17,7 +17,8 @@ import logging
 
 from twisted.internet import defer
 
-from synapse.http.servlet import RestServlet, parse_list, parse_integer, parse_string, parse_json_object_from_request
+from synapse.http.servlet import RestServlet, parse_boolean, parse_list, parse_integer, parse_string, \
+    parse_json_object_from_request
 from synapse.api.constants import SolicitationStatus, SolicitationActions, Companies, EquipmentTypes, \
     SolicitationSortParams
 
@@ -63,6 +64,26 @@ class VoltageControlSolicitationServlet(RestServlet):
         )
         return 201, {"message": "Voltage control solicitations created with success."}
 
+
+class VoltageControlSolicitationListServlet(RestServlet):
+    """Lists the solicitations. Only reads from the database, so this can also
+    be served by the client_reader workers.
+
+    By default this returns a bare list of solicitations, starting from the
+    `from_id` solicitation id. Clients which pass `paginate=true`, or a `from`
+    token, get a `{"chunk": [...], "next_batch": ...}` page instead, and pass
+    its `next_batch` back as `from` to get the next page.
+    """
+
+    PATTERNS = client_patterns("/voltage_control_solicitation$")
+
+    def __init__(self, hs):
+        super(VoltageControlSolicitationListServlet, self).__init__()
+
+        self.hs = hs
+        self.auth = hs.get_auth()
+        self.voltage_control_handler = hs.get_voltage_control_handler()
+
     # TODO Resolver prolema de encoding no parm de ordenação "+"
     @defer.inlineCallbacks
     def on_GET(self, request):
@@ -70,7 +91,11 @@ class VoltageControlSolicitationServlet(RestServlet):
         user_company_code = requester.company_code
 
         limit = min(parse_integer(request, "limit", default=50), 100)
-        from_solicitation_id = parse_integer(request, "from_id", default=0)
+        from_token = parse_string(request, "from", default=None)
+        from_id = parse_integer(request, "from_id", default=0)
+        paginate = parse_boolean(
+            request, "paginate", default=from_token is not None
+        )
 
         company_code = parse_string(request, "company_code", default=None)
         table_code = parse_string(request, "table_code", default=None)
@@ -78,7 +103,7 @@ class VoltageControlSolicitationServlet(RestServlet):
         substations = parse_list(request, "substations")
         sort_params = parse_list(request, "sort")
 
-        exclude_expired = parse_string(request, "exclude_expired", default=None)
+        exclude_expired = parse_boolean(request, "exclude_expired", default=False)
 
         if company_code is not None:
             if company_code not in Companies.ALL_COMPANIES:
@@ -86,30 +111,162 @@ class VoltageControlSolicitationServlet(RestServlet):
             elif user_company_code != Companies.ONS and user_company_code != company_code:
                 raise SynapseError(403, "User can only access the solicitations of your company", Codes.FORBIDDEN)
 
-        if table_code is not None:
-            table = yield self.table_handler.get_table_by_company_code_and_table_code(company_code, table_code)
-            if table is None:
-                raise SynapseError(404, "Table not found", Codes.NOT_FOUND)
-
-        if substations:
-            for substation_code in substations:
-                substation = yield self.substation_handler. \
-                    get_substation_by_company_code_and_substation_code(company_code, substation_code)
-                if substation is None:
-                    raise SynapseError(404, "Substation %r not found" % substation_code, Codes.NOT_FOUND)
-
         if sort_params:
             for param in sort_params:
                 if param not in SolicitationSortParams.ALL_PARAMS:
                     raise SynapseError(400, "Invalid sort param", Codes.INVALID_PARAM)
 
+        substation_codes = yield self.voltage_control_handler.get_substations_to_filter(
+            company_code, table_code, substations
+        )
+
         is_order_by_cteep = Companies.CTEEP == user_company_code
-        result = yield self.voltage_control_handler.get_solicitations(
+        result, next_token = yield self.voltage_control_handler.get_solicitations(
             is_order_by_cteep=is_order_by_cteep,
-            from_id=from_solicitation_id,
+            substation_codes=substation_codes,
+            exclude_expired=exclude_expired,
+            sort=sort_params,
+            from_token=from_token,
+            from_id=from_id,
+            limit=limit
+        )
+
+        if not paginate:
+            return 200, result
+
+        response = {"chunk": result}
+        if next_token is not None:
+            response["next_batch"] = next_token
+        return 200, response
+
+
+class VoltageControlSolicitationHistoryServlet(RestServlet):
+    """Lists the archived solicitations, most recent first. Only reads from the
+    database, so this can also be served by the client_reader workers.
+    """
+
+    PATTERNS = client_patterns("/voltage_control_solicitation_history$")
+
+    def __init__(self, hs):
+        super(VoltageControlSolicitationHistoryServlet, self).__init__()
+
+        self.hs = hs
+        self.auth = hs.get_auth()
+        self.voltage_control_handler = hs.get_voltage_control_handler()
+
+    @defer.inlineCallbacks
+    def on_GET(self, request):
+        requester = yield self.auth.get_user_by_req(request)
+        user_company_code = requester.company_code
+
+        limit = min(parse_integer(request, "limit", default=50), 100)
+        from_token = parse_string(request, "from", default=None)
+
+        company_code = parse_string(request, "company_code", default=None)
+        table_code = parse_string(request, "table_code", default=None)
+
+        substations = parse_list(request, "substations")
+
+        if company_code is not None:
+            if company_code not in Companies.ALL_COMPANIES:
+                raise SynapseError(404, "Company not found", Codes.NOT_FOUND)
+            elif user_company_code != Companies.ONS and user_company_code != company_code:
+                raise SynapseError(403, "User can only access the solicitations of your company", Codes.FORBIDDEN)
+
+        substation_codes = yield self.voltage_control_handler.get_substations_to_filter(
+            company_code, table_code, substations
+        )
+
+        result, next_token = yield self.voltage_control_handler.get_solicitation_history(
+            substation_codes=substation_codes,
+            from_token=from_token,
             limit=limit
         )
-        return 200, result
+
+        response = {"chunk": result}
+        if next_token is not None:
+            response["next_batch"] = next_token
+        return 200, response
+
+
+class VoltageControlSolicitationSummaryServlet(RestServlet):
+    """Counts the solicitations by status and by substation, for the
+    dashboards. Only reads from the database, so this can also be served by
+    the client_reader workers.
+    """
+
+    PATTERNS = client_patterns("/voltage_control_solicitation/summary$")
+
+    def __init__(self, hs):
+        super(VoltageControlSolicitationSummaryServlet, self).__init__()
+
+        self.hs = hs
+        self.auth = hs.get_auth()
+        self.voltage_control_handler = hs.get_voltage_control_handler()
+
+    @defer.inlineCallbacks
+    def on_GET(self, request):
+        requester = yield self.auth.get_user_by_req(request)
+        user_company_code = requester.company_code
+
+        company_code = parse_string(request, "company_code", default=None)
+        table_code = parse_string(request, "table_code", default=None)
+
+        substations = parse_list(request, "substations")
+
+        if company_code is not None:
+            if company_code not in Companies.ALL_COMPANIES:
+                raise SynapseError(404, "Company not found", Codes.NOT_FOUND)
+            elif user_company_code != Companies.ONS and user_company_code != company_code:
+                raise SynapseError(403, "User can only access the solicitations of your company", Codes.FORBIDDEN)
+
+        substation_codes = yield self.voltage_control_handler.get_substations_to_filter(
+            company_code, table_code, substations
+        )
+
+        summary = yield self.voltage_control_handler.get_solicitation_summary(
+            substation_codes=substation_codes
+        )
+        return 200, summary
+
+
+class VoltageControlSolicitationEventsServlet(RestServlet):
+    """Long-polls for the solicitations which changed since a position, for
+    the clients which don't need the rest of /sync. Can also be served by the
+    synchrotron workers.
+    """
+
+    PATTERNS = client_patterns("/voltage_control_solicitation/events$")
+
+    DEFAULT_LONGPOLL_TIME_MS = 30000
+
+    def __init__(self, hs):
+        super(VoltageControlSolicitationEventsServlet, self).__init__()
+
+        self.hs = hs
+        self.auth = hs.get_auth()
+        self.voltage_control_handler = hs.get_voltage_control_handler()
+
+    @defer.inlineCallbacks
+    def on_GET(self, request):
+        requester = yield self.auth.get_user_by_req(request)
+
+        from_token = parse_string(request, "from", default=None)
+        timeout = parse_integer(
+            request, "timeout", default=self.DEFAULT_LONGPOLL_TIME_MS
+        )
+
+        from_key = None
+        if from_token is not None:
+            try:
+                from_key = int(from_token)
+            except ValueError:
+                raise SynapseError(400, "Invalid from token", Codes.INVALID_PARAM)
+
+        result, next_key = yield self.voltage_control_handler.wait_for_solicitation_changes(
+            requester.user.to_string(), from_key, timeout
+        )
+        return 200, {"chunk": result, "next_batch": str(next_key)}
 
 
 class VoltageControlStatusServlet(RestServlet):
@@ -141,6 +298,10 @@ class VoltageControlStatusServlet(RestServlet):
 
 def register_servlets(hs, http_server):
     VoltageControlSolicitationServlet(hs).register(http_server)
+    VoltageControlSolicitationListServlet(hs).register(http_server)
+    VoltageControlSolicitationHistoryServlet(hs).register(http_server)
+    VoltageControlSolicitationSummaryServlet(hs).register(http_server)
+    VoltageControlSolicitationEventsServlet(hs).register(http_server)
     VoltageControlStatusServlet(hs).register(http_server)
 
 
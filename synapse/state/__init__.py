@@ -659,3 +659,20 @@ class StateResolutionStore(object):
         """
 
         return self.store.get_auth_chain_ids(event_ids, include_given=True)
+
+    def get_auth_chain_difference(self, state_sets):
+        """Given sets of state events figure out the auth chain difference (as
+        per state res v2 algorithm).
+
+        This is the set of events which are in the auth chain of some, but not
+        all, of the state sets, where the auth chain of a set includes the
+        events of the set.
+
+        Args:
+            state_sets (list[set[str]])
+
+        Returns:
+            Deferred[set[str]]: Set of event IDs.
+        """
+
+        return self.store.get_auth_chain_difference(state_sets)
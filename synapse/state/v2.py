@@ -216,15 +216,10 @@ def _get_auth_chain_difference(state_sets, event_map, state_res_store):
             and eid not in common
         )
 
-        auth_chain = yield state_res_store.get_auth_chain(auth_ids)
-        auth_ids.update(auth_chain)
-
         auth_sets.append(auth_ids)
 
-    intersection = set(auth_sets[0]).intersection(*auth_sets[1:])
-    union = set().union(*auth_sets)
-
-    return union - intersection
+    difference = yield state_res_store.get_auth_chain_difference(auth_sets)
+    return difference
 
 
 def _seperate(state_sets):
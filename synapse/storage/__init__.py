@@ -145,8 +145,18 @@ class DataStore(
 
         self._access_tokens_id_gen = IdGenerator(db_conn, "access_tokens", "id")
         self._event_reports_id_gen = IdGenerator(db_conn, "event_reports", "id")
-        self._solicitation_list_id_gen = IdGenerator(db_conn, "voltage_control_solicitation", "id")
-        self._solicitation_signature_id_gen = IdGenerator(db_conn, "solicitation_status_signature", "id")
+        self._solicitation_list_id_gen = IdGenerator(
+            db_conn,
+            "voltage_control_solicitation",
+            "id",
+            extra_tables=[("voltage_control_solicitation_archive", "id")],
+        )
+        self._solicitation_signature_id_gen = IdGenerator(
+            db_conn,
+            "solicitation_status_signature",
+            "id",
+            extra_tables=[("solicitation_status_signature_archive", "id")],
+        )
         self._solicitation_group_id_gen = IdGenerator(db_conn, "solicitation_group", "id")
         self._push_rule_id_gen = IdGenerator(db_conn, "push_rules", "id")
         self._push_rules_enable_id_gen = IdGenerator(db_conn, "push_rules_enable", "id")
@@ -255,7 +265,7 @@ class DataStore(
         _solicitation_updates_prefill, min_solicitation_updates_id = self._get_cache_dict(
             db_conn,
             "solicitation_updates",
-            entity_column="user_id",
+            entity_column="solicitation_id",
             stream_column="stream_id",
             max_value=self._solicitation_updates_id_gen.get_current_token(),
             limit=1000,
@@ -275,6 +285,8 @@ class DataStore(
 
         super(DataStore, self).__init__(db_conn, hs)
 
+        self._catch_up_shared_event_cache(db_conn)
+
     def take_presence_startup_info(self):
         active_on_startup = self._presence_on_startup
         self._presence_on_startup = None
@@ -36,6 +36,7 @@ from synapse.storage.engines import PostgresEngine, Sqlite3Engine
 from synapse.types import get_domain_from_id
 from synapse.util import batch_iter
 from synapse.util.caches.descriptors import Cache
+from synapse.util.caches.shared_event_cache import SharedEventCache
 from synapse.util.stringutils import exception_to_unicode
 
 # import a function which will return a monotonic time, in seconds
@@ -237,9 +238,23 @@ class SQLBaseStore(object):
         self._txn_perf_counters = PerformanceCounters()
 
         self._get_event_cache = Cache(
-            "*getEvent*", keylen=3, max_entries=hs.config.event_cache_size
+            "*getEvent*", keylen=3, max_entries=hs.config.event_cache_size, hs=hs
         )
 
+        # The second tier of the event cache, shared by the processes of the
+        # host. It is named like a cache so that it can be invalidated through
+        # the caches replication stream. The stores which track that stream
+        # bring it up to date with _catch_up_shared_event_cache.
+        self._shared_event_cache = None
+        if hs.config.shared_event_cache_path:
+            self._shared_event_cache = SharedEventCache(
+                hs,
+                hs.config.shared_event_cache_path,
+                max_entries=hs.config.shared_event_cache_max_entries,
+                mmap_size=hs.config.shared_event_cache_mmap_size,
+                stream_position_callback=self.get_cache_stream_token,
+            )
+
         self._event_fetch_lock = threading.Condition()
         self._event_fetch_list = []
         self._event_fetch_ongoing = 0
@@ -1494,6 +1509,54 @@ class SQLBaseStore(object):
         else:
             return 0
 
+    def _catch_up_shared_event_cache(self, db_conn):
+        """Apply the invalidations which were made while no process of this
+        host was keeping the shared event cache up to date, e.g. because they
+        were all down.
+
+        Must be called once `_cache_id_gen` is set.
+        """
+        if self._shared_event_cache is None:
+            return
+
+        txn = LoggingTransaction(
+            db_conn.cursor(),
+            name="_catch_up_shared_event_cache",
+            database_engine=self.database_engine,
+        )
+        self._catch_up_shared_event_cache_txn(txn)
+        txn.close()
+
+    def _catch_up_shared_event_cache_txn(self, txn):
+        cache = self._shared_event_cache
+
+        if not self._cache_id_gen:
+            # There is no caches stream, as only a single process can use an
+            # SQLite database, so we don't know what changed while it was down.
+            cache.catch_up(None, None)
+            return
+
+        current_position = self._cache_id_gen.get_current_token()
+        position = cache.get_stream_position()
+        if position is None or position > current_position:
+            # The file is new, or from another database.
+            cache.catch_up(None, current_position)
+            return
+
+        if position == current_position:
+            return
+
+        txn.execute(
+            "SELECT keys FROM cache_invalidation_stream"
+            " WHERE ? < stream_id AND stream_id <= ? AND cache_func = ?",
+            (position, current_position, "_shared_event_cache"),
+        )
+        event_ids = [event_id for keys, in txn for event_id in keys]
+        logger.info(
+            "Replaying %d invalidations of the shared event cache", len(event_ids)
+        )
+        cache.catch_up(event_ids, current_position)
+
     def _simple_select_list_paginate(
         self,
         table,
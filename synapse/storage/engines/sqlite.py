@@ -38,6 +38,13 @@ class Sqlite3Engine(object):
         """
         return self.module.sqlite_version_info >= (3, 24, 0)
 
+    @property
+    def supports_recursive_ctes(self):
+        """
+        Do we support `WITH RECURSIVE` queries? This requires SQLite3 3.8.3+.
+        """
+        return self.module.sqlite_version_info >= (3, 8, 3)
+
     def check_database(self, txn):
         pass
 
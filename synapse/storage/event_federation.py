@@ -27,6 +27,7 @@ from synapse.metrics.background_process_metrics import run_as_background_process
 from synapse.storage._base import SQLBaseStore
 from synapse.storage.events_worker import EventsWorkerStore
 from synapse.storage.signatures import SignatureWorkerStore
+from synapse.util import batch_iter
 from synapse.util.caches.descriptors import cached
 
 logger = logging.getLogger(__name__)
@@ -67,6 +68,12 @@ class EventFederationWorkerStore(EventsWorkerStore, SignatureWorkerStore, SQLBas
         else:
             results = set()
 
+        if self.database_engine.supports_recursive_ctes:
+            results.update(
+                auth_id for _, auth_id in self._get_auth_edges_txn(txn, event_ids)
+            )
+            return list(results)
+
         base_sql = "SELECT auth_id FROM event_auth WHERE event_id IN (%s)"
 
         front = set(event_ids)
@@ -85,6 +92,80 @@ class EventFederationWorkerStore(EventsWorkerStore, SignatureWorkerStore, SQLBas
 
         return list(results)
 
+    def _get_auth_edges_txn(self, txn, event_ids):
+        """Get the event_auth rows of the auth chains of the given events, with
+        one recursive query per batch of events rather than one per level of
+        the auth DAG.
+
+        The database engine must support recursive CTEs.
+
+        Args:
+            event_ids (Iterable[str])
+
+        Returns:
+            set[tuple[str, str]]: (event_id, auth_id) pairs.
+        """
+        # The UNION (rather than UNION ALL) stops the recursion at the edges
+        # we've already seen, so each edge of the chain is only visited once.
+        sql = """
+            WITH RECURSIVE auth_edges(event_id, auth_id) AS (
+                SELECT event_id, auth_id FROM event_auth WHERE event_id IN (%s)
+                UNION
+                SELECT a.event_id, a.auth_id FROM event_auth AS a
+                INNER JOIN auth_edges AS e ON a.event_id = e.auth_id
+            )
+            SELECT event_id, auth_id FROM auth_edges
+        """
+
+        edges = set()
+        for chunk in batch_iter(event_ids, 500):
+            txn.execute(sql % (",".join(["?"] * len(chunk)),), chunk)
+            edges.update((r[0], r[1]) for r in txn)
+
+        return edges
+
+    def get_auth_chain_difference(self, state_sets):
+        """Given sets of state events figure out the auth chain difference (as
+        per state res v2 algorithm).
+
+        This is the set of events which are in the auth chain of some, but not
+        all, of the state sets, where the auth chain of a set includes the
+        events of the set.
+
+        Args:
+            state_sets (list[set[str]])
+
+        Returns:
+            Deferred[set[str]]
+        """
+        return self.runInteraction(
+            "get_auth_chain_difference",
+            self._get_auth_chain_difference_txn,
+            state_sets,
+        )
+
+    def _get_auth_chain_difference_txn(self, txn, state_sets):
+        if self.database_engine.supports_recursive_ctes:
+            # Fetch the auth DAG of all the sets at once, and walk it for each
+            # set in memory.
+            auth_graph = {}
+            for event_id, auth_id in self._get_auth_edges_txn(
+                txn, set().union(*state_sets)
+            ):
+                auth_graph.setdefault(event_id, []).append(auth_id)
+
+            auth_chains = [_walk_auth_graph(auth_graph, s) for s in state_sets]
+        else:
+            auth_chains = [
+                set(self._get_auth_chain_ids_txn(txn, state_set, include_given=True))
+                for state_set in state_sets
+            ]
+
+        intersection = auth_chains[0].intersection(*auth_chains[1:])
+        union = set().union(*auth_chains)
+
+        return union - intersection
+
     def get_oldest_events_in_room(self, room_id):
         return self.runInteraction(
             "get_oldest_events_in_room", self._get_oldest_events_in_room_txn, room_id
@@ -655,3 +736,26 @@ class EventFederationStore(EventFederationWorkerStore):
             yield self._end_background_update(self.EVENT_AUTH_STATE_ONLY)
 
         return batch_size
+
+
+def _walk_auth_graph(auth_graph, event_ids):
+    """Get the auth chain of some events, including the events themselves.
+
+    Args:
+        auth_graph (dict[str, list[str]]): map from event id to the ids of its
+            auth events.
+        event_ids (Iterable[str])
+
+    Returns:
+        set[str]
+    """
+    result = set()
+    stack = list(event_ids)
+    while stack:
+        event_id = stack.pop()
+        if event_id in result:
+            continue
+        result.add(event_id)
+        stack.extend(auth_graph.get(event_id, ()))
+
+    return result
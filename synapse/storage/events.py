@@ -1261,6 +1261,7 @@ class EventsStore(
                     "UPDATE event_json SET internal_metadata = ?" " WHERE event_id = ?"
                 )
                 txn.execute(sql, (metadata_json, event.event_id))
+                self._invalidate_shared_event_cache_txn(txn, [event.event_id])
 
                 # Add an entry to the ex_outlier_stream table to replicate the
                 # change in outlier status to our workers.
@@ -1550,9 +1551,23 @@ class EventsStore(
 
         txn.call_after(prefill)
 
+    def _invalidate_shared_event_cache_txn(self, txn, event_ids):
+        """Drop the rows of some events from the shared event cache, on this
+        host and, through the caches stream, on the hosts of the workers.
+
+        Args:
+            txn
+            event_ids (list[str])
+        """
+        for batch in batch_iter(event_ids, 1000):
+            if self._shared_event_cache is not None:
+                txn.call_after(self._shared_event_cache.invalidate, batch)
+            self._send_invalidation_to_replication(txn, "_shared_event_cache", batch)
+
     def _store_redaction(self, txn, event):
         # invalidate the cache for the redacted event
         txn.call_after(self._invalidate_get_event_cache, event.redacts)
+        self._invalidate_shared_event_cache_txn(txn, [event.redacts])
         txn.execute(
             "INSERT INTO redactions (event_id, redacts) VALUES (?,?)",
             (event.event_id, event.redacts),
@@ -2032,6 +2047,10 @@ class EventsStore(
         for event_id, _ in event_rows:
             txn.call_after(self._get_state_group_for_event.invalidate, (event_id,))
 
+        self._invalidate_shared_event_cache_txn(
+            txn, [event_id for event_id, should_delete in event_rows if should_delete]
+        )
+
         # Delete all remote non-state events
         for table in (
             "events",
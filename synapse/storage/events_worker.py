@@ -29,7 +29,11 @@ from synapse.api.room_versions import EventFormatVersions
 from synapse.events import FrozenEvent, event_type_from_format_version  # noqa: F401
 from synapse.events.snapshot import EventContext  # noqa: F401
 from synapse.events.utils import prune_event
-from synapse.logging.context import LoggingContext, PreserveLoggingContext
+from synapse.logging.context import (
+    LoggingContext,
+    PreserveLoggingContext,
+    run_in_background,
+)
 from synapse.metrics.background_process_metrics import run_as_background_process
 from synapse.types import get_domain_from_id
 from synapse.util import batch_iter
@@ -469,7 +473,7 @@ class EventsWorkerStore(SQLBaseStore):
         events_to_fetch = event_ids
 
         while events_to_fetch:
-            row_map = yield self._enqueue_events(events_to_fetch)
+            row_map = yield self._get_event_rows(events_to_fetch)
 
             # we need to recursively fetch any redactions of those events
             redaction_ids = set()
@@ -530,6 +534,38 @@ class EventsWorkerStore(SQLBaseStore):
 
         return result_map
 
+    @defer.inlineCallbacks
+    def _get_event_rows(self, event_ids):
+        """Fetch event rows from the shared event cache, if there is one, or
+        the database.
+
+        The rows fetched from the database are added to the shared event cache.
+
+        Args:
+            event_ids (Iterable[str]): events to be fetched.
+
+        Returns:
+            Deferred[Dict[str, Dict]]: map from event id to row data, as
+                returned by _fetch_event_rows. May contain events that weren't
+                requested.
+        """
+        if self._shared_event_cache is None:
+            row_map = yield self._enqueue_events(event_ids)
+            return row_map
+
+        row_map = yield self._shared_event_cache.get_rows(event_ids)
+
+        missing_event_ids = [e for e in event_ids if e not in row_map]
+        if missing_event_ids:
+            db_row_map = yield self._enqueue_events(missing_event_ids)
+            # There's no need to wait for the rows to be written.
+            run_in_background(
+                self._shared_event_cache.add_rows, list(db_row_map.values())
+            )
+            row_map.update(db_row_map)
+
+        return row_map
+
     @defer.inlineCallbacks
     def _enqueue_events(self, events):
         """Fetches events from the database using the _event_fetch_list. This
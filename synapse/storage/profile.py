@@ -17,6 +17,7 @@ from twisted.internet import defer
 
 from synapse.api.errors import StoreError
 from synapse.storage.roommember import ProfileInfo
+from synapse.util.caches.descriptors import cached, cachedList
 
 from ._base import SQLBaseStore
 
@@ -68,27 +69,79 @@ class ProfileWorkerStore(SQLBaseStore):
             desc="get_from_remote_profile_cache",
         )
 
-    def create_profile(self, user_localpart):
-        return self._simple_insert(
-            table="profiles", values={"user_id": user_localpart}, desc="create_profile"
+    @cached(max_entries=5000)
+    def _get_profile_for_localpart(self, user_localpart):
+        raise NotImplementedError()
+
+    @cachedList(
+        cached_method_name="_get_profile_for_localpart",
+        list_name="user_localparts",
+        num_args=1,
+        inlineCallbacks=True,
+    )
+    def get_profiles_for_localparts(self, user_localparts):
+        """Get the profiles of several local users at once.
+
+        Args:
+            user_localparts (iterable[str])
+
+        Returns:
+            Deferred[dict[str, dict|None]]: localpart to a dict with the
+            `displayname` and `avatar_url` of the user, or None if they have
+            no profile.
+        """
+        rows = yield self._simple_select_many_batch(
+            table="profiles",
+            column="user_id",
+            iterable=user_localparts,
+            keyvalues={},
+            retcols=("user_id", "displayname", "avatar_url"),
+            desc="get_profiles_for_localparts",
         )
 
+        return {
+            row["user_id"]: {
+                "displayname": row["displayname"],
+                "avatar_url": row["avatar_url"],
+            }
+            for row in rows
+        }
+
+    def create_profile(self, user_localpart):
+        def create_profile_txn(txn):
+            self._simple_insert_txn(
+                txn, table="profiles", values={"user_id": user_localpart}
+            )
+            self._invalidate_cache_and_stream(
+                txn, self._get_profile_for_localpart, (user_localpart,)
+            )
+
+        return self.runInteraction("create_profile", create_profile_txn)
+
     def set_profile_displayname(self, user_localpart, new_displayname):
-        return self._simple_update_one(
-            table="profiles",
-            keyvalues={"user_id": user_localpart},
-            updatevalues={"displayname": new_displayname},
-            desc="set_profile_displayname",
+        return self._update_profile(
+            user_localpart, {"displayname": new_displayname}, "set_profile_displayname"
         )
 
     def set_profile_avatar_url(self, user_localpart, new_avatar_url):
-        return self._simple_update_one(
-            table="profiles",
-            keyvalues={"user_id": user_localpart},
-            updatevalues={"avatar_url": new_avatar_url},
-            desc="set_profile_avatar_url",
+        return self._update_profile(
+            user_localpart, {"avatar_url": new_avatar_url}, "set_profile_avatar_url"
         )
 
+    def _update_profile(self, user_localpart, updatevalues, desc):
+        def _update_profile_txn(txn):
+            self._simple_update_one_txn(
+                txn,
+                table="profiles",
+                keyvalues={"user_id": user_localpart},
+                updatevalues=updatevalues,
+            )
+            self._invalidate_cache_and_stream(
+                txn, self._get_profile_for_localpart, (user_localpart,)
+            )
+
+        return self.runInteraction(desc, _update_profile_txn)
+
 
 class ProfileStore(ProfileWorkerStore):
     def add_remote_profile_cache(self, user_id, displayname, avatar_url):
@@ -29,6 +29,7 @@ from synapse.metrics.background_process_metrics import run_as_background_process
 from synapse.storage import background_updates
 from synapse.storage._base import SQLBaseStore
 from synapse.types import UserID
+from synapse.util import batch_iter
 from synapse.util.caches.descriptors import cached, cachedInlineCallbacks
 
 THIRTY_MINUTES_IN_MS = 30 * 60 * 1000
@@ -282,9 +283,17 @@ class RegistrationWorkerStore(SQLBaseStore):
 
         return res if res else False
 
-    @defer.inlineCallbacks
+    @cached()
     def get_company_code(self, user_id):
-        res = yield self._simple_select_one_onecol(
+        """Get the company a user belongs to.
+
+        Args:
+            user_id (str)
+        Returns:
+            Deferred[str|None]: the company code, or None if the user doesn't
+            exist or has no company.
+        """
+        return self._simple_select_one_onecol(
             table="users",
             keyvalues={"name": user_id},
             retcol="company_code",
@@ -292,7 +301,26 @@ class RegistrationWorkerStore(SQLBaseStore):
             desc="get_company_code",
         )
 
-        return res
+    @cached()
+    def get_user_ids_by_company_code(self, company_code):
+        """Get the active users that belong to a company.
+
+        Args:
+            company_code (str): The company code, ex: ONS.
+        Returns:
+            Deferred[frozenset[str]]: the user ids.
+        """
+
+        def get_user_ids_by_company_code_txn(txn):
+            txn.execute(
+                "SELECT name FROM users WHERE company_code = ? AND deactivated = 0",
+                (company_code,),
+            )
+            return frozenset(row[0] for row in txn)
+
+        return self.runInteraction(
+            "get_user_ids_by_company_code", get_user_ids_by_company_code_txn
+        )
 
     def _query_for_auth(self, txn, token):
         sql = (
@@ -349,6 +377,31 @@ class RegistrationWorkerStore(SQLBaseStore):
 
         return self.runInteraction("get_users_by_id_case_insensitive", f)
 
+    def get_existing_user_ids_case_insensitive(self, user_ids):
+        """Gets which of the given users exist, matching them case
+        insensitively, as get_users_by_id_case_insensitive does.
+
+        Args:
+            user_ids (iterable[str])
+
+        Returns:
+            Deferred[set[str]]: the lowercased ids of the users which are
+                registered.
+        """
+        lower_user_ids = list(set(user_id.lower() for user_id in user_ids))
+
+        def f(txn):
+            existing = set()
+            for batch in batch_iter(lower_user_ids, 100):
+                sql = "SELECT lower(name) FROM users WHERE lower(name) IN (%s)" % (
+                    ",".join("?" * len(batch)),
+                )
+                txn.execute(sql, batch)
+                existing.update(name for name, in txn)
+            return existing
+
+        return self.runInteraction("get_existing_user_ids_case_insensitive", f)
+
     @defer.inlineCallbacks
     def count_all_users(self):
         """Counts all users registered on the homeserver."""
@@ -862,9 +915,17 @@ class RegistrationStore(
                 "INSERT INTO profiles(user_id, displayname) VALUES (?,?)",
                 (user_id_obj.localpart, create_profile_with_displayname),
             )
+            self._invalidate_cache_and_stream(
+                txn, self._get_profile_for_localpart, (user_id_obj.localpart,)
+            )
 
         self._invalidate_cache_and_stream(txn, self.get_user_by_id, (user_id,))
+        self._invalidate_cache_and_stream(txn, self.get_company_code, (user_id,))
         txn.call_after(self.is_guest.invalidate, (user_id,))
+        if company_code is not None:
+            self._invalidate_cache_and_stream(
+                txn, self.get_user_ids_by_company_code, (company_code,)
+            )
 
     def user_set_password_hash(self, user_id, password_hash):
         """
@@ -1341,6 +1402,19 @@ class RegistrationStore(
             txn, self.get_user_deactivated_status, (user_id,)
         )
 
+        # Deactivated users drop out of their company's roster.
+        company_code = self._simple_select_one_onecol_txn(
+            txn,
+            table="users",
+            keyvalues={"name": user_id},
+            retcol="company_code",
+        )
+        self._invalidate_cache_and_stream(txn, self.get_company_code, (user_id,))
+        if company_code is not None:
+            self._invalidate_cache_and_stream(
+                txn, self.get_user_ids_by_company_code, (company_code,)
+            )
+
     @defer.inlineCallbacks
     def set_user_deactivated_status(self, user_id, deactivated):
         """Set the `deactivated` property for the provided user to the provided value.
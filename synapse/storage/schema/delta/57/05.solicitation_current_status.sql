@@ -0,0 +1,44 @@
+/*
+ *  ZapCot - Current status of the voltage control solicitations.
+ */
+
+-- Signature timestamps are unix times in seconds, but were stored as TEXT,
+-- which made them sort as strings. Rebuild the table with an integer column.
+CREATE TABLE solicitation_status_signature_new ( id INTEGER PRIMARY KEY, user_id TEXT, status TEXT, time_stamp BIGINT, solicitation_id INTEGER, justification TEXT, FOREIGN KEY(solicitation_id) REFERENCES voltage_control_solicitation(id));
+
+INSERT INTO solicitation_status_signature_new (id, user_id, status, time_stamp, solicitation_id, justification)
+    SELECT id, user_id, status, CAST(time_stamp AS BIGINT), solicitation_id, justification
+    FROM solicitation_status_signature;
+
+DROP TABLE solicitation_status_signature;
+ALTER TABLE solicitation_status_signature_new RENAME TO solicitation_status_signature;
+
+CREATE INDEX solicitation_status_signature_solicitation_id ON solicitation_status_signature(solicitation_id, time_stamp);
+
+-- We keep the status of the latest signature on the solicitation itself, so
+-- that listing and late checks don't need to look for it in
+-- solicitation_status_signature. These are null for existing solicitations
+-- until the background update has finished.
+ALTER TABLE voltage_control_solicitation ADD COLUMN current_status TEXT;
+ALTER TABLE voltage_control_solicitation ADD COLUMN current_status_ts BIGINT;
+
+CREATE INDEX voltage_control_solicitation_current_status ON voltage_control_solicitation(current_status, current_status_ts);
+
+-- The listings are ordered by status group and then timestamp, with a
+-- different grouping for each company. These indexes are on exactly the
+-- ORDER BY expressions used by VoltageControlStore.get_solicitations, so that
+-- the listings are read in index order.
+CREATE INDEX voltage_control_solicitation_cteep_order ON voltage_control_solicitation(
+    (CASE WHEN current_status = 'LATE' THEN 1 WHEN current_status = 'ACCEPTED' THEN 2 WHEN current_status = 'REQUIRED' THEN 3 WHEN current_status = 'NEW' THEN 4 WHEN current_status = 'CONTESTED' THEN 5 WHEN current_status IN ('EXECUTED', 'CANCELED', 'BLOCKED') THEN 6 END),
+    (CASE WHEN current_status IN ('EXECUTED', 'CANCELED', 'BLOCKED') THEN current_status_ts * -1 ELSE current_status_ts END),
+    id
+);
+
+CREATE INDEX voltage_control_solicitation_ons_order ON voltage_control_solicitation(
+    (CASE WHEN current_status IN ('BLOCKED', 'CONTESTED', 'NEW', 'REQUIRED') THEN 1 WHEN current_status IN ('LATE', 'ACCEPTED') THEN 2 WHEN current_status IN ('EXECUTED', 'CANCELED') THEN 3 END),
+    (CASE WHEN current_status IN ('EXECUTED', 'CANCELED') THEN current_status_ts * -1 ELSE current_status_ts END),
+    id
+);
+
+INSERT INTO background_updates (update_name, progress_json) VALUES
+  ('solicitation_current_status', '{}');
@@ -0,0 +1,14 @@
+/*
+ *  ZapCot - Archive of the finished voltage control solicitations.
+ */
+
+-- Solicitations which have been EXECUTED, CANCELED or BLOCKED for longer than
+-- the configured retention are moved here, with their signatures, so that the
+-- live tables only hold the working set. The rows keep their ids.
+CREATE TABLE voltage_control_solicitation_archive ( id INTEGER PRIMARY KEY, group_id INTEGER, action_code TEXT, equipment_code TEXT, substation_code TEXT, staggered BOOLEAN, amount TEXT, voltage TEXT, room_id TEXT, at_ TEXT, bt TEXT, current_status TEXT, current_status_ts BIGINT);
+
+CREATE INDEX voltage_control_solicitation_archive_substation ON voltage_control_solicitation_archive(substation_code, id);
+
+CREATE TABLE solicitation_status_signature_archive ( id INTEGER PRIMARY KEY, user_id TEXT, status TEXT, time_stamp BIGINT, solicitation_id INTEGER, justification TEXT);
+
+CREATE INDEX solicitation_status_signature_archive_solicitation_id ON solicitation_status_signature_archive(solicitation_id, time_stamp);
@@ -0,0 +1,25 @@
+/*
+ *  ZapCot - Number of voltage control solicitations by substation and status.
+ */
+
+-- Kept up to date in the same transactions as the solicitations' current
+-- status, so that the summary doesn't have to go through the solicitations.
+-- Archived solicitations are not counted.
+CREATE TABLE voltage_control_solicitation_status_counts ( substation_code TEXT NOT NULL, status TEXT NOT NULL, count BIGINT NOT NULL);
+
+CREATE UNIQUE INDEX voltage_control_solicitation_status_counts_key ON voltage_control_solicitation_status_counts(substation_code, status);
+
+-- The current status columns may not have been backfilled yet, so the
+-- existing solicitations are counted from their latest signature, as the
+-- backfill would set it.
+INSERT INTO voltage_control_solicitation_status_counts (substation_code, status, count)
+    SELECT substation_code, status, COUNT(*) FROM (
+        SELECT sol.substation_code, (
+            SELECT status FROM solicitation_status_signature
+            WHERE solicitation_id = sol.id
+            ORDER BY time_stamp DESC, id DESC LIMIT 1
+        ) AS status
+        FROM voltage_control_solicitation AS sol
+    ) AS latest
+    WHERE substation_code IS NOT NULL AND status IS NOT NULL
+    GROUP BY substation_code, status;
@@ -398,10 +398,12 @@ class StateGroupWorkerStore(EventsWorkerStore, SQLBaseStore):
             "*stateGroupCache*",
             # TODO: this hasn't been tuned yet
             50000 * get_cache_factor_for("stateGroupCache"),
+            hs=hs,
         )
         self._state_group_members_cache = DictionaryCache(
             "*stateGroupMembersCache*",
             500000 * get_cache_factor_for("stateGroupMembersCache"),
+            hs=hs,
         )
 
     @defer.inlineCallbacks
@@ -1138,105 +1140,146 @@ class StateGroupWorkerStore(EventsWorkerStore, SQLBaseStore):
             Deferred[int]: The state group ID
         """
 
-        def _store_state_group_txn(txn):
-            if current_state_ids is None:
-                # AFAIK, this can never happen
-                raise Exception("current_state_ids cannot be None")
+        return self.runInteraction(
+            "store_state_group",
+            self._store_state_group_txn,
+            event_id,
+            room_id,
+            prev_group,
+            delta_ids,
+            current_state_ids,
+        )
 
-            state_group = self.database_engine.get_next_state_group_id(txn)
+    def store_state_groups_for_event_chain(self, room_id, prev_group, chain):
+        """Store the state after each event of a chain of state events, where
+        each event follows the previous one, in a single transaction.
 
-            self._simple_insert_txn(
-                txn,
-                table="state_groups",
-                values={"id": state_group, "room_id": room_id, "event_id": event_id},
-            )
+        Args:
+            room_id (str)
+            prev_group (int|None): The state group before the first event of
+                the chain, optional.
+            chain (list[tuple[str, dict, dict]]): For each event, in order, its
+                event ID, the delta between the state before and after it,
+                and the state after it.
 
-            # We persist as a delta if we can, while also ensuring the chain
-            # of deltas isn't tooo long, as otherwise read performance degrades.
-            if prev_group:
-                is_in_db = self._simple_select_one_onecol_txn(
-                    txn,
-                    table="state_groups",
-                    keyvalues={"id": prev_group},
-                    retcol="id",
-                    allow_none=True,
-                )
-                if not is_in_db:
-                    raise Exception(
-                        "Trying to persist state with unpersisted prev_group: %r"
-                        % (prev_group,)
-                    )
+        Returns:
+            Deferred[list[int]]: The state group IDs, one per event
+        """
 
-                potential_hops = self._count_state_group_hops_txn(txn, prev_group)
-            if prev_group and potential_hops < MAX_STATE_DELTA_HOPS:
-                self._simple_insert_txn(
-                    txn,
-                    table="state_group_edges",
-                    values={"state_group": state_group, "prev_state_group": prev_group},
+        def _store_state_groups_for_event_chain_txn(txn):
+            state_groups = []
+            group = prev_group
+            for event_id, delta_ids, current_state_ids in chain:
+                group = self._store_state_group_txn(
+                    txn, event_id, room_id, group, delta_ids, current_state_ids
                 )
+                state_groups.append(group)
+            return state_groups
 
-                self._simple_insert_many_txn(
-                    txn,
-                    table="state_groups_state",
-                    values=[
-                        {
-                            "state_group": state_group,
-                            "room_id": room_id,
-                            "type": key[0],
-                            "state_key": key[1],
-                            "event_id": state_id,
-                        }
-                        for key, state_id in iteritems(delta_ids)
-                    ],
-                )
-            else:
-                self._simple_insert_many_txn(
-                    txn,
-                    table="state_groups_state",
-                    values=[
-                        {
-                            "state_group": state_group,
-                            "room_id": room_id,
-                            "type": key[0],
-                            "state_key": key[1],
-                            "event_id": state_id,
-                        }
-                        for key, state_id in iteritems(current_state_ids)
-                    ],
-                )
+        return self.runInteraction(
+            "store_state_groups_for_event_chain",
+            _store_state_groups_for_event_chain_txn,
+        )
 
-            # Prefill the state group caches with this group.
-            # It's fine to use the sequence like this as the state group map
-            # is immutable. (If the map wasn't immutable then this prefill could
-            # race with another update)
+    def _store_state_group_txn(
+        self, txn, event_id, room_id, prev_group, delta_ids, current_state_ids
+    ):
+        if current_state_ids is None:
+            # AFAIK, this can never happen
+            raise Exception("current_state_ids cannot be None")
 
-            current_member_state_ids = {
-                s: ev
-                for (s, ev) in iteritems(current_state_ids)
-                if s[0] == EventTypes.Member
-            }
-            txn.call_after(
-                self._state_group_members_cache.update,
-                self._state_group_members_cache.sequence,
-                key=state_group,
-                value=dict(current_member_state_ids),
+        state_group = self.database_engine.get_next_state_group_id(txn)
+
+        self._simple_insert_txn(
+            txn,
+            table="state_groups",
+            values={"id": state_group, "room_id": room_id, "event_id": event_id},
+        )
+
+        # We persist as a delta if we can, while also ensuring the chain
+        # of deltas isn't tooo long, as otherwise read performance degrades.
+        if prev_group:
+            is_in_db = self._simple_select_one_onecol_txn(
+                txn,
+                table="state_groups",
+                keyvalues={"id": prev_group},
+                retcol="id",
+                allow_none=True,
             )
+            if not is_in_db:
+                raise Exception(
+                    "Trying to persist state with unpersisted prev_group: %r"
+                    % (prev_group,)
+                )
 
-            current_non_member_state_ids = {
-                s: ev
-                for (s, ev) in iteritems(current_state_ids)
-                if s[0] != EventTypes.Member
-            }
-            txn.call_after(
-                self._state_group_cache.update,
-                self._state_group_cache.sequence,
-                key=state_group,
-                value=dict(current_non_member_state_ids),
+            potential_hops = self._count_state_group_hops_txn(txn, prev_group)
+        if prev_group and potential_hops < MAX_STATE_DELTA_HOPS:
+            self._simple_insert_txn(
+                txn,
+                table="state_group_edges",
+                values={"state_group": state_group, "prev_state_group": prev_group},
             )
 
-            return state_group
+            self._simple_insert_many_txn(
+                txn,
+                table="state_groups_state",
+                values=[
+                    {
+                        "state_group": state_group,
+                        "room_id": room_id,
+                        "type": key[0],
+                        "state_key": key[1],
+                        "event_id": state_id,
+                    }
+                    for key, state_id in iteritems(delta_ids)
+                ],
+            )
+        else:
+            self._simple_insert_many_txn(
+                txn,
+                table="state_groups_state",
+                values=[
+                    {
+                        "state_group": state_group,
+                        "room_id": room_id,
+                        "type": key[0],
+                        "state_key": key[1],
+                        "event_id": state_id,
+                    }
+                    for key, state_id in iteritems(current_state_ids)
+                ],
+            )
+
+        # Prefill the state group caches with this group.
+        # It's fine to use the sequence like this as the state group map
+        # is immutable. (If the map wasn't immutable then this prefill could
+        # race with another update)
+
+        current_member_state_ids = {
+            s: ev
+            for (s, ev) in iteritems(current_state_ids)
+            if s[0] == EventTypes.Member
+        }
+        txn.call_after(
+            self._state_group_members_cache.update,
+            self._state_group_members_cache.sequence,
+            key=state_group,
+            value=dict(current_member_state_ids),
+        )
+
+        current_non_member_state_ids = {
+            s: ev
+            for (s, ev) in iteritems(current_state_ids)
+            if s[0] != EventTypes.Member
+        }
+        txn.call_after(
+            self._state_group_cache.update,
+            self._state_group_cache.sequence,
+            key=state_group,
+            value=dict(current_non_member_state_ids),
+        )
 
-        return self.runInteraction("store_state_group", _store_state_group_txn)
+        return state_group
 
     def _count_state_group_hops_txn(self, txn, state_group):
         """Given a state group, count how many hops there are in the tree.
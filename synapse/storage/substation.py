@@ -2,6 +2,7 @@ import logging
 
 from synapse.storage._base import SQLBaseStore
 from synapse.api.errors import StoreError
+from synapse.util.caches.descriptors import cached
 from twisted.internet import defer
 
 logger = logging.getLogger(__name__)
@@ -9,28 +10,49 @@ logger = logging.getLogger(__name__)
 
 class SubstationStore(SQLBaseStore):
 
-    @defer.inlineCallbacks
-    def get_substations(self):
-        try:
-            substations = yield self._simple_select_list(
-                "substation",
+    @cached(num_args=0)
+    def get_substation_catalogue(self):
+        """Retrieve every substation, keyed by code.
+
+        The substations are reference data which almost never changes, so they
+        are kept in memory and looked up here rather than queried one by one.
+
+        Returns:
+            Deferred[dict[str, dict]]: substation code to a dict with the
+            `code`, `name` and `company_code` of the substation.
+        """
+
+        def get_substation_catalogue_txn(txn):
+            rows = self._simple_select_list_txn(
+                txn,
+                table="substation",
                 keyvalues=None,
-                retcols=("code", "name"),
+                retcols=("code", "name", "company_code"),
             )
+            return {row["code"]: row for row in rows}
 
-            return substations
+        return self.runInteraction(
+            "get_substation_catalogue", get_substation_catalogue_txn
+        )
+
+    @defer.inlineCallbacks
+    def get_substations(self):
+        try:
+            catalogue = yield self.get_substation_catalogue()
         except Exception as e:
             logger.warning("get_substation failed: %s", e)
             raise StoreError(500, "Problem recovering substations")
 
+        return [
+            {"code": substation["code"], "name": substation["name"]}
+            for substation in catalogue.values()
+        ]
+
     @defer.inlineCallbacks
     def get_substation_by_company_code_and_substation_code(self,
                                                            company_code, substation_code):
-        substation = yield self._simple_select_one(
-            table="substation",
-            keyvalues={"company_code": company_code, "code": substation_code},
-            retcols=("code", "name", "company_code"),
-            allow_none=True,
-            desc="get_substation_by_company_code_and_substation_code",
-        )
-        return substation
+        catalogue = yield self.get_substation_catalogue()
+        substation = catalogue.get(substation_code)
+        if substation is None or substation["company_code"] != company_code:
+            return None
+        return dict(substation)
@@ -1,13 +1,52 @@
 import logging
 
 from synapse.storage._base import SQLBaseStore
+from synapse.util.caches.descriptors import cached
 
 from twisted.internet import defer
 
 logger = logging.getLogger(__name__)
 
 
-class TableStore(SQLBaseStore):
+class TableWorkerStore(SQLBaseStore):
+
+    @cached(num_args=0)
+    def get_table_catalogue(self):
+        """Retrieve every table along with the substations it covers, keyed by
+        code.
+
+        Like the substations, the tables are reference data which almost never
+        changes, so they are kept in memory.
+
+        Returns:
+            Deferred[dict[str, dict]]: table code to a dict with the `code`,
+            `name` and `company_code` of the table, and the frozenset of
+            `substations` codes it covers.
+        """
+
+        def get_table_catalogue_txn(txn):
+            rows = self._simple_select_list_txn(
+                txn,
+                table="substations_table",
+                keyvalues=None,
+                retcols=("code", "name", "company_code"),
+            )
+            substations = {}
+            for row in self._simple_select_list_txn(
+                txn,
+                table="substation_table",
+                keyvalues=None,
+                retcols=("table_code", "substation_code"),
+            ):
+                substations.setdefault(row["table_code"], set()).add(
+                    row["substation_code"]
+                )
+
+            for row in rows:
+                row["substations"] = frozenset(substations.get(row["code"], ()))
+            return {row["code"]: row for row in rows}
+
+        return self.runInteraction("get_table_catalogue", get_table_catalogue_txn)
 
     @defer.inlineCallbacks
     def get_table_by_code(self, code):
@@ -17,29 +56,36 @@ class TableStore(SQLBaseStore):
             code (str): The table code, ex: A1.
         """
 
-        result = yield self._simple_select_list(
-            table="substations_table",
-            keyvalues={"code": code},
-            retcols=["code", "name"],
-            desc="get_table_by_code",
-        )
-        return result
+        catalogue = yield self.get_table_catalogue()
+        if code not in catalogue:
+            return []
+        return [_table_summary(catalogue[code])]
 
-    def associate_table_to_user(self, user_id, table_code):
-        """Associate table to user.
+    @cached(max_entries=5000)
+    def get_users_interested_in_substation(self, substation_code):
+        """Retrieve the users that have a table covering a substation.
 
         Args:
-            user_id (str): The User Id, ex: @nata:zapcot.com.
-            tables (str): The list of table codes.
+            substation_code (str): The substation code, ex: MIR.
+        Returns:
+            Deferred[frozenset[str]]: the user ids.
         """
 
-        return self._simple_insert(
-            table="user_substation_table",
-            values={"user_id": user_id,
-                    "table_code": table_code},
-            desc="user_substation_table",
+        def get_users_interested_in_substation_txn(txn):
+            txn.execute(
+                "SELECT DISTINCT user_id FROM user_substation_table"
+                " INNER JOIN substation_table USING (table_code)"
+                " WHERE substation_code = ?",
+                (substation_code,),
+            )
+            return frozenset(row[0] for row in txn)
+
+        return self.runInteraction(
+            "get_users_interested_in_substation",
+            get_users_interested_in_substation_txn,
         )
 
+    @defer.inlineCallbacks
     def get_tables_by_company_code(self, company_code):
         """Retrieve tables by company code.
 
@@ -47,13 +93,14 @@ class TableStore(SQLBaseStore):
             company_code (str): The company code, ex: CTEEP.
         """
 
-        return self._simple_select_list(
-            table="substations_table",
-            keyvalues={"company_code": company_code},
-            retcols=["code", "name"],
-            desc="get_tables_by_company_code",
-        )
+        catalogue = yield self.get_table_catalogue()
+        return [
+            _table_summary(table)
+            for table in catalogue.values()
+            if table["company_code"] == company_code
+        ]
 
+    @defer.inlineCallbacks
     def get_table_by_company_code_and_table_code(self, company_code, table_code):
         """Retrieve tables by company code.
 
@@ -62,11 +109,89 @@ class TableStore(SQLBaseStore):
             table_code (str): The table code, ex: A1.
         """
 
-        return self._simple_select_one(
-            table="substations_table",
-            keyvalues={"company_code": company_code,
-                       "code": table_code},
-            retcols=["code", "name"],
-            allow_none=True,
-            desc="get_table_by_company_code_and_table_code",
+        catalogue = yield self.get_table_catalogue()
+        table = catalogue.get(table_code)
+        if table is None or table["company_code"] != company_code:
+            return None
+        return _table_summary(table)
+
+
+class TableStore(TableWorkerStore):
+    def associate_table_to_user(self, user_id, table_code):
+        """Associate table to user.
+
+        Args:
+            user_id (str): The User Id, ex: @nata:zapcot.com.
+            table_code (str): The table code, ex: A1.
+        """
+        return self.associate_tables_to_users({user_id: [table_code]})
+
+    def associate_tables_to_users(self, tables_by_user, replace=False):
+        """Associate tables to many users, in a single transaction.
+
+        Args:
+            tables_by_user (dict[str, iterable[str]]): map from user id to the
+                codes of the tables to associate to the user.
+            replace (bool): whether the given tables replace those the users
+                already have, rather than being added to them.
+        """
+
+        def associate_tables_to_users_txn(txn):
+            user_ids = list(tables_by_user)
+            existing = self._simple_select_many_txn(
+                txn,
+                table="user_substation_table",
+                column="user_id",
+                iterable=user_ids,
+                keyvalues={},
+                retcols=("user_id", "table_code"),
+            )
+            existing = set((row["user_id"], row["table_code"]) for row in existing)
+
+            wanted = set(
+                (user_id, table_code)
+                for user_id, table_codes in tables_by_user.items()
+                for table_code in table_codes
+            )
+
+            removed = set()
+            if replace:
+                removed = existing - wanted
+                txn.executemany(
+                    "DELETE FROM user_substation_table"
+                    " WHERE user_id = ? AND table_code = ?",
+                    sorted(removed),
+                )
+
+            added = wanted - existing
+            self._simple_insert_many_txn(
+                txn,
+                table="user_substation_table",
+                values=[
+                    {"user_id": user_id, "table_code": table_code}
+                    for user_id, table_code in sorted(added)
+                ],
+            )
+
+            changed_tables = set(table_code for _, table_code in added | removed)
+            substation_codes = self._simple_select_many_txn(
+                txn,
+                table="substation_table",
+                column="table_code",
+                iterable=changed_tables,
+                keyvalues={},
+                retcols=("substation_code",),
+            )
+            for substation_code in set(row["substation_code"] for row in substation_codes):
+                self._invalidate_cache_and_stream(
+                    txn, self.get_users_interested_in_substation, (substation_code,)
+                )
+
+        return self.runInteraction(
+            "associate_tables_to_users", associate_tables_to_users_txn
         )
+
+
+def _table_summary(table):
+    """The fields of a catalogue table which are returned to clients."""
+    return {"code": table["code"], "name": table["name"]}
@@ -19,9 +19,27 @@ from collections import deque
 
 
 class IdGenerator(object):
-    def __init__(self, db_conn, table, column):
+    """Generates ids which are unique in a table.
+
+    Args:
+        db_conn(connection): A database connection to use to fetch the
+            initial value of the generator from.
+        table(str): A database table to read the initial value of the id
+            generator from.
+        column(str): The column of the database table to read the initial
+            value from the id generator from.
+        extra_tables(list): List of pairs of database tables and columns which
+            the ids may also be in, e.g. because rows are moved there. The
+            largest value is used.
+    """
+
+    def __init__(self, db_conn, table, column, extra_tables=()):
         self._lock = threading.Lock()
         self._next_id = _load_current_id(db_conn, table, column)
+        for table, column in extra_tables:
+            self._next_id = max(
+                self._next_id, _load_current_id(db_conn, table, column)
+            )
 
     def get_next(self):
         with self._lock:
@@ -78,7 +96,7 @@ class StreamIdGenerator(object):
             # ... persist event ...
     """
 
-    def __init__(self, db_conn, table, column, extra_tables=[], step=1):
+    def __init__(self, db_conn, table, column, extra_tables=(), step=1):
         assert step != 0
         self._lock = threading.Lock()
         self._step = step
@@ -1,10 +1,19 @@
 import logging
+from collections import Counter
 
+from six import iteritems
+
+from synapse.logging.opentracing import trace
+from synapse.metrics.background_process_metrics import run_as_background_process
 from synapse.storage._base import SQLBaseStore
+from synapse.storage.background_updates import BackgroundUpdateStore
+from synapse.storage.engines import PostgresEngine
 from synapse.api.errors import StoreError
+from synapse.util import batch_iter
+from synapse.util.caches.descriptors import cached
 from twisted.internet import defer
 
-from synapse.api.constants import SolicitationSortParams, \
+from synapse.api.constants import EventTypes, SolicitationSortParams, \
     SolicitationStatus
 
 from canonicaljson import json
@@ -13,13 +22,215 @@ logger = logging.getLogger(__name__)
 
 FIVE_MINUTES_IN_SECONDS = 300
 
+_CURRENT_STATUS_UPDATE_NAME = "solicitation_current_status"
+
+# The statuses after which a solicitation does not change any more, and can be
+# archived.
+_FINISHED_STATUSES = (
+    SolicitationStatus.EXECUTED,
+    SolicitationStatus.CANCELED,
+    SolicitationStatus.BLOCKED,
+)
+
+# How many solicitations to archive per transaction.
+_ARCHIVE_BATCH_SIZE = 500
+
+# The orderings of the solicitation listings, as lists of sort key
+# expressions which are all sorted ascending. Once the current status columns
+# are populated, the status keys must match the expressions of the
+# voltage_control_solicitation_*_order indexes so that the database can read
+# the listings in index order.
+
+# Order By Status and Timestamp
+#   Group 1: 'LATE' (Timestamp ASC)
+#   Group 2: 'ACCEPTED'
+#   Group 3: 'REQUIRED'
+#   Group 4: 'NEW'
+#   Group 5: 'CONTESTED'
+#   Group 6: 'BLOCKED', 'EXECUTED', 'CANCELED' (Timestamp DESC)
+_CTEEP_STATUS_KEYS = (
+    "(CASE WHEN %(status)s = 'LATE' THEN 1"
+    " WHEN %(status)s = 'ACCEPTED' THEN 2"
+    " WHEN %(status)s = 'REQUIRED' THEN 3"
+    " WHEN %(status)s = 'NEW' THEN 4"
+    " WHEN %(status)s = 'CONTESTED' THEN 5"
+    " WHEN %(status)s IN ('EXECUTED', 'CANCELED', 'BLOCKED') THEN 6"
+    " END)",
+    "(CASE WHEN %(status)s IN ('EXECUTED', 'CANCELED', 'BLOCKED') THEN %(ts)s * -1"
+    " ELSE %(ts)s"
+    " END)",
+)
+
+# Order By Status and Timestamp
+#   Group 1: 'BLOCKED', 'CONTESTED', 'NEW', 'REQUIRED' (Timestamp ASC)
+#   Group 2: 'LATE', 'ACCEPTED' (Timestamp ASC)
+#   Group 3: 'EXECUTED', 'CANCELED' (Timestamp DESC)
+_ONS_STATUS_KEYS = (
+    "(CASE WHEN %(status)s IN ('BLOCKED', 'CONTESTED', 'NEW', 'REQUIRED') THEN 1"
+    " WHEN %(status)s IN ('LATE', 'ACCEPTED') THEN 2"
+    " WHEN %(status)s IN ('EXECUTED', 'CANCELED') THEN 3"
+    " END)",
+    "(CASE WHEN %(status)s IN ('EXECUTED', 'CANCELED') THEN %(ts)s * -1"
+    " ELSE %(ts)s"
+    " END)",
+)
+
+# Solicitation ids are allocated in creation order.
+_CREATION_TIME_KEYS = ("%(id)s",)
+
+_SUBSTATION_KEYS = ("%(substation)s",)
+
+# Sets the current status columns of voltage_control_solicitation from the
+# latest signatures, for the rows matched by an appended WHERE clause.
+_SET_CURRENT_STATUS_FROM_SIGNATURES = """
+    UPDATE voltage_control_solicitation
+    SET current_status = (
+        SELECT status FROM solicitation_status_signature
+        WHERE solicitation_id = voltage_control_solicitation.id
+        ORDER BY time_stamp DESC, id DESC LIMIT 1
+    ), current_status_ts = (
+        SELECT time_stamp FROM solicitation_status_signature
+        WHERE solicitation_id = voltage_control_solicitation.id
+        ORDER BY time_stamp DESC, id DESC LIMIT 1
+    )
+"""
+
+SOLICITATION_COLUMNS = (
+    "id", "action_code", "equipment_code", "substation_code", "staggered",
+    "amount", "voltage", "at_", "bt", "group_id", "room_id",
+)
+
+
+def _get_sort_keys(is_order_by_cteep, sort):
+    """Get the sort key expressions of a solicitation listing.
+
+    Args:
+        is_order_by_cteep (bool): whether the status ordering is the CTEEP one
+            rather than the ONS one.
+        sort (list[str]): the SolicitationSortParams to order by.
+
+    Returns:
+        list[str]: the key templates, ending with the solicitation id so that
+        the ordering is total.
+    """
+    keys = []
+    for param in sort:
+        if param == SolicitationSortParams.STATUS:
+            if is_order_by_cteep:
+                keys.extend(_CTEEP_STATUS_KEYS)
+            else:
+                keys.extend(_ONS_STATUS_KEYS)
+        elif param == SolicitationSortParams.CREATION_TIME:
+            keys.extend(_CREATION_TIME_KEYS)
+        elif param == SolicitationSortParams.SUBSTATION:
+            keys.extend(_SUBSTATION_KEYS)
+        else:
+            raise StoreError(400, "Invalid sort param")
+
+    if "%(id)s" not in keys:
+        keys.append("%(id)s")
+
+    # A key appearing twice in the ordering has no effect after the first time.
+    return [key for i, key in enumerate(keys) if key not in keys[:i]]
+
+
+def _make_keyset_bound(keys, engine):
+    """Create an SQL expression which selects the rows that sort strictly after
+    a given sort key, i.e. the equivalent of `(key1, key2, ...) > (?, ?, ...)`.
+
+    Older versions of SQLite don't support row values so we have to expand it
+    out manually.
+
+    Args:
+        keys (list[str]): the sort key expressions. Must *not* be user
+            defined, as these get inserted directly into the SQL statement.
+        engine: The database engine to generate the SQL for
+
+    Returns:
+        str: the expression, to be used with the arguments returned by
+        `_keyset_bound_args`.
+    """
+    if _supports_row_values(engine):
+        # Row comparisons can use the ordering indexes, unlike the expanded
+        # form.
+        return "(%s) > (%s)" % (", ".join(keys), ", ".join("?" for _ in keys))
+
+    # (key1 > ? OR (key1 = ? AND key2 > ?) OR (key1 = ? AND key2 = ? AND ...))
+    clauses = []
+    for i in range(len(keys)):
+        clauses.append(
+            "(%s)"
+            % " AND ".join(["%s = ?" % (key,) for key in keys[:i]] + ["%s > ?" % (keys[i],)])
+        )
+    return "(%s)" % " OR ".join(clauses)
 
-class VoltageControlStore(SQLBaseStore):
 
+def _supports_row_values(engine):
+    if isinstance(engine, PostgresEngine):
+        return True
+    return engine.module.sqlite_version_info >= (3, 15, 0)
+
+
+def _keyset_bound_args(from_key, engine):
+    """The arguments for the expression returned by `_make_keyset_bound`."""
+    if _supports_row_values(engine):
+        return list(from_key)
+
+    args = []
+    for i in range(len(from_key)):
+        args.extend(from_key[: i + 1])
+    return args
+
+
+class VoltageControlWorkerStore(SQLBaseStore):
+    def __init__(self, db_conn, hs):
+        super(VoltageControlWorkerStore, self).__init__(db_conn, hs)
+
+        # Is voltage_control_solicitation.current_status up to date? Or is the
+        # background update still running?
+        self._solicitation_current_status_up_to_date = False
+
+        self._clock.call_later(
+            0.0,
+            run_as_background_process,
+            "_check_safe_solicitation_current_status_updated",
+            self.runInteraction,
+            "_check_safe_solicitation_current_status_updated",
+            self._check_safe_solicitation_current_status_updated_txn,
+        )
+
+    def _check_safe_solicitation_current_status_updated_txn(self, txn):
+        """Checks if it is safe to assume the current_status columns of
+        voltage_control_solicitation are up to date
+        """
+
+        pending_update = self._simple_select_one_txn(
+            txn,
+            table="background_updates",
+            keyvalues={"update_name": _CURRENT_STATUS_UPDATE_NAME},
+            retcols=["update_name"],
+            allow_none=True,
+        )
+
+        self._solicitation_current_status_up_to_date = not pending_update
+
+        # If the update is still running, reschedule to run.
+        if pending_update:
+            self._clock.call_later(
+                15.0,
+                run_as_background_process,
+                "_check_safe_solicitation_current_status_updated",
+                self.runInteraction,
+                "_check_safe_solicitation_current_status_updated",
+                self._check_safe_solicitation_current_status_updated_txn,
+            )
+
+    @trace
     @defer.inlineCallbacks
     def get_solicitation_by_id(self, id):
-        try:
-            result = yield self._simple_select_one(
+        def get_solicitation_by_id_txn(txn):
+            result = self._simple_select_one_txn(
+                txn,
                 "voltage_control_solicitation",
                 {"id": id},
                 retcols=("id", "action_code", "equipment_code", "substation_code", "amount",
@@ -27,43 +238,730 @@ class VoltageControlStore(SQLBaseStore):
                 allow_none=True,
             )
             if result:
-                result['events'] = yield self.get_events_by_solicitation_id(id)
+                result['events'] = self._get_events_by_solicitation_id_txn(txn, id)
+            return result
+
+        try:
+            result = yield self.runInteraction(
+                "get_solicitation_by_id", get_solicitation_by_id_txn
+            )
+            if result:
                 return result
             return None
         except Exception as e:
             logger.warning("get_solicitation failed: %s", e)
             raise StoreError(500, "Problem recovering solicitation")
 
+    @trace
+    def get_solicitations_by_ids(self, ids):
+        """Retrieve the given solicitations, with their status history.
+
+        Args:
+            ids (list[int]): The solicitation ids.
+
+        Returns:
+            Deferred[list[dict]]: the solicitations found, in the order of `ids`.
+        """
+
+        def get_solicitations_by_ids_txn(txn):
+            rows = self._simple_select_many_txn(
+                txn,
+                table="voltage_control_solicitation",
+                column="id",
+                iterable=ids,
+                keyvalues={},
+                retcols=SOLICITATION_COLUMNS,
+            )
+            rows_by_id = {row["id"]: row for row in rows}
+            results = [
+                rows_by_id[int(solicitation_id)]
+                for solicitation_id in ids
+                if int(solicitation_id) in rows_by_id
+            ]
+            self._add_events_to_solicitations_txn(txn, results)
+            return results
+
+        if not ids:
+            return defer.succeed([])
+
+        return self.runInteraction(
+            "get_solicitations_by_ids", get_solicitations_by_ids_txn
+        )
+
+    def _add_events_to_solicitations_txn(self, txn, solicitations):
+        """Attach the status history to each of the given solicitations, using
+        a fixed number of queries whatever the number of solicitations.
+        """
+        events = self._get_events_by_solicitation_ids_txn(
+            txn, [solicitation["id"] for solicitation in solicitations]
+        )
+        for solicitation in solicitations:
+            solicitation["events"] = events.get(solicitation["id"], [])
+
+    def get_events_by_solicitation_id(self, solicitation_id):
+        return self.runInteraction(
+            "get_events_by_solicitation_id",
+            self._get_events_by_solicitation_id_txn,
+            solicitation_id,
+        )
+
+    def _get_events_by_solicitation_id_txn(self, txn, solicitation_id):
+        events = self._get_events_by_solicitation_ids_txn(txn, [solicitation_id])
+        return events.get(int(solicitation_id), [])
+
+    def _get_events_by_solicitation_ids_txn(
+        self, txn, solicitation_ids, table="solicitation_status_signature"
+    ):
+        """Fetch the status signatures of many solicitations.
+
+        Args:
+            txn (LoggingTransaction)
+            solicitation_ids (iterable[int])
+            table (str): the table to read the signatures from, i.e. either
+                the live one or the archive.
+
+        Returns:
+            dict[int, list[dict]]: map from solicitation id to its signatures,
+            newest first. Solicitations without signatures are omitted.
+        """
+        events_by_solicitation = {}
+
+        sql = (
+            " SELECT event.solicitation_id, event.user_id, event.status, "
+            "        event.time_stamp, event.justification "
+            " FROM %s event "
+            " WHERE event.solicitation_id IN (%s) "
+            " ORDER BY event.time_stamp DESC, event.id DESC "
+        )
+
+        # SQLite limits the number of bound parameters to 999.
+        for chunk in batch_iter(solicitation_ids, 500):
+            txn.execute(sql % (table, ",".join("?" for _ in chunk)), chunk)
+            for solicitation_id, user_id, status, time_stamp, justification in txn:
+                events_by_solicitation.setdefault(solicitation_id, []).append(
+                    {
+                        "user_id": user_id,
+                        "status": status,
+                        "time_stamp": time_stamp,
+                        "justification": justification,
+                    }
+                )
+
+        return events_by_solicitation
+
+    @trace
+    def get_all_solicitation_updates(self, from_token, to_token):
+        """Get the solicitation updates between two stream positions.
+
+        Args:
+            from_token (int): exclusive lower bound of the stream
+            to_token (int): inclusive upper bound of the stream
+
+        Returns:
+            Deferred[list[dict]]: the updates, in stream order
+        """
+        from_token = int(from_token)
+        has_changed = self._solicitation_updates_stream_cache.has_any_entity_changed(
+            from_token
+        )
+        if not has_changed:
+            return defer.succeed([])
+
+        def _get_all_solicitation_updates_txn(txn):
+            sql = """
+                SELECT stream_id, solicitation_id, user_id, type, content
+                FROM solicitation_updates
+                WHERE ? < stream_id AND stream_id <= ?
+                ORDER BY stream_id ASC
+            """
+            txn.execute(sql, (from_token, to_token))
+            return [
+                {
+                    "stream_id": stream_id,
+                    "solicitation_id": solicitation_id,
+                    "user_id": user_id,
+                    "type": stype,
+                    "content": json.loads(content),
+                }
+                for stream_id, solicitation_id, user_id, stype, content in txn
+            ]
+
+        return self.runInteraction(
+            "get_all_solicitation_updates", _get_all_solicitation_updates_txn
+        )
+
+    def get_all_solicitation_changes(self, from_token, to_token, limit):
+        """Get the solicitation updates between two stream positions, for
+        the replication stream.
+
+        Args:
+            from_token (int): exclusive lower bound of the stream
+            to_token (int): inclusive upper bound of the stream
+            limit (int): maximum number of updates to return
+
+        Returns:
+            Deferred[list[tuple]]: (stream_id, solicitation_id,
+            substation_code, user_id, type, content) tuples, in stream order
+        """
+        from_token = int(from_token)
+        has_changed = self._solicitation_updates_stream_cache.has_any_entity_changed(
+            from_token
+        )
+        if not has_changed:
+            return defer.succeed([])
+
+        def _get_all_solicitation_changes_txn(txn):
+            # The solicitation may have been archived since, so we look for its
+            # substation in both tables.
+            sql = """
+                SELECT stream_id, solicitation_id,
+                    COALESCE(sol.substation_code, archive.substation_code),
+                    user_id, type, content
+                FROM solicitation_updates
+                LEFT JOIN voltage_control_solicitation AS sol
+                    ON sol.id = solicitation_id
+                LEFT JOIN voltage_control_solicitation_archive AS archive
+                    ON archive.id = solicitation_id
+                WHERE ? < stream_id AND stream_id <= ?
+                ORDER BY stream_id ASC
+                LIMIT ?
+            """
+            txn.execute(sql, (from_token, to_token, limit))
+            return [
+                (stream_id, solicitation_id, substation_code, user_id, stype,
+                 json.loads(content))
+                for stream_id, solicitation_id, substation_code, user_id, stype, content
+                in txn
+            ]
+
+        return self.runInteraction(
+            "get_all_solicitation_changes", _get_all_solicitation_changes_txn
+        )
+
+    def get_solicitation_stream_token(self):
+        return self._solicitation_updates_id_gen.get_current_token()
+
+    @trace
+    def get_solicitations(
+        self,
+        is_order_by_cteep,
+        substation_codes=None,
+        expired_before_ts=None,
+        sort=None,
+        from_key=None,
+        from_id=None,
+        limit=1000,
+    ):
+        """Get a page of solicitations, ordered for the given company, along
+        with their status history.
+
+        The page and the history of every solicitation in it are loaded in a
+        single transaction, with a number of queries that does not depend on
+        the size of the page.
+
+        Args:
+            is_order_by_cteep (bool): whether to use the CTEEP status ordering
+                rather than the ONS one.
+            substation_codes (iterable[str]|None): if given, only return the
+                solicitations of these substations.
+            expired_before_ts (int|None): if given, skip the solicitations
+                which are still NEW since before this time, in seconds.
+            sort (list[str]|None): the SolicitationSortParams to order by, in
+                order of precedence. Defaults to the status ordering.
+            from_key (list|None): the sort key of the last solicitation of the
+                previous page, as returned by a previous call with the same
+                ordering, to get the following page.
+            from_id (int|None): if given, only return solicitations with an id
+                of at least this.
+            limit (int): maximum number of solicitations to return.
+
+        Returns:
+            Deferred[tuple[list[dict], list|None]]: the solicitations, and the
+            key to pass as `from_key` to get the next page, or None if this is
+            the last page.
+        """
+
+        if self._solicitation_current_status_up_to_date:
+            sql = (
+                " SELECT %(keys)s, "
+                "        id, action_code, equipment_code, substation_code, "
+                "        staggered, amount, voltage, at_, bt, group_id, room_id "
+                " FROM voltage_control_solicitation "
+                " WHERE %(where)s "
+                " ORDER BY %(order_by)s "
+                " LIMIT ? "
+            )
+            columns = {
+                "id": "id",
+                "status": "current_status",
+                "ts": "current_status_ts",
+                "substation": "substation_code",
+            }
+        else:
+            # The current status columns are still being backfilled, so we
+            # look for the most recent signature of each solicitation instead.
+            # Signatures are only ever appended, so that is the one with the
+            # highest id.
+            sql = (
+                " SELECT %(keys)s, "
+                "        sol.id, sol.action_code, sol.equipment_code, "
+                "        sol.substation_code, sol.staggered, sol.amount, sol.voltage, "
+                "        sol.at_, sol.bt, sol.group_id, sol.room_id "
+                " FROM voltage_control_solicitation sol "
+                " INNER JOIN ( "
+                "     SELECT solicitation_id, MAX(id) AS signature_id "
+                "     FROM solicitation_status_signature "
+                "     GROUP BY solicitation_id "
+                " ) AS latest ON latest.solicitation_id = sol.id "
+                " INNER JOIN solicitation_status_signature sig "
+                "     ON sig.id = latest.signature_id "
+                " WHERE %(where)s "
+                " ORDER BY %(order_by)s "
+                " LIMIT ? "
+            )
+            columns = {
+                "id": "sol.id",
+                "status": "sig.status",
+                "ts": "sig.time_stamp",
+                "substation": "sol.substation_code",
+            }
+
+        keys = [
+            key % columns
+            for key in _get_sort_keys(is_order_by_cteep, sort or [SolicitationSortParams.STATUS])
+        ]
+
+        clauses = []
+        args = []
+
+        if substation_codes is not None:
+            substation_codes = list(substation_codes)
+            if not substation_codes:
+                return defer.succeed(([], None))
+            clauses.append(
+                "%s IN (%s)"
+                % (columns["substation"], ",".join("?" for _ in substation_codes))
+            )
+            args.extend(substation_codes)
+
+        if expired_before_ts is not None:
+            clauses.append(
+                "NOT (%(status)s = ? AND %(ts)s < ?)" % columns
+            )
+            args.extend((SolicitationStatus.NEW, expired_before_ts))
+
+        if from_id:
+            clauses.append("%(id)s >= ?" % columns)
+            args.append(from_id)
+
+        if from_key is not None:
+            if len(from_key) != len(keys):
+                raise StoreError(400, "Invalid pagination key")
+            clauses.append(_make_keyset_bound(keys, self.database_engine))
+            args.extend(_keyset_bound_args(from_key, self.database_engine))
+
+        args.append(limit)
+
+        # Only add the clauses we need, as otherwise the database may prefer
+        # another index over the ordering index.
+        sql = sql % {
+            "keys": ", ".join("%s AS key%d" % (key, i) for i, key in enumerate(keys)),
+            "where": " AND ".join(clauses) or "1 = 1",
+            "order_by": ", ".join(keys),
+        }
+
+        def get_solicitations_txn(txn):
+            txn.execute(sql, args)
+            results = self.cursor_to_dict(txn)
+
+            next_key = None
+            for solicitation in results:
+                next_key = [solicitation.pop("key%d" % i) for i in range(len(keys))]
+            if len(results) < limit:
+                next_key = None
+
+            self._add_events_to_solicitations_txn(txn, results)
+            return results, next_key
+
+        return self.runInteraction("get_solicitations", get_solicitations_txn)
+
+    def get_accepted_solicitations(self, solicitation_ids=None):
+        """Get the solicitations which are currently ACCEPTED, along with when
+        they were accepted.
+
+        Args:
+            solicitation_ids (Iterable[int]|None): only look at these
+                solicitations, rather than all of them.
+
+        Returns:
+            Deferred[list[dict]]: dicts with the `id` of the solicitation and
+            the `time_stamp` of its acceptance, in seconds.
+        """
+
+        def get_accepted_solicitations_txn(txn):
+            if self._solicitation_current_status_up_to_date:
+                sql = (
+                    " SELECT id, current_status_ts AS time_stamp "
+                    " FROM voltage_control_solicitation "
+                    " WHERE current_status = ? "
+                )
+                id_column = "id"
+            else:
+                sql = (
+                    " SELECT sol.id, sig.time_stamp "
+                    " FROM voltage_control_solicitation sol "
+                    " INNER JOIN ( "
+                    "     SELECT solicitation_id, MAX(id) AS signature_id "
+                    "     FROM solicitation_status_signature "
+                    "     GROUP BY solicitation_id "
+                    " ) AS latest ON latest.solicitation_id = sol.id "
+                    " INNER JOIN solicitation_status_signature sig "
+                    "     ON sig.id = latest.signature_id "
+                    " WHERE sig.status = ? "
+                )
+                id_column = "sol.id"
+
+            if solicitation_ids is None:
+                txn.execute(sql, (SolicitationStatus.ACCEPTED,))
+                return self.cursor_to_dict(txn)
+
+            results = []
+            for chunk in batch_iter(solicitation_ids, 500):
+                txn.execute(
+                    sql
+                    + " AND %s IN (%s)" % (id_column, ",".join("?" for _ in chunk)),
+                    [SolicitationStatus.ACCEPTED] + list(chunk),
+                )
+                results.extend(self.cursor_to_dict(txn))
+            return results
+
+        return self.runInteraction(
+            "get_accepted_solicitations", get_accepted_solicitations_txn
+        )
+
+    @cached(num_args=0)
+    def get_solicitation_status_counts(self):
+        """Count the solicitations which have not been archived, by substation
+        and current status.
+
+        Returns:
+            Deferred[dict[str, dict[str, int]]]: map from substation code to
+            map from status to the number of solicitations in it.
+        """
+
+        def get_solicitation_status_counts_txn(txn):
+            # These are maintained by VoltageControlStore, in the same
+            # transactions as the status changes.
+            txn.execute(
+                " SELECT substation_code, status, count "
+                " FROM voltage_control_solicitation_status_counts "
+                " WHERE count > 0 "
+            )
+            counts = {}
+            for substation_code, status, count in txn:
+                counts.setdefault(substation_code, {})[status] = count
+            return counts
+
+        return self.runInteraction(
+            "get_solicitation_status_counts", get_solicitation_status_counts_txn
+        )
+
+    @trace
+    def get_archived_solicitations(
+        self, substation_codes=None, from_id=None, limit=100
+    ):
+        """Get a page of the archived solicitations, most recent first, along
+        with their status history.
+
+        Args:
+            substation_codes (iterable[str]|None): if given, only return the
+                solicitations of these substations.
+            from_id (int|None): the id of the last solicitation of the
+                previous page, to get the following page.
+            limit (int): maximum number of solicitations to return.
+
+        Returns:
+            Deferred[tuple[list[dict], int|None]]: the solicitations, and the
+            id to pass as `from_id` to get the next page, or None if this is
+            the last page.
+        """
+        clauses = []
+        args = []
+
+        if substation_codes is not None:
+            substation_codes = list(substation_codes)
+            if not substation_codes:
+                return defer.succeed(([], None))
+            clauses.append(
+                "substation_code IN (%s)" % (",".join("?" for _ in substation_codes),)
+            )
+            args.extend(substation_codes)
+
+        if from_id is not None:
+            clauses.append("id < ?")
+            args.append(from_id)
+
+        args.append(limit)
+
+        sql = (
+            " SELECT %s "
+            " FROM voltage_control_solicitation_archive "
+            " WHERE %s "
+            " ORDER BY id DESC "
+            " LIMIT ? "
+        ) % (", ".join(SOLICITATION_COLUMNS), " AND ".join(clauses) or "1 = 1")
+
+        def get_archived_solicitations_txn(txn):
+            txn.execute(sql, args)
+            results = self.cursor_to_dict(txn)
+
+            events = self._get_events_by_solicitation_ids_txn(
+                txn,
+                [solicitation["id"] for solicitation in results],
+                table="solicitation_status_signature_archive",
+            )
+            for solicitation in results:
+                solicitation["events"] = events.get(solicitation["id"], [])
+
+            next_id = None
+            if len(results) == limit:
+                next_id = results[-1]["id"]
+            return results, next_id
+
+        return self.runInteraction(
+            "get_archived_solicitations", get_archived_solicitations_txn
+        )
+
+
+class VoltageControlStore(VoltageControlWorkerStore, BackgroundUpdateStore):
+    def __init__(self, db_conn, hs):
+        super(VoltageControlStore, self).__init__(db_conn, hs)
+
+        self.register_background_update_handler(
+            _CURRENT_STATUS_UPDATE_NAME, self._background_solicitation_current_status
+        )
+
+        self._solicitation_archive_retention = None
+        if hs.config.solicitation_archive_enabled:
+            self._solicitation_archive_retention = (
+                hs.config.solicitation_archive_retention // 1000
+            )
+            self._clock.looping_call(
+                self._start_archive_finished_solicitations, 60 * 60 * 1000
+            )
+
     @defer.inlineCallbacks
     def create_solicitation_status_signature(self, solicitation_id, user_id, new_status, ts, justification):
         try:
+            yield self.runInteraction(
+                "create_solicitation_status_signature",
+                self._create_solicitation_status_signature_txn,
+                solicitation_id, user_id, new_status, ts, justification,
+            )
+        except Exception as e:
+            logger.warning("change_solicitation_status failed: %s", e)
+            raise StoreError(500, "Problem on update solicitation")
 
-            self.get_solicitation_by_id(solicitation_id)
+    def _update_solicitation_status_counts_txn(self, txn, deltas):
+        """Add to the number of solicitations by substation and status.
 
-            signature_id = self._solicitation_signature_id_gen.get_next()
+        Args:
+            txn
+            deltas (dict[tuple[str, str], int]): map from (substation code,
+                status) to the number of solicitations to add, which may be
+                negative.
+        """
+        for (substation_code, status), delta in iteritems(deltas):
+            if not delta:
+                continue
 
-            yield self._simple_insert(
+            if self.database_engine.can_native_upsert:
+                txn.execute(
+                    "INSERT INTO voltage_control_solicitation_status_counts"
+                    " (substation_code, status, count) VALUES (?, ?, ?)"
+                    " ON CONFLICT (substation_code, status) DO UPDATE"
+                    " SET count = voltage_control_solicitation_status_counts.count"
+                    " + EXCLUDED.count",
+                    (substation_code, status, delta),
+                )
+                continue
+
+            # As in _simple_upsert_txn_emulated, the table is locked so that
+            # two transactions can't both insert the same row.
+            self.database_engine.lock_table(
+                txn, "voltage_control_solicitation_status_counts"
+            )
+            txn.execute(
+                "UPDATE voltage_control_solicitation_status_counts"
+                " SET count = count + ? WHERE substation_code = ? AND status = ?",
+                (delta, substation_code, status),
+            )
+            if txn.rowcount == 0:
+                self._simple_insert_txn(
+                    txn,
+                    table="voltage_control_solicitation_status_counts",
+                    values={
+                        "substation_code": substation_code,
+                        "status": status,
+                        "count": delta,
+                    },
+                )
+
+        self._invalidate_cache_and_stream(
+            txn, self.get_solicitation_status_counts, ()
+        )
+
+    def _create_solicitation_status_signature_txn(self, txn, solicitation_id, user_id, new_status, ts,
+                                                  justification):
+        """Append a status signature to a solicitation, and make it the
+        current status of the solicitation.
+        """
+        # The solicitation may predate the current status columns and not
+        # have been backfilled yet.
+        txn.execute(
+            _SET_CURRENT_STATUS_FROM_SIGNATURES
+            + " WHERE id = ? AND current_status IS NULL",
+            (solicitation_id,),
+        )
+        row = self._simple_select_one_txn(
+            txn,
+            table="voltage_control_solicitation",
+            keyvalues={"id": solicitation_id},
+            retcols=("substation_code", "current_status"),
+        )
+
+        self._simple_insert_txn(
+            txn,
+            table="solicitation_status_signature",
+            values={
+                "id": self._solicitation_signature_id_gen.get_next(),
+                "user_id": user_id,
+                "status": new_status,
+                "time_stamp": ts,
+                "solicitation_id": solicitation_id,
+                "justification": justification
+            }
+        )
+
+        self._simple_update_one_txn(
+            txn,
+            table="voltage_control_solicitation",
+            keyvalues={"id": solicitation_id},
+            updatevalues={"current_status": new_status, "current_status_ts": ts},
+        )
+
+        # A new solicitation has no status yet.
+        deltas = Counter()
+        if row["current_status"] is not None:
+            deltas[(row["substation_code"], row["current_status"])] -= 1
+        deltas[(row["substation_code"], new_status)] += 1
+        self._update_solicitation_status_counts_txn(txn, deltas)
+
+    @trace
+    @defer.inlineCallbacks
+    def change_solicitation_status(
+        self, solicitation_id, expected_status, new_status, user_id, ts, justification
+    ):
+        """Move a solicitation to a new status, if it is still in the status
+        the change was validated against.
+
+        The status is compared and set with a conditional update, in the same
+        transaction as the signature and the update event are written, so
+        concurrent changes to the same solicitation can't both succeed.
+
+        Args:
+            solicitation_id (int)
+            expected_status (str): the status the solicitation must be in.
+            new_status (str)
+            user_id (str|None): the user making the change.
+            ts (int): the time of the change, in seconds.
+            justification (str|None)
+
+        Returns:
+            Deferred[int]: the stream id of the update event.
+
+        Raises:
+            StoreError: with code 409 if the solicitation is no longer in
+                `expected_status`.
+        """
+
+        def change_solicitation_status_txn(txn, stream_id):
+            # The solicitation may predate the current status columns and not
+            # have been backfilled yet.
+            txn.execute(
+                _SET_CURRENT_STATUS_FROM_SIGNATURES
+                + " WHERE id = ? AND current_status IS NULL",
+                (solicitation_id,),
+            )
+
+            txn.execute(
+                "UPDATE voltage_control_solicitation"
+                " SET current_status = ?, current_status_ts = ?"
+                " WHERE id = ? AND current_status = ?",
+                (new_status, ts, solicitation_id, expected_status),
+            )
+            if txn.rowcount == 0:
+                raise StoreError(409, "Solicitation status has changed.")
+
+            substation_code = self._simple_select_one_onecol_txn(
+                txn,
+                table="voltage_control_solicitation",
+                keyvalues={"id": solicitation_id},
+                retcol="substation_code",
+            )
+            self._update_solicitation_status_counts_txn(
+                txn,
+                {
+                    (substation_code, expected_status): -1,
+                    (substation_code, new_status): 1,
+                },
+            )
+
+            self._simple_insert_txn(
+                txn,
                 table="solicitation_status_signature",
                 values={
-                    "id": signature_id,
+                    "id": self._solicitation_signature_id_gen.get_next(),
                     "user_id": user_id,
                     "status": new_status,
                     "time_stamp": ts,
                     "solicitation_id": solicitation_id,
-                    "justification": justification
-                }
+                    "justification": justification,
+                },
             )
 
-        except Exception as e:
-            logger.warning("change_solicitation_status failed: %s", e)
-            raise StoreError(500, "Problem on update solicitation")
+            self._simple_insert_txn(
+                txn,
+                table="solicitation_updates",
+                values={
+                    "stream_id": stream_id,
+                    "solicitation_id": solicitation_id,
+                    "user_id": user_id,
+                    "type": EventTypes.ChangeSolicitationStatus,
+                    "content": json.dumps({"status": new_status}),
+                },
+            )
+            txn.call_after(
+                self._solicitation_updates_stream_cache.entity_has_changed,
+                solicitation_id,
+                stream_id,
+            )
+
+        with self._solicitation_updates_id_gen.get_next() as stream_id:
+            yield self.runInteraction(
+                "change_solicitation_status",
+                change_solicitation_status_txn,
+                stream_id,
+            )
+
+        return stream_id
 
     @defer.inlineCallbacks
     def create_solicitation(self, action, equipment, substation, staggered, amount, voltage, at, bt, user_id, ts, status,
                             group_id, room_id):
-        try:
-            solicitation_id = self._solicitation_list_id_gen.get_next()
-            yield self._simple_insert(
+        def create_solicitation_txn(txn, solicitation_id):
+            self._simple_insert_txn(
+                txn,
                 table="voltage_control_solicitation",
                 values={
                     "id": solicitation_id,
@@ -80,7 +978,15 @@ class VoltageControlStore(SQLBaseStore):
                 }
             )
 
-            yield self.create_solicitation_status_signature(solicitation_id, user_id, status, ts, None)
+            self._create_solicitation_status_signature_txn(
+                txn, solicitation_id, user_id, status, ts, None
+            )
+
+        try:
+            solicitation_id = self._solicitation_list_id_gen.get_next()
+            yield self.runInteraction(
+                "create_solicitation", create_solicitation_txn, solicitation_id
+            )
 
             return solicitation_id
 
@@ -111,7 +1017,8 @@ class VoltageControlStore(SQLBaseStore):
                 values={
                     "id": group_id,
                     "creation_time_total": creation_time_total
-                }
+                },
+                desc="create_solicitation_group",
             )
 
             return group_id
@@ -120,6 +1027,134 @@ class VoltageControlStore(SQLBaseStore):
             logger.warning("create_solicitation_group failed: %s", e)
             raise StoreError(500, "Problem creating solicitation group.")
 
+    @trace
+    @defer.inlineCallbacks
+    def create_solicitation_group_with_solicitations(
+        self, creation_time_total, solicitations, user_id, ts, status
+    ):
+        """Create a solicitation group along with all of its solicitations,
+        their first status signature and their update events, atomically.
+
+        Args:
+            creation_time_total (str)
+            solicitations (list[dict]): the validated solicitations, as sent by
+                the client. Each one is also used as the content of its
+                creation event.
+            user_id (str): the creator of the solicitations
+            ts (int): the creation time, in seconds
+            status (str): the initial status of the solicitations
+
+        Returns:
+            Deferred[tuple[list[int], int]]: the ids of the new solicitations,
+            in the order given, and the stream id of the last update event.
+        """
+        group_id = self._solicitation_group_id_gen.get_next()
+        solicitation_ids = [
+            self._solicitation_list_id_gen.get_next() for _ in solicitations
+        ]
+        signature_ids = [
+            self._solicitation_signature_id_gen.get_next() for _ in solicitations
+        ]
+
+        def create_solicitation_group_with_solicitations_txn(txn, stream_ids):
+            self._simple_insert_txn(
+                txn,
+                table="solicitation_group",
+                values={"id": group_id, "creation_time_total": creation_time_total},
+            )
+            self._update_solicitation_status_counts_txn(
+                txn,
+                Counter(
+                    (solicitation["substation"], status)
+                    for solicitation in solicitations
+                ),
+            )
+
+            self._simple_insert_many_txn(
+                txn,
+                table="voltage_control_solicitation",
+                values=[
+                    {
+                        "id": solicitation_id,
+                        "group_id": group_id,
+                        "room_id": None,
+                        "action_code": solicitation["action"],
+                        "equipment_code": solicitation["equipment"],
+                        "substation_code": solicitation["substation"],
+                        "staggered": solicitation["staggered"],
+                        "amount": solicitation["amount"],
+                        "voltage": solicitation["voltage"],
+                        "at_": solicitation["at"],
+                        "bt": solicitation["bt"],
+                        "current_status": status,
+                        "current_status_ts": ts,
+                    }
+                    for solicitation_id, solicitation in zip(
+                        solicitation_ids, solicitations
+                    )
+                ],
+            )
+
+            self._simple_insert_many_txn(
+                txn,
+                table="solicitation_status_signature",
+                values=[
+                    {
+                        "id": signature_id,
+                        "user_id": user_id,
+                        "status": status,
+                        "time_stamp": ts,
+                        "solicitation_id": solicitation_id,
+                        "justification": None,
+                    }
+                    for signature_id, solicitation_id in zip(
+                        signature_ids, solicitation_ids
+                    )
+                ],
+            )
+
+            self._simple_insert_many_txn(
+                txn,
+                table="solicitation_updates",
+                values=[
+                    {
+                        "stream_id": stream_id,
+                        "solicitation_id": solicitation_id,
+                        "user_id": user_id,
+                        "type": EventTypes.CreateSolicitation,
+                        "content": json.dumps(solicitation),
+                    }
+                    for stream_id, solicitation_id, solicitation in zip(
+                        stream_ids, solicitation_ids, solicitations
+                    )
+                ],
+            )
+
+            for stream_id, solicitation_id in zip(stream_ids, solicitation_ids):
+                txn.call_after(
+                    self._solicitation_updates_stream_cache.entity_has_changed,
+                    solicitation_id,
+                    stream_id,
+                )
+
+        try:
+            with self._solicitation_updates_id_gen.get_next_mult(
+                len(solicitations)
+            ) as stream_ids:
+                yield self.runInteraction(
+                    "create_solicitation_group_with_solicitations",
+                    create_solicitation_group_with_solicitations_txn,
+                    stream_ids,
+                )
+
+        except Exception as e:
+            logger.warning("create_solicitation_group_with_solicitations failed: %s", e)
+            raise StoreError(500, "Problem creating solicitation group.")
+
+        if not stream_ids:
+            return solicitation_ids, self.get_solicitation_stream_token()
+        return solicitation_ids, stream_ids[-1]
+
     @defer.inlineCallbacks
     def create_solicitation_updated_event(self, event_type, solicitation_id, user_id, content):
         try:
@@ -132,10 +1167,12 @@ class VoltageControlStore(SQLBaseStore):
                         "user_id": user_id,
                         "type": event_type,
                         "content": json.dumps(content)
-                    }
+                    },
+                    desc="create_solicitation_updated_event",
+                )
+                self._solicitation_updates_stream_cache.entity_has_changed(
+                    solicitation_id, stream_id
                 )
-                if user_id:
-                    self._solicitation_updates_stream_cache.entity_has_changed(user_id, stream_id)
                 return stream_id
 
         except Exception as e:
@@ -150,194 +1187,279 @@ class VoltageControlStore(SQLBaseStore):
                 values={
                     "solicitation_id": solicitation_id,
                     "room_id": room_id,
-                }
+                },
+                desc="associate_solicitation_to_room",
             )
 
         except Exception as e:
             logger.warning("associate solicitation to room failed: %s", e)
             raise StoreError(500, "Problem associating solicitation.")
 
+    @trace
     @defer.inlineCallbacks
-    def get_events_by_solicitation_id(self, solicitation_id):
+    def mark_solicitations_late(self, solicitation_ids, ts):
+        """Move the given solicitations to LATE, if they are still ACCEPTED
+        and were accepted at least five minutes before `ts`.
 
-        def get_events_by_solicitation_id_(txn):
-            args = [solicitation_id]
+        The status signatures and the update events of all the solicitations
+        are written in a single transaction.
 
-            sql = (
-                " SELECT event.user_id, event.status, event.time_stamp, event.justification "
-                " FROM solicitation_status_signature event "
-                " WHERE event.solicitation_id = ? "
-                " ORDER BY event.time_stamp DESC "
+        Args:
+            solicitation_ids (list[int])
+            ts (int): the current time, in seconds
+
+        Returns:
+            Deferred[tuple[list[dict], int]]: the `id` and `substation_code` of
+            the solicitations which are now late, and the current position of
+            the solicitations stream.
+        """
+
+        def mark_solicitations_late_txn(txn, stream_ids):
+            for chunk in batch_iter(solicitation_ids, 500):
+                # The solicitations may predate the current status columns and
+                # not have been backfilled yet.
+                txn.execute(
+                    _SET_CURRENT_STATUS_FROM_SIGNATURES
+                    + " WHERE id IN (%s) AND current_status IS NULL"
+                    % (",".join("?" for _ in chunk),),
+                    chunk,
+                )
+
+            # The status is compared and set with a conditional update, as in
+            # change_solicitation_status, so that a solicitation which moved
+            # on after its deadline fired (e.g. to EXECUTED) is left alone.
+            late_ids = []
+            for solicitation_id in solicitation_ids:
+                txn.execute(
+                    "UPDATE voltage_control_solicitation"
+                    " SET current_status = ?, current_status_ts = ?"
+                    " WHERE id = ? AND current_status = ?"
+                    " AND current_status_ts <= ?",
+                    (
+                        SolicitationStatus.LATE,
+                        ts,
+                        solicitation_id,
+                        SolicitationStatus.ACCEPTED,
+                        ts - FIVE_MINUTES_IN_SECONDS,
+                    ),
+                )
+                if txn.rowcount == 1:
+                    late_ids.append(solicitation_id)
+
+            if not late_ids:
+                return []
+
+            late = self._simple_select_many_txn(
+                txn,
+                table="voltage_control_solicitation",
+                column="id",
+                iterable=late_ids,
+                keyvalues={},
+                retcols=("id", "substation_code"),
             )
-            txn.execute(sql, args)
 
-            return self.cursor_to_dict(txn)
+            deltas = Counter()
+            for solicitation in late:
+                substation_code = solicitation["substation_code"]
+                deltas[(substation_code, SolicitationStatus.ACCEPTED)] -= 1
+                deltas[(substation_code, SolicitationStatus.LATE)] += 1
+            self._update_solicitation_status_counts_txn(txn, deltas)
 
-        results = yield self.runInteraction(
-            "get_events_by_solicitation_id", get_events_by_solicitation_id_
-        )
-        return defer.returnValue(results)
+            self._simple_insert_many_txn(
+                txn,
+                table="solicitation_status_signature",
+                values=[
+                    {
+                        "id": self._solicitation_signature_id_gen.get_next(),
+                        "user_id": None,
+                        "status": SolicitationStatus.LATE,
+                        "time_stamp": ts,
+                        "solicitation_id": solicitation_id,
+                        "justification": None,
+                    }
+                    for solicitation_id in late_ids
+                ],
+            )
 
-    def get_all_solicitation_updates(self, user_id, from_token, to_token):
+            self._simple_insert_many_txn(
+                txn,
+                table="solicitation_updates",
+                values=[
+                    {
+                        "stream_id": stream_id,
+                        "solicitation_id": solicitation_id,
+                        "user_id": None,
+                        "type": EventTypes.ChangeSolicitationStatus,
+                        "content": json.dumps({"status": SolicitationStatus.LATE}),
+                    }
+                    for stream_id, solicitation_id in zip(stream_ids, late_ids)
+                ],
+            )
 
-        from_token = int(from_token)
-        has_changed = self._solicitation_updates_stream_cache.has_entity_changed(
-            user_id, from_token
-        )
-        if not has_changed:
-            return []
+            for stream_id, solicitation_id in zip(stream_ids, late_ids):
+                txn.call_after(
+                    self._solicitation_updates_stream_cache.entity_has_changed,
+                    solicitation_id,
+                    stream_id,
+                )
 
-        def _get_all_solicitation_updates_txn(txn):
-            sql = """
-                SELECT solicitation_id, type, content
-                FROM solicitation_updates
-                WHERE user_id = ? AND ? < stream_id AND stream_id <= ?
-            """
-            txn.execute(sql, (user_id, from_token, to_token))
-            return [
-                {
-                    "solicitation_id": solicitation_id,
-                    "type": stype,
-                    "content": json.loads(content),
-                }
-                for solicitation_id, stype, content in txn
-            ]
+            return late
 
-        return self.runInteraction(
-            "get_all_solicitation_updates", _get_all_solicitation_updates_txn
-        )
+        # Solicitation ids are unique, so there can't be more updates than
+        # solicitations. The stream ids that end up unused are just skipped.
+        solicitation_ids = list(set(solicitation_ids))
+        with self._solicitation_updates_id_gen.get_next_mult(
+            len(solicitation_ids)
+        ) as stream_ids:
+            late = yield self.runInteraction(
+                "mark_solicitations_late", mark_solicitations_late_txn, stream_ids
+            )
 
-    def get_solicitation_stream_token(self):
-        return self._solicitation_updates_id_gen.get_current_token()
+        return late, self.get_solicitation_stream_token()
 
     @defer.inlineCallbacks
-    def get_solicitations(
-        self, is_order_by_cteep, from_id=0, limit=1000
-    ):
+    def _background_solicitation_current_status(self, progress, batch_size):
+        """Fill in the current status columns of voltage_control_solicitation
+        from the latest signature of each solicitation.
 
-        """ Order By Status and Timestamp
-            Group 1: 'LATE' (Timestamp ASC)
-            Group 2: 'ACCEPTED'
-            Group 3: 'REQUIRED'
-            Group 4: 'NEW'
-            Group 5: 'CONTESTED'
-            Group 6: 'BLOCKED', 'EXECUTED', 'CANCELED' (Timestamp DESC)
+        This works by iterating over the solicitations in id order.
         """
 
-        def get_solicitations_ordered_by_cteep(txn):
+        def _background_solicitation_current_status_txn(txn, last_processed_id):
+            txn.execute(
+                """
+                    SELECT MAX(id) FROM (
+                        SELECT id FROM voltage_control_solicitation
+                        WHERE id > ? ORDER BY id ASC LIMIT ?
+                    ) AS batch
+                """,
+                (last_processed_id, batch_size),
+            )
+            row = txn.fetchone()
+            if not row or row[0] is None:
+                return 0, True
 
-            args = [from_id, limit]
+            max_id, = row
 
-            sql = (
-                " SELECT sol.id, sol.action_code, sol.equipment_code, "
-                "        sol.substation_code, sol.staggered, sol.amount, sol.voltage, "
-                "        sol.at_, sol.bt, sol.group_id, sol.room_id "
-                " FROM voltage_control_solicitation sol, solicitation_status_signature sig "
-                " WHERE sol.id >= ? AND sig.id = "
-                "       (SELECT id "
-                "        FROM (SELECT id, MAX(time_stamp) "
-                "              FROM solicitation_status_signature "
-                "              WHERE sol.id = solicitation_id) "
-                "       ) "
-                " ORDER BY "
-                "   CASE WHEN sig.status = 'LATE' THEN '1' "
-                "   WHEN sig.status = 'ACCEPTED' THEN '2' "
-                "   WHEN sig.status = 'REQUIRED' THEN '3' "
-                "   WHEN sig.status = 'NEW' THEN '4' "
-                "   WHEN sig.status = 'CONTESTED' THEN '5' "
-                "   WHEN sig.status in ('EXECUTED', 'CANCELED', 'BLOCKED') THEN '6' "
-                "   END ASC, "
-                "   CASE WHEN sig.status IN ('EXECUTED', 'CANCELED', 'BLOCKED') THEN (sig.time_stamp * -1) "
-                "        ELSE sig.time_stamp  "
-                "   END ASC "
-                "   LIMIT ? "
+            txn.execute(
+                _SET_CURRENT_STATUS_FROM_SIGNATURES + " WHERE ? < id AND id <= ?",
+                (last_processed_id, max_id),
+            )
+            processed = txn.rowcount
 
+            self._background_update_progress_txn(
+                txn, _CURRENT_STATUS_UPDATE_NAME, {"last_processed_id": max_id}
             )
 
-            txn.execute(sql, args)
+            return processed, False
 
-            return self.cursor_to_dict(txn)
+        last_processed_id = progress.get("last_processed_id", 0)
 
-        """ Order By Status and Timestamp
-            Group 1: 'BLOCKED', 'CONTESTED', 'NEW', 'REQUIRED' (Timestamp ASC)
-            Group 2: 'LATE', 'ACCEPTED' (Timestamp ASC)
-            Group 3: 'EXECUTED', 'CANCELED' (Timestamp DESC)
-        """
-        def get_solicitations_ordered_by_ons(txn):
+        row_count, finished = yield self.runInteraction(
+            "_background_solicitation_current_status",
+            _background_solicitation_current_status_txn,
+            last_processed_id,
+        )
 
-            args = [from_id, limit]
+        if finished:
+            yield self._end_background_update(_CURRENT_STATUS_UPDATE_NAME)
+            self._solicitation_current_status_up_to_date = True
 
-            sql = (
-                " SELECT sol.id, sol.action_code, sol.equipment_code, "
-                "        sol.substation_code, sol.staggered, sol.amount, sol.voltage, "
-                "        sol.at_, sol.bt, sol.group_id, sol.room_id "
-                " FROM voltage_control_solicitation sol, solicitation_status_signature sig "
-                " WHERE sol.id >= ? AND sig.id = "
-                "       (SELECT id "
-                "        FROM (SELECT id, MAX(time_stamp) "
-                "              FROM solicitation_status_signature "
-                "              WHERE sol.id = solicitation_id) "
-                "       ) "
-                " ORDER BY "
-                "   CASE WHEN sig.status IN ('BLOCKED', 'CONTESTED', 'NEW', 'REQUIRED') THEN '1' "
-                "        WHEN sig.status IN ('LATE', 'ACCEPTED') THEN '2' "
-                "        WHEN sig.status IN ('EXECUTED', 'CANCELED') THEN '3' "
-                "   END ASC, "
-                "   CASE WHEN sig.status IN ('EXECUTED', 'CANCELED') THEN (sig.time_stamp * -1) "
-                "        ELSE sig.time_stamp  "
-                "   END ASC "
-                "   LIMIT ? "
-            )
+        return row_count
 
-            txn.execute(sql, args)
+    def _start_archive_finished_solicitations(self):
+        return run_as_background_process(
+            "archive_finished_solicitations", self._archive_finished_solicitations
+        )
 
-            return self.cursor_to_dict(txn)
+    @defer.inlineCallbacks
+    def _archive_finished_solicitations(self):
+        # We find the finished solicitations from their current status.
+        if not self._solicitation_current_status_up_to_date:
+            return
 
-        if is_order_by_cteep:
-            query_to_call = get_solicitations_ordered_by_cteep
-        else:
-            query_to_call = get_solicitations_ordered_by_ons
+        before_ts = int(self._clock.time()) - self._solicitation_archive_retention
 
-        results = yield self.runInteraction(
-            "get_solicitations", query_to_call
-        )
+        # Move the solicitations in batches, so as not to hold locks on the
+        # live tables for too long.
+        while True:
+            archived = yield self.archive_finished_solicitations(
+                before_ts, _ARCHIVE_BATCH_SIZE
+            )
+            if archived < _ARCHIVE_BATCH_SIZE:
+                break
 
-        for solicitation in results:
-            events = yield self.get_events_by_solicitation_id(solicitation['id'])
-            solicitation['events'] = events
+    @trace
+    def archive_finished_solicitations(self, before_ts, limit):
+        """Move a batch of finished solicitations, along with their signatures,
+        to the archive tables.
 
-        defer.returnValue(results)
+        Args:
+            before_ts (int): only archive the solicitations which finished
+                before this time, in seconds.
+            limit (int): maximum number of solicitations to archive.
 
-    @defer.inlineCallbacks
-    def get_late_solicitations_with_status_new(self, current_time):
+        Returns:
+            Deferred[int]: the number of solicitations archived.
         """
-        :param current_time: current time in seconds
-        :return: late solicitations
-        """
-
-        def get_late_solicitations_with_status_new_(txn):
-            args = [current_time, FIVE_MINUTES_IN_SECONDS]
 
-            sql = (
-                " SELECT sol.id "
-                " FROM voltage_control_solicitation sol, solicitation_status_signature sig "
-                " WHERE sig.status = 'ACCEPTED' AND sig.id = "
-                "       (SELECT id FROM "
-                "             (SELECT id, time_stamp "
-                "              FROM (SELECT id, MAX(time_stamp) as time_stamp "
-                "                    FROM solicitation_status_signature "
-                "                    WHERE sol.id = solicitation_id) "
-                "              WHERE (? - time_stamp) >= ?)) "
+        def archive_finished_solicitations_txn(txn):
+            txn.execute(
+                " SELECT id FROM voltage_control_solicitation "
+                " WHERE current_status IN (%s) AND current_status_ts < ? "
+                " ORDER BY id "
+                " LIMIT ? " % (",".join("?" for _ in _FINISHED_STATUSES),),
+                list(_FINISHED_STATUSES) + [before_ts, limit],
             )
+            solicitation_ids = [row[0] for row in txn]
+            if not solicitation_ids:
+                return 0
 
-            txn.execute(sql, args)
+            in_list = ",".join("?" for _ in solicitation_ids)
 
-            return self.cursor_to_dict(txn)
+            # Archived solicitations are not counted.
+            txn.execute(
+                " SELECT substation_code, current_status, COUNT(*) "
+                " FROM voltage_control_solicitation WHERE id IN (%s) "
+                " GROUP BY substation_code, current_status " % (in_list,),
+                solicitation_ids,
+            )
+            self._update_solicitation_status_counts_txn(
+                txn,
+                {
+                    (substation_code, status): -count
+                    for substation_code, status, count in txn.fetchall()
+                },
+            )
 
-        query_to_call = get_late_solicitations_with_status_new_
+            txn.execute(
+                " INSERT INTO voltage_control_solicitation_archive "
+                " (%(columns)s, current_status, current_status_ts) "
+                " SELECT %(columns)s, current_status, current_status_ts "
+                " FROM voltage_control_solicitation WHERE id IN (%(ids)s) "
+                % {"columns": ", ".join(SOLICITATION_COLUMNS), "ids": in_list},
+                solicitation_ids,
+            )
+            txn.execute(
+                " INSERT INTO solicitation_status_signature_archive "
+                " (id, user_id, status, time_stamp, solicitation_id, justification) "
+                " SELECT id, user_id, status, time_stamp, solicitation_id, justification "
+                " FROM solicitation_status_signature WHERE solicitation_id IN (%s) "
+                % (in_list,),
+                solicitation_ids,
+            )
+            txn.execute(
+                "DELETE FROM solicitation_status_signature WHERE solicitation_id IN (%s)"
+                % (in_list,),
+                solicitation_ids,
+            )
+            txn.execute(
+                "DELETE FROM voltage_control_solicitation WHERE id IN (%s)" % (in_list,),
+                solicitation_ids,
+            )
 
-        results = yield self.runInteraction(
-            "get_late_solicitations_with_status_new", query_to_call
-        )
+            return len(solicitation_ids)
 
-        defer.returnValue(results)
\ No newline at end of file
+        return self.runInteraction(
+            "archive_finished_solicitations", archive_finished_solicitations_txn
+        )
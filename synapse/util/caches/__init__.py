@@ -27,6 +27,28 @@ logger = logging.getLogger(__name__)
 CACHE_SIZE_FACTOR = float(os.environ.get("SYNAPSE_CACHE_FACTOR", 0.5))
 
 
+def _parse_memory_size(value):
+    """Parse a size in bytes, which may have a K, M or G suffix.
+
+    Returns:
+        int|None: the size in bytes, or None if `value` is empty.
+    """
+    if not value:
+        return None
+    sizes = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    size = 1
+    suffix = value[-1].upper()
+    if suffix in sizes:
+        value = value[:-1]
+        size = sizes[suffix]
+    return int(value) * size
+
+
+# The total size, in bytes, which the LruCaches of this process may use between
+# them. Unset by default, in which case only the per-cache sizes apply.
+CACHE_MEMORY_BUDGET = _parse_memory_size(os.environ.get("SYNAPSE_CACHE_MEMORY_BUDGET"))
+
+
 def get_cache_factor_for(cache_name):
     env_var = "SYNAPSE_CACHE_FACTOR_" + cache_name.upper()
     factor = os.environ.get(env_var)
@@ -36,6 +58,30 @@ def get_cache_factor_for(cache_name):
     return CACHE_SIZE_FACTOR
 
 
+def get_expiry_arguments(hs, cache_name):
+    """Get the arguments which make an LruCache expire its entries as
+    configured for `cache_name` in `cache_expiry`.
+
+    Args:
+        hs (HomeServer|None)
+        cache_name (str)
+
+    Returns:
+        dict: the keyword arguments, empty if the entries don't expire.
+    """
+    if hs is None:
+        return {}
+    expiry = hs.config.cache_expiry.get(cache_name)
+    if expiry is None:
+        return {}
+    return {
+        "clock": hs.get_clock(),
+        "expiry_ms": expiry.ttl,
+        "idle_expiry_ms": expiry.idle_time,
+        "sweep_interval_ms": hs.config.cache_sweep_interval,
+    }
+
+
 caches_by_name = {}
 collectors_by_name = {}
 
@@ -28,7 +28,7 @@ from twisted.internet import defer
 from synapse.logging.context import make_deferred_yieldable, preserve_fn
 from synapse.util import unwrapFirstError
 from synapse.util.async_helpers import ObservableDeferred
-from synapse.util.caches import get_cache_factor_for
+from synapse.util.caches import get_cache_factor_for, get_expiry_arguments
 from synapse.util.caches.lrucache import LruCache
 from synapse.util.caches.treecache import TreeCache, iterate_tree_cache_entry
 
@@ -73,7 +73,14 @@ class Cache(object):
         "_pending_deferred_cache",
     )
 
-    def __init__(self, name, max_entries=1000, keylen=1, tree=False, iterable=False):
+    def __init__(
+        self, name, max_entries=1000, keylen=1, tree=False, iterable=False, hs=None
+    ):
+        """
+        Args:
+            hs (HomeServer|None): if given, the entries expire as configured for
+                this cache in `cache_expiry`.
+        """
         cache_type = TreeCache if tree else dict
         self._pending_deferred_cache = cache_type()
 
@@ -83,6 +90,8 @@ class Cache(object):
             cache_type=cache_type,
             size_callback=(lambda d: len(d)) if iterable else None,
             evicted_callback=self._on_evicted,
+            name=name,
+            **get_expiry_arguments(hs, name)
         )
 
         self.name = name
@@ -365,6 +374,7 @@ class CacheDescriptor(_CacheDescriptorBase):
             keylen=self.num_args,
             tree=self.tree,
             iterable=self.iterable,
+            hs=getattr(obj, "hs", None),
         )
 
         def get_cache_key_gen(args, kwargs):
@@ -19,7 +19,7 @@ from collections import namedtuple
 
 from synapse.util.caches.lrucache import LruCache
 
-from . import register_cache
+from . import get_expiry_arguments, register_cache
 
 logger = logging.getLogger(__name__)
 
@@ -40,13 +40,28 @@ class DictionaryEntry(namedtuple("DictionaryEntry", ("full", "known_absent", "va
         return len(self.value)
 
 
+# The known_absent of the full entries. There are no absent keys to track for
+# them, and an empty set per entry would cost as much as the rest of the entry.
+_NO_KNOWN_ABSENT = frozenset()
+
+
 class DictionaryCache(object):
     """Caches key -> dictionary lookups, supporting caching partial dicts, i.e.
     fetching a subset of dictionary keys for a particular key.
     """
 
-    def __init__(self, name, max_entries=1000):
-        self.cache = LruCache(max_size=max_entries, size_callback=len)
+    def __init__(self, name, max_entries=1000, hs=None):
+        """
+        Args:
+            hs (HomeServer|None): if given, the entries expire as configured for
+                this cache in `cache_expiry`.
+        """
+        self.cache = LruCache(
+            max_size=max_entries,
+            size_callback=len,
+            name=name,
+            **get_expiry_arguments(hs, name)
+        )
 
         self.name = name
         self.sequence = 0
@@ -130,7 +145,7 @@ class DictionaryCache(object):
             # Only update the cache if the caches sequence number matches the
             # number that the cache had before the SELECT was started (SYN-369)
             if fetched_keys is None:
-                self._insert(key, value, set())
+                self._insert(key, value, _NO_KNOWN_ABSENT)
             else:
                 self._update_or_insert(key, value, fetched_keys)
 
@@ -138,7 +153,11 @@ class DictionaryCache(object):
         # We pop and reinsert as we need to tell the cache the size may have
         # changed
 
-        entry = self.cache.pop(key, DictionaryEntry(False, set(), {}))
+        entry = self.cache.pop(key, None)
+        if entry is None:
+            entry = DictionaryEntry(False, set(), {})
+        elif entry.known_absent is _NO_KNOWN_ABSENT:
+            entry = DictionaryEntry(entry.full, set(), entry.value)
         entry.value.update(value)
         entry.known_absent.update(known_absent)
         self.cache[key] = entry
@@ -14,11 +14,19 @@
 # limitations under the License.
 
 
+import sys
 import threading
 from functools import wraps
 
+from synapse.metrics.background_process_metrics import run_as_background_process
+from synapse.util.caches.memory_budget import estimate_size, get_cache_memory_budget
 from synapse.util.caches.treecache import TreeCache
 
+# The most entries looked at by each sweep for expired entries. The sweeps
+# resume where the previous one stopped, so that a large cache is gone through
+# over several sweeps rather than at once.
+SWEEP_BATCH_SIZE = 1000
+
 
 def enumerate_leaves(node, depth):
     if depth == 0:
@@ -30,9 +38,16 @@ def enumerate_leaves(node, depth):
 
 
 class _Node(object):
+    """An entry of an LruCache.
+
+    `callbacks` is None rather than an empty set when there are no callbacks,
+    as most entries never get any and an empty set costs more than the rest of
+    the node.
+    """
+
     __slots__ = ["prev_node", "next_node", "key", "value", "callbacks"]
 
-    def __init__(self, prev_node, next_node, key, value, callbacks=set()):
+    def __init__(self, prev_node, next_node, key, value, callbacks=None):
         self.prev_node = prev_node
         self.next_node = next_node
         self.key = key
@@ -40,6 +55,44 @@ class _Node(object):
         self.callbacks = callbacks
 
 
+class _BudgetNode(_Node):
+    """A node which is also on the list of a CacheMemoryBudget."""
+
+    __slots__ = ["budget_prev", "budget_next", "memory_size", "owner"]
+
+    def __init__(self, prev_node, next_node, key, value, callbacks=None):
+        super(_BudgetNode, self).__init__(prev_node, next_node, key, value, callbacks)
+        self.budget_prev = None
+        self.budget_next = None
+        self.memory_size = 0
+        self.owner = None
+
+
+class _TimedNode(_Node):
+    """A node of a cache whose entries expire."""
+
+    __slots__ = ["set_ts", "access_ts"]
+
+
+class _TimedBudgetNode(_BudgetNode):
+    __slots__ = ["set_ts", "access_ts"]
+
+
+# What a node costs on top of its key and value: the node itself, and roughly
+# its slot in the dict of the cache.
+_NODE_OVERHEAD = sys.getsizeof(_BudgetNode(None, None, None, None)) + 100
+
+
+class _BudgetMember(object):
+    """How a CacheMemoryBudget refers to one of the LruCaches it tracks."""
+
+    __slots__ = ["name", "evict_node"]
+
+    def __init__(self, name, evict_node):
+        self.name = name
+        self.evict_node = evict_node
+
+
 class LruCache(object):
     """
     Least-recently-used cache.
@@ -57,6 +110,14 @@ class LruCache(object):
         cache_type=dict,
         size_callback=None,
         evicted_callback=None,
+        name=None,
+        memory_size_callback=None,
+        memory_budget=None,
+        use_memory_budget=True,
+        clock=None,
+        expiry_ms=None,
+        idle_expiry_ms=None,
+        sweep_interval_ms=30 * 1000,
     ):
         """
         Args:
@@ -73,6 +134,32 @@ class LruCache(object):
             evicted_callback (func(int)|None):
                 if not None, called on eviction with the size of the evicted
                 entry
+
+            name (str|None): the name under which the memory used by this
+                cache is reported.
+
+            memory_size_callback (func(V) -> int | None):
+                estimates the number of bytes used by a value. Defaults to
+                `estimate_size`.
+
+            memory_budget (CacheMemoryBudget|None): the budget to track the
+                entries of this cache against. Defaults to the one of the
+                process, if SYNAPSE_CACHE_MEMORY_BUDGET is set.
+
+            use_memory_budget (bool): whether to track the entries against a
+                memory budget at all.
+
+            clock (Clock|None): used to expire the entries. Required if
+                `expiry_ms` or `idle_expiry_ms` is set.
+
+            expiry_ms (int|None): if set, how long after being set an entry
+                expires.
+
+            idle_expiry_ms (int|None): if set, how long after being last set or
+                read an entry expires.
+
+            sweep_interval_ms (int): how often to look for expired entries.
+                They are also dropped when they are read.
         """
         cache = cache_type()
         self.cache = cache  # Used for introspection.
@@ -82,13 +169,38 @@ class LruCache(object):
 
         lock = threading.Lock()
 
+        if not use_memory_budget:
+            memory_budget = None
+        elif memory_budget is None:
+            memory_budget = get_cache_memory_budget()
+        if memory_size_callback is None:
+            memory_size_callback = estimate_size
+
+        def memory_size(key, value):
+            return _NODE_OVERHEAD + estimate_size(key) + memory_size_callback(value)
+
+        timed = bool(expiry_ms or idle_expiry_ms)
+        if memory_budget is None:
+            node_class = _TimedNode if timed else _Node
+        else:
+            node_class = _TimedBudgetNode if timed else _BudgetNode
+
+        def has_expired(node, now):
+            if expiry_ms and now - node.set_ts > expiry_ms:
+                return True
+            if idle_expiry_ms and now - node.access_ts > idle_expiry_ms:
+                return True
+            return False
+
+        def evict_node(node):
+            evicted_len = delete_node(node)
+            cache.pop(node.key, None)
+            if evicted_callback:
+                evicted_callback(evicted_len)
+
         def evict():
             while cache_len() > max_size:
-                todelete = list_root.prev_node
-                evicted_len = delete_node(todelete)
-                cache.pop(todelete.key, None)
-                if evicted_callback:
-                    evicted_callback(evicted_len)
+                evict_node(list_root.prev_node)
 
         def synchronized(f):
             @wraps(f)
@@ -111,10 +223,16 @@ class LruCache(object):
 
         self.len = synchronized(cache_len)
 
-        def add_node(key, value, callbacks=set()):
+        def add_node(key, value, callbacks=None):
             prev_node = list_root
             next_node = prev_node.next_node
-            node = _Node(prev_node, next_node, key, value, callbacks)
+            node = node_class(prev_node, next_node, key, value, callbacks)
+            if timed:
+                node.set_ts = node.access_ts = clock.time_msec()
+            if memory_budget is not None:
+                node.owner = budget_member
+                node.memory_size = memory_size(key, value)
+                memory_budget.add(node)
             prev_node.next_node = node
             next_node.prev_node = node
             cache[key] = node
@@ -122,6 +240,20 @@ class LruCache(object):
             if size_callback:
                 cached_cache_len[0] += size_callback(node.value)
 
+        def add_callbacks(node, callbacks):
+            if not callbacks:
+                return
+            if node.callbacks is None:
+                node.callbacks = set(callbacks)
+            else:
+                node.callbacks.update(callbacks)
+
+        def run_callbacks(node):
+            if node.callbacks:
+                for cb in node.callbacks:
+                    cb()
+            node.callbacks = None
+
         def move_node_to_front(node):
             prev_node = node.prev_node
             next_node = node.next_node
@@ -134,28 +266,38 @@ class LruCache(object):
             prev_node.next_node = node
             next_node.prev_node = node
 
+            if memory_budget is not None:
+                memory_budget.touch(node)
+
         def delete_node(node):
             prev_node = node.prev_node
             next_node = node.next_node
             prev_node.next_node = next_node
             next_node.prev_node = prev_node
 
+            if memory_budget is not None:
+                memory_budget.remove(node)
+
             deleted_len = 1
             if size_callback:
                 deleted_len = size_callback(node.value)
                 cached_cache_len[0] -= deleted_len
 
-            for cb in node.callbacks:
-                cb()
-            node.callbacks.clear()
+            run_callbacks(node)
             return deleted_len
 
         @synchronized
         def cache_get(key, default=None, callbacks=[]):
             node = cache.get(key, None)
             if node is not None:
+                if timed:
+                    now = clock.time_msec()
+                    if has_expired(node, now):
+                        evict_node(node)
+                        return default
+                    node.access_ts = now
                 move_node_to_front(node)
-                node.callbacks.update(callbacks)
+                add_callbacks(node, callbacks)
                 return node.value
             else:
                 return default
@@ -168,9 +310,7 @@ class LruCache(object):
                 # the inequality check to take a long time. So let's only do
                 # the check if we have some callbacks to call.
                 if node.callbacks and value != node.value:
-                    for cb in node.callbacks:
-                        cb()
-                    node.callbacks.clear()
+                    run_callbacks(node)
 
                 # We don't bother to protect this by value != node.value as
                 # generally size_callback will be cheap compared with equality
@@ -180,18 +320,26 @@ class LruCache(object):
                     cached_cache_len[0] -= size_callback(node.value)
                     cached_cache_len[0] += size_callback(value)
 
-                node.callbacks.update(callbacks)
+                add_callbacks(node, callbacks)
 
                 move_node_to_front(node)
                 node.value = value
+
+                if timed:
+                    node.set_ts = node.access_ts = clock.time_msec()
+                if memory_budget is not None:
+                    memory_budget.resize(node, memory_size(key, value))
             else:
-                add_node(key, value, set(callbacks))
+                add_node(key, value, set(callbacks) if callbacks else None)
 
             evict()
 
         @synchronized
         def cache_set_default(key, value):
             node = cache.get(key, None)
+            if node is not None and timed and has_expired(node, clock.time_msec()):
+                evict_node(node)
+                node = None
             if node is not None:
                 return node.value
             else:
@@ -205,6 +353,8 @@ class LruCache(object):
             if node:
                 delete_node(node)
                 cache.pop(node.key, None)
+                if timed and has_expired(node, clock.time_msec()):
+                    return default
                 return node.value
             else:
                 return default
@@ -225,16 +375,80 @@ class LruCache(object):
             list_root.next_node = list_root
             list_root.prev_node = list_root
             for node in cache.values():
-                for cb in node.callbacks:
-                    cb()
+                if memory_budget is not None:
+                    memory_budget.remove(node)
+                run_callbacks(node)
             cache.clear()
             if size_callback:
                 cached_cache_len[0] = 0
 
         @synchronized
         def cache_contains(key):
+            if timed:
+                node = cache.get(key, None)
+                return node is not None and not has_expired(node, clock.time_msec())
             return key in cache
 
+        @synchronized
+        def cache_evict_node(node):
+            if cache.get(node.key) is not node:
+                # It has been removed or replaced since it was picked.
+                return
+            evict_node(node)
+
+        # The node the next sweep starts from, or None to start from the least
+        # recently used one.
+        sweep_cursor = [None]
+
+        @synchronized
+        def sweep():
+            now = clock.time_msec()
+            node = sweep_cursor[0]
+            if node is None or cache.get(node.key) is not node:
+                node = list_root.prev_node
+
+            for _ in range(SWEEP_BATCH_SIZE):
+                if node is list_root:
+                    node = None
+                    break
+                newer_node = node.prev_node
+                if has_expired(node, now):
+                    evict_node(node)
+                elif not expiry_ms:
+                    # The list is ordered by last access, so none of the more
+                    # recently used entries are idle either.
+                    node = None
+                    break
+                node = newer_node
+
+            sweep_cursor[0] = node
+
+        if timed:
+
+            def sweep_in_background():
+                return run_as_background_process(
+                    "sweep_cache_%s" % (name or "unnamed",), sweep
+                )
+
+            clock.looping_call(sweep_in_background, sweep_interval_ms)
+
+        if memory_budget is not None:
+            budget_member = _BudgetMember(name or "unnamed", cache_evict_node)
+
+            # The budget evicts from any cache, including this one, so it must
+            # run once we have released our lock.
+            def with_budget_eviction(f):
+                @wraps(f)
+                def inner(*args, **kwargs):
+                    result = f(*args, **kwargs)
+                    memory_budget.evict()
+                    return result
+
+                return inner
+
+            cache_set = with_budget_eviction(cache_set)
+            cache_set_default = with_budget_eviction(cache_set_default)
+
         self.sentinel = object()
         self.get = cache_get
         self.set = cache_set
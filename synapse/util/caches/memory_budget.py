@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A memory budget shared by the caches of the process.
+
+Each cache is still bounded by its own number of entries, but when a budget is
+set (with the SYNAPSE_CACHE_MEMORY_BUDGET environment variable) the entries of
+all the LruCaches are also kept on a single, process-wide LRU list along with
+an estimate of their size in bytes. Whenever the estimated total goes over the
+budget, entries are evicted from the cold end of that list, whichever cache
+they belong to.
+"""
+
+import logging
+import sys
+import threading
+
+from six import integer_types, string_types
+
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+from synapse.util import caches
+
+logger = logging.getLogger(__name__)
+
+# How many of the least recently used entries are looked at on each eviction.
+# The largest of them is evicted, so that one big entry goes before several
+# small ones which were used at about the same time.
+EVICTION_SAMPLE_SIZE = 8
+
+# How deep estimate_size follows containers and object attributes.
+ESTIMATE_MAX_DEPTH = 8
+
+_ATOMIC_TYPES = (bool, float, bytes, type, type(None)) + integer_types + string_types
+
+
+def estimate_size(value, max_depth=ESTIMATE_MAX_DEPTH):
+    """Estimate the number of bytes used by a value, including the objects it
+    refers to.
+
+    Containers, instance dicts and slots are followed down to `max_depth`
+    levels. An object referred to more than once within `value` is only
+    counted once, but objects shared with other values (such as interned
+    strings) are counted in full, so this tends to over-estimate.
+
+    Args:
+        value (object)
+        max_depth (int)
+
+    Returns:
+        int
+    """
+    seen = set()
+
+    def size_of(obj, depth):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+
+        size = sys.getsizeof(obj, 0)
+        if depth >= max_depth or isinstance(obj, _ATOMIC_TYPES):
+            return size
+        depth += 1
+
+        # Go through the base classes to iterate, as some subclasses (such as
+        # UserID) refuse to be iterated.
+        if isinstance(obj, dict):
+            for k, v in dict.items(obj):
+                size += size_of(k, depth) + size_of(v, depth)
+        elif isinstance(obj, tuple):
+            for item in tuple.__iter__(obj):
+                size += size_of(item, depth)
+        elif isinstance(obj, (list, set, frozenset)):
+            for item in obj:
+                size += size_of(item, depth)
+        else:
+            attrs = getattr(obj, "__dict__", None)
+            if attrs is not None:
+                size += size_of(attrs, depth)
+            for slot in _slots_of(type(obj)):
+                size += size_of(getattr(obj, slot, None), depth)
+        return size
+
+    return size_of(value, 0)
+
+
+def _slots_of(cls):
+    """Get the names of all the slots of a class, including the inherited ones.
+    """
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, string_types):
+            slots = (slots,)
+        for slot in slots:
+            if slot not in ("__dict__", "__weakref__"):
+                yield slot
+
+
+class CacheMemoryBudget(object):
+    """Keeps the entries of several LruCaches on a single LRU list, and evicts
+    from it whenever their total estimated size goes over `max_bytes`.
+
+    The nodes which are tracked need `budget_prev`, `budget_next`,
+    `memory_size` and `owner` attributes, where `owner` has a `name` and an
+    `evict_node(node)` method which removes the node from its cache.
+    """
+
+    def __init__(self, max_bytes, sample_size=EVICTION_SAMPLE_SIZE):
+        self.max_bytes = max_bytes
+        self.sample_size = sample_size
+        self.total_bytes = 0
+        self.bytes_by_name = {}
+        self.evictions = 0
+
+        self._root = _ListRoot()
+        self._lock = threading.Lock()
+
+    def add(self, node):
+        """Start tracking a node, as the most recently used one."""
+        with self._lock:
+            self._link_at_front(node)
+            self._account(node.owner.name, node.memory_size)
+
+    def touch(self, node):
+        """Mark a tracked node as the most recently used one."""
+        with self._lock:
+            if node.budget_prev is None:
+                # It is being evicted.
+                return
+            self._unlink(node)
+            self._link_at_front(node)
+
+    def resize(self, node, memory_size):
+        """Update the size of a tracked node, after its value changed."""
+        with self._lock:
+            if node.budget_prev is not None:
+                self._account(node.owner.name, memory_size - node.memory_size)
+            node.memory_size = memory_size
+
+    def remove(self, node):
+        """Stop tracking a node. Does nothing if it isn't tracked."""
+        with self._lock:
+            if node.budget_prev is None:
+                return
+            self._unlink(node)
+            self._account(node.owner.name, -node.memory_size)
+
+    def account(self, name, delta):
+        """Count memory which is used by a cache but can't be evicted from
+        here, such as that of a StreamChangeCache.
+        """
+        with self._lock:
+            self._account(name, delta)
+
+    def evict(self):
+        """Evict entries until we are within the budget.
+
+        This must not be called with the lock of any of the caches held, as the
+        evicted nodes are removed from their caches.
+        """
+        while True:
+            with self._lock:
+                if self.total_bytes <= self.max_bytes:
+                    return
+                node = self._pick_victim()
+                if node is None:
+                    return
+                self._unlink(node)
+                self._account(node.owner.name, -node.memory_size)
+                self.evictions += 1
+
+            node.owner.evict_node(node)
+
+    def _pick_victim(self):
+        """Get the largest of the `sample_size` least recently used nodes."""
+        victim = None
+        node = self._root.budget_prev
+        for _ in range(self.sample_size):
+            if node is self._root:
+                break
+            if victim is None or node.memory_size > victim.memory_size:
+                victim = node
+            node = node.budget_prev
+        return victim
+
+    def _account(self, name, delta):
+        self.total_bytes += delta
+        self.bytes_by_name[name] = self.bytes_by_name.get(name, 0) + delta
+
+    def _link_at_front(self, node):
+        root = self._root
+        node.budget_prev = root
+        node.budget_next = root.budget_next
+        root.budget_next.budget_prev = node
+        root.budget_next = node
+
+    def _unlink(self, node):
+        node.budget_prev.budget_next = node.budget_next
+        node.budget_next.budget_prev = node.budget_prev
+        node.budget_prev = None
+        node.budget_next = None
+
+
+class _ListRoot(object):
+    __slots__ = ["budget_prev", "budget_next"]
+
+    def __init__(self):
+        self.budget_prev = self
+        self.budget_next = self
+
+
+class _CacheMemoryCollector(object):
+    """Exports the memory used by each cache to Prometheus."""
+
+    def __init__(self, budget):
+        self._budget = budget
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        budget = self._budget
+
+        memory = GaugeMetricFamily(
+            "synapse_util_caches_cache:memory_bytes",
+            "Estimated size of the entries of a cache",
+            labels=["name"],
+        )
+        for name, size in list(budget.bytes_by_name.items()):
+            memory.add_metric([name], size)
+        yield memory
+
+        yield GaugeMetricFamily(
+            "synapse_util_caches_memory_budget_bytes",
+            "Total size which the caches may use",
+            value=budget.max_bytes,
+        )
+        yield GaugeMetricFamily(
+            "synapse_util_caches_memory_used_bytes",
+            "Estimated total size of the entries of the caches",
+            value=budget.total_bytes,
+        )
+        yield CounterMetricFamily(
+            "synapse_util_caches_memory_budget_evictions",
+            "Number of entries evicted to stay within the memory budget",
+            value=budget.evictions,
+        )
+
+
+_global_budget = None
+if caches.CACHE_MEMORY_BUDGET:
+    logger.info("Using a cache memory budget of %d bytes", caches.CACHE_MEMORY_BUDGET)
+    _global_budget = CacheMemoryBudget(caches.CACHE_MEMORY_BUDGET)
+    REGISTRY.register(_CacheMemoryCollector(_global_budget))
+
+
+def get_cache_memory_budget():
+    """Get the memory budget of the process.
+
+    Returns:
+        CacheMemoryBudget|None: None unless SYNAPSE_CACHE_MEMORY_BUDGET is set.
+    """
+    return _global_budget
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A cache of event rows shared by the processes of a host.
+
+The rows, as returned by EventsWorkerStore._fetch_event_rows, are kept in a
+memory-mapped SQLite file, which all the workers of the host read and write.
+Once one of them has fetched an event from the database, the others read it
+from the file instead.
+
+The rows only change when their event is redacted, or stops being an outlier,
+and go away when their event is purged. The master then invalidates them
+through the caches replication stream, which all the workers apply to the file
+of their host. So that a worker which read the old row from the database just
+before can't then put it back, an invalidation leaves a tombstone which stops
+the event being cached again for a while.
+
+The file outlives the processes, so it also records the position in the caches
+stream up to which the invalidations have been applied to it. When a process
+opens the file, it replays the invalidations made since then (see
+SQLBaseStore._catch_up_shared_event_cache_txn).
+
+The file is read and written on the reactor's threadpool. It is a cache: when
+it is locked for too long, a lookup is a miss and an update is skipped. The
+invalidations which could not be written are retried, and the events they are
+for are treated as missing until then.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+
+from twisted.internet import defer
+
+from synapse.logging.context import defer_to_thread
+from synapse.metrics.background_process_metrics import run_as_background_process
+from synapse.util import batch_iter
+from synapse.util.caches import register_cache
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for the lock on the file, in seconds. We'd rather miss the
+# cache than wait, as the database is there.
+LOCK_TIMEOUT_S = 0.05
+
+# How often the file is trimmed back to its maximum number of entries.
+TRIM_INTERVAL_MS = 60 * 1000
+
+# How long an invalidated event is kept out of the cache.
+TOMBSTONE_LIFETIME_MS = 60 * 60 * 1000
+
+# The most event ids looked up per query.
+BATCH_SIZE = 500
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS event_rows ("
+    " event_id TEXT PRIMARY KEY, json TEXT NOT NULL,"
+    " internal_metadata TEXT NOT NULL, format_version INTEGER,"
+    " rejected_reason TEXT, redactions TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS tombstones ("
+    " event_id TEXT PRIMARY KEY, ts BIGINT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS tombstones_ts ON tombstones(ts)",
+    # A single row, holding the position in the caches stream up to which the
+    # invalidations have been applied, or NULL if it isn't known.
+    "CREATE TABLE IF NOT EXISTS stream_position ("
+    " lock CHAR(1) NOT NULL DEFAULT 'X' UNIQUE, stream_id BIGINT)",
+    "INSERT OR IGNORE INTO stream_position (lock, stream_id) VALUES ('X', NULL)",
+)
+
+
+class SharedEventCache(object):
+    def __init__(self, hs, path, max_entries, mmap_size, stream_position_callback):
+        """
+        Args:
+            hs (HomeServer)
+            path (str): the file holding the cache. It is created if needed.
+            max_entries (int): how many rows to keep in the file.
+            mmap_size (int): how many bytes of the file to map into memory.
+            stream_position_callback (callable[[], int]): gets the position
+                in the caches stream up to which this process has applied
+                the invalidations.
+        """
+        self._clock = hs.get_clock()
+        self._reactor = hs.get_reactor()
+        self._path = path
+        self._max_entries = max_entries
+        self._mmap_size = mmap_size
+        self._stream_position_callback = stream_position_callback
+
+        # The events whose invalidation hasn't been written yet.
+        self._pending_invalidations = set()
+
+        # Each thread of the threadpool has its own connection to the file.
+        self._thread_local = threading.local()
+
+        # The number of rows in the file, as of the last trim.
+        self._size = 0
+
+        conn = self._connect()
+        try:
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+        finally:
+            conn.close()
+
+        self.metrics = register_cache("shared", "*sharedEvent*", self)
+
+        def trim():
+            return run_as_background_process("trim_shared_event_cache", self._trim)
+
+        self._clock.looping_call(trim, TRIM_INTERVAL_MS)
+
+    def _connect(self):
+        conn = sqlite3.connect(self._path, timeout=LOCK_TIMEOUT_S)
+        conn.execute("PRAGMA journal_mode = WAL")
+        # The file is only a cache, so it doesn't need to survive a crash.
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA mmap_size = %d" % (self._mmap_size,))
+        return conn
+
+    def _get_conn(self):
+        conn = getattr(self._thread_local, "conn", None)
+        if conn is None:
+            conn = self._thread_local.conn = self._connect()
+        return conn
+
+    def get_stream_position(self):
+        """Get the position in the caches stream up to which the invalidations
+        have been applied to the file.
+
+        This blocks, so must only be called while starting up.
+
+        Returns:
+            int|None: None if it isn't known.
+        """
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT stream_id FROM stream_position").fetchone()[0]
+        finally:
+            conn.close()
+
+    def catch_up(self, event_ids, stream_position):
+        """Apply the invalidations which were made while the file wasn't being
+        kept up to date.
+
+        This blocks, so must only be called while starting up.
+
+        Args:
+            event_ids (Iterable[str]|None): the invalidated events, or None to
+                drop all the rows.
+            stream_position (int|None): the position in the caches stream
+                which the file is now up to date with.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                if event_ids is None:
+                    conn.execute("DELETE FROM event_rows")
+                else:
+                    self._write_invalidations_txn(
+                        conn, event_ids, self._clock.time_msec()
+                    )
+                conn.execute(
+                    "UPDATE stream_position SET stream_id = ?", (stream_position,)
+                )
+        finally:
+            conn.close()
+
+    @defer.inlineCallbacks
+    def get_rows(self, event_ids):
+        """Look up the rows of some events.
+
+        Args:
+            event_ids (Iterable[str])
+
+        Returns:
+            Deferred[dict[str, dict]]: map from event id to row, for the events
+                which are in the cache.
+        """
+        event_ids = [e for e in event_ids if e not in self._pending_invalidations]
+        if not event_ids:
+            return {}
+
+        rows = yield defer_to_thread(self._reactor, self._get_rows_thread, event_ids)
+
+        # An invalidation may have come in while we were reading.
+        for event_id in self._pending_invalidations.intersection(rows):
+            del rows[event_id]
+
+        for event_id in event_ids:
+            if event_id in rows:
+                self.metrics.inc_hits()
+            else:
+                self.metrics.inc_misses()
+
+        return rows
+
+    def _get_rows_thread(self, event_ids):
+        conn = self._get_conn()
+
+        rows = {}
+        try:
+            for batch in batch_iter(event_ids, BATCH_SIZE):
+                txn = conn.execute(
+                    "SELECT event_id, json, internal_metadata, format_version,"
+                    " rejected_reason, redactions FROM event_rows"
+                    " WHERE event_id IN (%s)" % (",".join("?" * len(batch)),),
+                    batch,
+                )
+                for row in txn:
+                    rows[row[0]] = {
+                        "event_id": row[0],
+                        "json": row[1],
+                        "internal_metadata": row[2],
+                        "format_version": row[3],
+                        "rejected_reason": row[4],
+                        "redactions": json.loads(row[5]),
+                    }
+        except sqlite3.OperationalError as e:
+            logger.warning("Failed to read from the shared event cache: %s", e)
+
+        return rows
+
+    def add_rows(self, rows):
+        """Add the rows of some events, unless they have just been invalidated.
+
+        Args:
+            rows (Iterable[dict]): rows as returned by `_fetch_event_rows`.
+
+        Returns:
+            Deferred
+        """
+        values = [
+            (
+                row["event_id"],
+                row["json"],
+                row["internal_metadata"],
+                row["format_version"],
+                row["rejected_reason"],
+                json.dumps(row["redactions"]),
+                row["event_id"],
+            )
+            for row in rows
+            if row["event_id"] not in self._pending_invalidations
+        ]
+        if not values:
+            return defer.succeed(None)
+
+        return defer_to_thread(self._reactor, self._add_rows_thread, values)
+
+    def _add_rows_thread(self, values):
+        conn = self._get_conn()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO event_rows"
+                    " (event_id, json, internal_metadata, format_version,"
+                    "  rejected_reason, redactions)"
+                    " SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                    "  SELECT 1 FROM tombstones WHERE event_id = ?"
+                    " )",
+                    values,
+                )
+        except sqlite3.OperationalError as e:
+            logger.warning("Failed to write to the shared event cache: %s", e)
+
+    def invalidate(self, key):
+        """Drop the rows of some events, and keep them out of the cache for a
+        while.
+
+        Args:
+            key (tuple[str]): the event ids. This is a tuple so that this can
+                be invalidated through the caches replication stream.
+        """
+        # The events are treated as missing until the invalidation is written.
+        self._pending_invalidations.update(key)
+        run_as_background_process(
+            "invalidate_shared_event_cache", self._write_invalidations
+        )
+
+    @defer.inlineCallbacks
+    def _write_invalidations(self):
+        event_ids = list(self._pending_invalidations)
+        written = yield defer_to_thread(
+            self._reactor,
+            self._write_invalidations_thread,
+            event_ids,
+            self._clock.time_msec(),
+        )
+        if written:
+            self._pending_invalidations.difference_update(event_ids)
+
+    def _write_invalidations_thread(self, event_ids, now):
+        conn = self._get_conn()
+        try:
+            with conn:
+                self._write_invalidations_txn(conn, event_ids, now)
+        except sqlite3.OperationalError as e:
+            logger.warning(
+                "Failed to invalidate %d events in the shared event cache: %s",
+                len(event_ids),
+                e,
+            )
+            return False
+        return True
+
+    @staticmethod
+    def _write_invalidations_txn(conn, event_ids, now):
+        event_ids = list(event_ids)
+        conn.executemany(
+            "DELETE FROM event_rows WHERE event_id = ?",
+            [(event_id,) for event_id in event_ids],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO tombstones (event_id, ts) VALUES (?, ?)",
+            [(event_id, now) for event_id in event_ids],
+        )
+
+    @defer.inlineCallbacks
+    def _trim(self):
+        # All the invalidations up to this position have been written unless
+        # some are still pending, in which case we'll record it next time.
+        stream_position = self._stream_position_callback()
+        if self._pending_invalidations:
+            stream_position = None
+            yield self._write_invalidations()
+
+        self._size = yield defer_to_thread(
+            self._reactor,
+            self._trim_thread,
+            self._clock.time_msec() - TOMBSTONE_LIFETIME_MS,
+            stream_position,
+        )
+
+    def _trim_thread(self, tombstones_before_ts, stream_position):
+        conn = self._get_conn()
+        try:
+            with conn:
+                # The rows are added with increasing rowids, so this drops the
+                # oldest ones.
+                conn.execute(
+                    "DELETE FROM event_rows WHERE rowid <= ("
+                    " SELECT MAX(rowid) FROM event_rows"
+                    ") - ?",
+                    (self._max_entries,),
+                )
+                conn.execute(
+                    "DELETE FROM tombstones WHERE ts < ?", (tombstones_before_ts,)
+                )
+                if stream_position is not None:
+                    # Another process may have recorded a later position.
+                    conn.execute(
+                        "UPDATE stream_position SET stream_id = ?"
+                        " WHERE stream_id IS NOT NULL AND stream_id < ?",
+                        (stream_position, stream_position),
+                    )
+
+                # Counting the rows means going through all of them, so this is
+                # estimated from the rowids instead.
+                row = conn.execute(
+                    "SELECT MAX(rowid) - MIN(rowid) + 1 FROM event_rows"
+                ).fetchone()
+        except sqlite3.OperationalError as e:
+            logger.warning("Failed to trim the shared event cache: %s", e)
+            return self._size
+
+        return row[0] or 0
+
+    def __len__(self):
+        return self._size
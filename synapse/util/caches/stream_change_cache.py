@@ -14,15 +14,21 @@
 # limitations under the License.
 
 import logging
+import sys
 
 from six import integer_types
 
 from sortedcontainers import SortedDict
 
 from synapse.util import caches
+from synapse.util.caches.memory_budget import get_cache_memory_budget
 
 logger = logging.getLogger(__name__)
 
+# Roughly what an entry costs besides its entity: the stream position and the
+# slots in the SortedDict and in the entity dict.
+_ENTRY_OVERHEAD = 250
+
 
 class StreamChangeCache(object):
     """Keeps track of the stream positions of the latest change in a set of entities.
@@ -42,6 +48,11 @@ class StreamChangeCache(object):
         self.name = name
         self.metrics = caches.register_cache("cache", self.name, self._cache)
 
+        # The entries are only evicted by stream position, so they are counted
+        # against the memory budget but it can't evict them: it makes room in
+        # the other caches instead.
+        self._memory_budget = get_cache_memory_budget()
+
         if prefilled_cache:
             for entity, stream_pos in prefilled_cache.items():
                 self.entity_has_changed(entity, stream_pos)
@@ -127,10 +138,13 @@ class StreamChangeCache(object):
         assert type(stream_pos) is int
 
         if stream_pos > self._earliest_known_stream_pos:
+            memory_delta = 0
             old_pos = self._entity_to_key.get(entity, None)
             if old_pos is not None:
                 stream_pos = max(stream_pos, old_pos)
                 self._cache.pop(old_pos, None)
+            else:
+                memory_delta += _ENTRY_OVERHEAD + sys.getsizeof(entity)
             self._cache[stream_pos] = entity
             self._entity_to_key[entity] = stream_pos
 
@@ -140,6 +154,11 @@ class StreamChangeCache(object):
                     k, self._earliest_known_stream_pos
                 )
                 self._entity_to_key.pop(r, None)
+                memory_delta -= _ENTRY_OVERHEAD + sys.getsizeof(r)
+
+            if self._memory_budget is not None and memory_delta:
+                self._memory_budget.account(self.name, memory_delta)
+                self._memory_budget.evict()
 
     def get_max_pos_of_last_change(self, entity):
         """Returns an upper bound of the stream id of the last change to an
@@ -8,6 +8,10 @@ class TreeCache(object):
     Tree-based backing store for LruCache. Allows subtrees of data to be deleted
     efficiently.
     Keys must be tuples.
+
+    The values are stored as they are in the leaves of the tree, which are told
+    apart from its inner nodes by not being dicts. The values which are dicts
+    themselves are wrapped in an _Entry.
     """
 
     def __init__(self):
@@ -24,7 +28,7 @@ class TreeCache(object):
         node = self.root
         for k in key[:-1]:
             node = node.setdefault(k, {})
-        node[key[-1]] = _Entry(value)
+        node[key[-1]] = _Entry(value) if isinstance(value, dict) else value
         self.size += 1
 
     def get(self, key, default=None):
@@ -33,7 +37,10 @@ class TreeCache(object):
             node = node.get(k, None)
             if node is None:
                 return default
-        return node.get(key[-1], _Entry(default)).value
+        value = node.get(key[-1], SENTINEL)
+        if value is SENTINEL:
+            return default
+        return value.value if isinstance(value, _Entry) else value
 
     def clear(self):
         self.size = 0
@@ -82,11 +89,10 @@ def iterate_tree_cache_entry(d):
         for value_d in itervalues(d):
             for value in iterate_tree_cache_entry(value_d):
                 yield value
+    elif isinstance(d, _Entry):
+        yield d.value
     else:
-        if isinstance(d, _Entry):
-            yield d.value
-        else:
-            yield d
+        yield d
 
 
 class _Entry(object):
@@ -97,10 +103,10 @@ class _Entry(object):
 
 
 def _strip_and_count_entires(d):
-    """Takes an _Entry or dict with leaves of _Entry's, and either returns the
-    value or a dictionary with _Entry's replaced by their values.
+    """Takes a leaf or a dict of leaves, and either returns the value or a
+    dictionary with the _Entry's replaced by their values.
 
-    Also returns the count of _Entry's
+    Also returns the count of leaves
     """
     if isinstance(d, dict):
         cnt = 0
@@ -109,5 +115,7 @@ def _strip_and_count_entires(d):
             d[key] = v
             cnt += n
         return d, cnt
-    else:
+    elif isinstance(d, _Entry):
         return d.value, 1
+    else:
+        return d, 1
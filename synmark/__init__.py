@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for synapse.
+
+Run with `python -m synmark [suite ...]` from the root of the repository.
+"""
+
+from twisted.internet import defer
+
+from synapse.util import Clock
+
+from tests.utils import setup_test_homeserver
+
+
+@defer.inlineCallbacks
+def make_homeserver(reactor, config=None):
+    """Make a homeserver backed by a fresh database, like the one used by
+    the unit tests.
+
+    Args:
+        reactor: the reactor to run the homeserver on
+        config (synapse.config.homeserver.HomeServerConfig|None): the config
+            to use, or None for the test defaults.
+
+    Returns:
+        Deferred[tuple[synapse.server.HomeServer, callable]]: the homeserver,
+        and a function to call to clean it up.
+    """
+    cleanup_tasks = []
+
+    hs = yield setup_test_homeserver(
+        cleanup_tasks.append, config=config, reactor=reactor, clock=Clock(reactor)
+    )
+
+    # Run the database background updates, so that we measure the code paths
+    # of an up to date server.
+    store = hs.get_datastore()
+    while not (yield store.has_completed_background_updates()):
+        yield store.do_next_background_update(1000)
+
+    def cleanup():
+        for task in cleanup_tasks:
+            task()
+
+    return hs, cleanup
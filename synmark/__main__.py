@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import argparse
+import logging
+
+from twisted.internet import defer, task
+
+from synmark.suites import SUITES
+
+
+@defer.inlineCallbacks
+def run(reactor, args):
+    for suite, param in SUITES:
+        name = suite.__name__.rsplit(".", 1)[-1]
+        if args.suites and name not in args.suites:
+            continue
+
+        results = yield suite.main(reactor, args.loops, param)
+        for label, value in sorted(results.items()):
+            print("%s(%s) %s: %s" % (name, param, label, value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the synapse benchmarks.")
+    parser.add_argument(
+        "suites", nargs="*", help="the suites to run (default: all of them)"
+    )
+    parser.add_argument(
+        "--loops", type=int, default=10, help="iterations of each measurement"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    task.react(run, (args,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from . import auth_chain, cache_memory, load, solicitations
+
+# A list of (suite, parameter) pairs. Each suite is run once for each of
+# its parameters.
+SUITES = [
+    (solicitations, 10000),
+    (solicitations, 100000),
+    (solicitations, 1000000),
+    # (ONS operators, CTEEP operators)
+    (load, (1, 10)),
+    (load, (5, 50)),
+    (cache_memory, "get_event_cache"),
+    (cache_memory, "state_group_cache"),
+    (cache_memory, "tree_cache"),
+    # depth of the auth DAG
+    (auth_chain, 100),
+    (auth_chain, 1000),
+    (auth_chain, 10000),
+]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how auth chains and auth chain differences are computed in rooms
+with deep auth DAGs.
+
+The parameter is the depth of the DAG: the room has that many power levels
+events, each authed by the previous one, and a membership change after each
+of them. Half way through, the power levels fork into a second branch of the
+same length, as after a netsplit.
+
+Each query is measured with the recursive CTE and with the breadth-first walk
+which is used when the database doesn't support them.
+"""
+
+from time import perf_counter
+
+from mock import PropertyMock, patch
+
+from twisted.internet import defer
+
+from synapse.logging.context import LoggingContext
+
+from synmark import make_homeserver
+
+ROOM_ID = "!room:test"
+
+# The number of users of the room.
+MEMBERS = 50
+
+BATCH_SIZE = 10000
+
+
+def _seed_txn(txn, depth):
+    """Fill event_auth with the auth DAG of the room.
+
+    Returns:
+        tuple[list[str], list[str]]: the power levels and latest membership
+        events of the two branches, as state sets.
+    """
+    edges = []
+
+    def add_event(event_id, auth_ids):
+        edges.extend((event_id, auth_id, ROOM_ID) for auth_id in auth_ids)
+        return event_id
+
+    create = add_event("$create", [])
+    joins = [add_event("$join_%d" % (i,), [create]) for i in range(MEMBERS)]
+
+    def add_branch(name, pl, start):
+        for k in range(start, depth):
+            sender = joins[k % MEMBERS]
+            pl = add_event("$%s_pl_%d" % (name, k), [create, pl, sender])
+            member = add_event("$%s_member_%d" % (name, k), [create, pl, sender])
+        return [pl, member]
+
+    pl = add_event("$pl", [create, joins[0]])
+    first = add_branch("a", pl, 0)
+    second = add_branch("b", "$a_pl_%d" % (depth // 2,), depth // 2 + 1)
+
+    for i in range(0, len(edges), BATCH_SIZE):
+        txn.executemany(
+            "INSERT INTO event_auth (event_id, auth_id, room_id) VALUES (?, ?, ?)",
+            edges[i : i + BATCH_SIZE],
+        )
+
+    return first + joins, second + joins
+
+
+@defer.inlineCallbacks
+def _measure(loops, func):
+    """Call `func` `loops` times, and return the mean wall time in
+    milliseconds.
+    """
+    with LoggingContext("synmark"):
+        start = perf_counter()
+        for _ in range(loops):
+            yield func()
+        elapsed = perf_counter() - start
+
+    return elapsed * 1000 / loops
+
+
+@defer.inlineCallbacks
+def main(reactor, loops, depth):
+    hs, cleanup = yield make_homeserver(reactor)
+    store = hs.get_datastore()
+
+    try:
+        with LoggingContext("synmark_seed"):
+            first, second = yield store.runInteraction(
+                "synmark_seed", _seed_txn, depth
+            )
+
+        chain = yield store.get_auth_chain_ids(first)
+        difference = yield store.get_auth_chain_difference([set(first), set(second)])
+        results = {"chain_size": len(chain), "difference_size": len(difference)}
+
+        for mode, recursive_ctes in (("recursive", True), ("iterative", False)):
+            with patch.object(
+                type(store.database_engine),
+                "supports_recursive_ctes",
+                new_callable=PropertyMock,
+                return_value=recursive_ctes,
+            ):
+                ms = yield _measure(loops, lambda: store.get_auth_chain_ids(first))
+                results["%s_chain_ms" % (mode,)] = "%.1f" % (ms,)
+
+                ms = yield _measure(
+                    loops,
+                    lambda: store.get_auth_chain_difference(
+                        [set(first), set(second)]
+                    ),
+                )
+                results["%s_difference_ms" % (mode,)] = "%.1f" % (ms,)
+    finally:
+        cleanup()
+
+    return results
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how many bytes the caches use per entry, on top of the keys and
+values they hold.
+
+The parameter is the workload:
+
+ * "get_event_cache": the events cache, a Cache keyed by (event_id,) holding
+   an _EventCacheEntry per event.
+ * "state_group_cache": the state group cache, a DictionaryCache keyed by state
+   group holding the state dict of the group.
+ * "tree_cache": a Cache with tree=True keyed by (room_id, user_id), as for the
+   per-room caches which are invalidated a room at a time.
+
+Each workload is measured as a plain dict (the floor), through the cache, and
+through the cache with an invalidation callback on each entry, as the entries
+which are read with a `cache_context` have.
+"""
+
+import gc
+import tracemalloc
+
+from synapse.storage.events_worker import _EventCacheEntry
+from synapse.util.caches.descriptors import Cache
+from synapse.util.caches.dictionary_cache import DictionaryCache
+
+# How many entries are cached per loop.
+ENTRIES_PER_LOOP = 10000
+
+# The size of the state of a state group in the state_group_cache workload.
+STATE_SIZE = 10
+
+
+def _measure(fill):
+    """Get the number of bytes allocated by `fill()` and still in use after.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = fill()  # noqa: F841 -- keep what was filled until measured
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def _get_event_cache(entries):
+    keys = [("$event%d:test" % (i,),) for i in range(entries)]
+    values = [_EventCacheEntry(event=object(), redacted_event=None) for _ in keys]
+
+    def fill_dict():
+        return dict(zip(keys, values))
+
+    def fill_cache(with_callbacks=False):
+        cache = Cache("*getEvent*", keylen=3, max_entries=entries)
+        for key, value in zip(keys, values):
+            cache.prefill(key, value, callback=_callback if with_callbacks else None)
+        return cache
+
+    return fill_dict, fill_cache
+
+
+def _state_group_cache(entries):
+    keys = list(range(entries))
+    values = [
+        {
+            ("m.room.member", "@user%d:test" % (j,)): "$event%d_%d:test" % (i, j)
+            for j in range(STATE_SIZE)
+        }
+        for i in keys
+    ]
+
+    def fill_dict():
+        return dict(zip(keys, values))
+
+    def fill_cache(with_callbacks=False):
+        cache = DictionaryCache("*stateGroupCache*", max_entries=entries * STATE_SIZE)
+        for key, value in zip(keys, values):
+            cache.update(cache.sequence, key, value)
+            if with_callbacks:
+                cache.cache.get(key, callbacks=[_callback])
+        return cache
+
+    return fill_dict, fill_cache
+
+
+def _tree_cache(entries):
+    keys = [
+        ("!room%d:test" % (i // 10,), "@user%d:test" % (i,)) for i in range(entries)
+    ]
+    values = ["join" for _ in keys]
+
+    def fill_dict():
+        return dict(zip(keys, values))
+
+    def fill_cache(with_callbacks=False):
+        cache = Cache("tree_cache", keylen=2, max_entries=entries, tree=True)
+        for key, value in zip(keys, values):
+            cache.prefill(key, value, callback=_callback if with_callbacks else None)
+        return cache
+
+    return fill_dict, fill_cache
+
+
+def _callback():
+    """The invalidation callback of the entries. It is shared, so that only the
+    cost of holding it is measured.
+    """
+
+
+WORKLOADS = {
+    "get_event_cache": _get_event_cache,
+    "state_group_cache": _state_group_cache,
+    "tree_cache": _tree_cache,
+}
+
+
+def main(reactor, loops, workload):
+    entries = loops * ENTRIES_PER_LOOP
+    fill_dict, fill_cache = WORKLOADS[workload](entries)
+
+    results = {"entries": entries}
+    for label, fill in (
+        ("dict", fill_dict),
+        ("cache", fill_cache),
+        ("cache_with_callbacks", lambda: fill_cache(with_callbacks=True)),
+    ):
+        results[label + "_bytes_per_entry"] = "%.1f" % (_measure(fill) / entries,)
+    return results
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Drives the voltage control API over HTTP, the way the operators use it,
+and measures the latency and throughput of each endpoint.
+
+The parameter is a pair (ons, cteep): `ons` ONS operators each create `loops`
+solicitation groups, as fast as the server answers, while `cteep` CTEEP
+operators long-poll /sync and move the solicitations they see through NEW,
+ACCEPTED and EXECUTED. Each solicitation is handled by one CTEEP operator, as
+on the operators' tables. The run ends once all the solicitations are
+EXECUTED.
+
+The homeserver uses SQLite, or Postgres if SYNAPSE_POSTGRES is set, as for
+the unit tests.
+"""
+
+import json
+from time import perf_counter
+
+import treq
+
+from twisted.internet import defer
+from twisted.web.client import HTTPConnectionPool
+from twisted.web.resource import NoResource
+
+from synapse.api.constants import Companies, SolicitationStatus
+from synapse.http.site import SynapseSite
+from synapse.logging.context import LoggingContext
+from synapse.rest import ClientRestResource
+from synapse.util.httpresourcetree import create_resource_tree
+
+from synmark import make_homeserver
+
+GROUP_SIZE = 3
+
+# How long each /sync request waits for new solicitations, in milliseconds.
+SYNC_TIMEOUT_MS = 1000
+
+# Give up on a run which takes longer than this, in seconds.
+RUN_TIMEOUT = 600
+
+# The status a CTEEP operator moves a solicitation to, from its current one.
+NEXT_STATUS = {
+    SolicitationStatus.NEW: SolicitationStatus.ACCEPTED,
+    SolicitationStatus.ACCEPTED: SolicitationStatus.EXECUTED,
+}
+
+
+class Timings(object):
+    """Collects the latency of the requests made to each endpoint."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._latencies = {}
+        self._errors = {}
+
+    @defer.inlineCallbacks
+    def request(self, endpoint, method, url, token, body=None):
+        """Make an HTTP request and record how long it took.
+
+        Returns:
+            Deferred[tuple[int, dict]]: the response code and JSON body.
+        """
+        headers = {b"Authorization": [b"Bearer " + token.encode("ascii")]}
+        data = None
+        if body is not None:
+            headers[b"Content-Type"] = [b"application/json"]
+            data = json.dumps(body).encode("utf8")
+
+        start = perf_counter()
+        response = yield treq.request(
+            method, url, headers=headers, data=data, pool=self._pool
+        )
+        content = yield treq.json_content(response)
+        self._latencies.setdefault(endpoint, []).append(perf_counter() - start)
+
+        if response.code >= 400:
+            self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+        return response.code, content
+
+    def results(self, elapsed):
+        """Summarise the timings of a run which lasted `elapsed` seconds."""
+        results = {}
+        for endpoint, latencies in self._latencies.items():
+            latencies = sorted(latencies)
+            results[endpoint + "_count"] = len(latencies)
+            results[endpoint + "_errors"] = self._errors.get(endpoint, 0)
+            results[endpoint + "_p50_ms"] = "%.1f" % (
+                _percentile(latencies, 0.5) * 1000,
+            )
+            results[endpoint + "_p99_ms"] = "%.1f" % (
+                _percentile(latencies, 0.99) * 1000,
+            )
+            results[endpoint + "_per_s"] = "%.1f" % (len(latencies) / elapsed,)
+        return results
+
+
+def _percentile(values, q):
+    """Get the `q` quantile of a sorted list."""
+    return values[int(round(q * (len(values) - 1)))]
+
+
+@defer.inlineCallbacks
+def _ons_operator(timings, base_url, token, substations, groups):
+    for _ in range(groups):
+        solicitations = [
+            {
+                "company_code": Companies.CTEEP,
+                "substation": substations[i % len(substations)],
+                "action": "TURN_ON",
+                "equipment": "REACTOR",
+                "amount": "1",
+                "staggered": False,
+            }
+            for i in range(GROUP_SIZE)
+        ]
+        yield timings.request(
+            "create_solicitations",
+            "POST",
+            base_url + "/voltage_control_solicitation",
+            token,
+            {"solicitations": solicitations, "creation_total_time": "10"},
+        )
+
+
+@defer.inlineCallbacks
+def _cteep_operator(timings, base_url, token, is_mine, executed, total, deadline):
+    _, body = yield timings.request(
+        "initial_sync", "GET", base_url + "/sync", token
+    )
+    since = body["next_batch"]
+    pending = {}
+    _update_pending(pending, body, is_mine, executed)
+
+    while len(executed) < total and perf_counter() < deadline:
+        for solicitation in list(pending.values()):
+            status = solicitation["events"][0]["status"]
+            if status not in NEXT_STATUS:
+                continue
+
+            code, _ = yield timings.request(
+                "change_status",
+                "PUT",
+                "%s/voltage_control_solicitation/%s" % (base_url, solicitation["id"]),
+                token,
+                {"status": NEXT_STATUS[status]},
+            )
+            if code != 200:
+                pending.pop(solicitation["id"])
+                continue
+
+            solicitation["events"].insert(0, {"status": NEXT_STATUS[status]})
+            if NEXT_STATUS[status] == SolicitationStatus.EXECUTED:
+                executed.add(solicitation["id"])
+                pending.pop(solicitation["id"])
+
+        _, body = yield timings.request(
+            "incremental_sync",
+            "GET",
+            "%s/sync?since=%s&timeout=%d" % (base_url, since, SYNC_TIMEOUT_MS),
+            token,
+        )
+        since = body["next_batch"]
+        _update_pending(pending, body, is_mine, executed)
+
+
+def _update_pending(pending, sync_body, is_mine, executed):
+    """Track the solicitations of a /sync response which the operator has to
+    handle, and those which are done.
+    """
+    solicitations = sync_body.get("solicitations") or {}
+    for solicitation in solicitations.get("events", []):
+        solicitation_id = solicitation["id"]
+        if solicitation["events"][0]["status"] == SolicitationStatus.EXECUTED:
+            executed.add(solicitation_id)
+            pending.pop(solicitation_id, None)
+        elif is_mine(solicitation_id):
+            pending[solicitation_id] = solicitation
+
+
+@defer.inlineCallbacks
+def _register_operator(store, user_id, company_code):
+    yield store.register_user(user_id, company_code=company_code)
+    token = "token_" + user_id[1:].split(":")[0]
+    yield store.add_access_token_to_user(user_id, token, None, None)
+    return token
+
+
+@defer.inlineCallbacks
+def main(reactor, loops, operators):
+    ons, cteep = operators
+
+    hs, cleanup = yield make_homeserver(reactor)
+    store = hs.get_datastore()
+
+    root = create_resource_tree(
+        {"/_matrix/client": ClientRestResource(hs)}, NoResource()
+    )
+    site = SynapseSite("synmark.access", "synmark", {}, root, "synmark")
+    port = reactor.listenTCP(0, site, interface="127.0.0.1")
+    base_url = "http://127.0.0.1:%d/_matrix/client/r0" % (port.getHost().port,)
+
+    # Persistent connections, as the clients keep theirs open.
+    pool = HTTPConnectionPool(reactor)
+    pool.maxPersistentPerHost = ons + cteep
+
+    try:
+        with LoggingContext("synmark_load"):
+            catalogue = yield store.get_table_catalogue()
+            tables = [
+                table
+                for table in catalogue.values()
+                if table["company_code"] == Companies.CTEEP
+            ]
+            substations = sorted(
+                set().union(*(table["substations"] for table in tables))
+            )
+
+            ons_tokens = []
+            for i in range(ons):
+                token = yield _register_operator(
+                    store, "@ons%d:test" % (i,), Companies.ONS
+                )
+                ons_tokens.append(token)
+
+            cteep_tokens = []
+            for i in range(cteep):
+                user_id = "@cteep%d:test" % (i,)
+                token = yield _register_operator(store, user_id, Companies.CTEEP)
+                for table in tables:
+                    yield store.associate_table_to_user(user_id, table["code"])
+                cteep_tokens.append(token)
+
+        # The operators are HTTP clients, so they run outside of the logging
+        # contexts of the server.
+        timings = Timings(pool)
+        executed = set()
+        total = ons * loops * GROUP_SIZE
+
+        start = perf_counter()
+        yield defer.gatherResults(
+            [
+                _cteep_operator(
+                    timings,
+                    base_url,
+                    token,
+                    lambda solicitation_id, i=i: solicitation_id % cteep == i,
+                    executed,
+                    total,
+                    start + RUN_TIMEOUT,
+                )
+                for i, token in enumerate(cteep_tokens)
+            ]
+            + [
+                _ons_operator(timings, base_url, token, substations, loops)
+                for token in ons_tokens
+            ],
+            consumeErrors=True,
+        )
+        elapsed = perf_counter() - start
+
+        results = timings.results(elapsed)
+        results["executed"] = "%d/%d" % (len(executed), total)
+        results["elapsed_s"] = "%.1f" % (elapsed,)
+    finally:
+        yield pool.closeCachedConnections()
+        yield port.stopListening()
+        cleanup()
+
+    return results
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how listing solicitations scales with the number of status
+signatures in the database, before and after the current status columns are
+backfilled.
+
+The solicitations are seeded with their signatures only, as they were before
+the current status was tracked. The listings are first measured on the JOIN
+with the latest signatures, then the `solicitation_current_status` background
+update is timed, and the listings are measured again on the current status
+columns.
+"""
+
+from time import perf_counter
+
+from twisted.internet import defer
+
+from synapse.api.constants import SolicitationStatus
+from synapse.logging.context import LoggingContext
+
+from synmark import make_homeserver
+
+# The statuses a seeded solicitation goes through, in order. Each solicitation
+# stops somewhere along this path, so the current statuses are mixed.
+STATUS_PATH = [
+    SolicitationStatus.NEW,
+    SolicitationStatus.ACCEPTED,
+    SolicitationStatus.LATE,
+    SolicitationStatus.EXECUTED,
+]
+
+SUBSTATIONS = ["PIR", "MIR", "ATI", "MOS", "SAL", "TES"]
+
+TABLE = {"MIR", "PIR"}
+
+BATCH_SIZE = 10000
+
+
+def _seed_txn(txn, signatures):
+    """Fill the solicitation tables with `signatures` status signatures, and
+    queue the backfill of the current status columns.
+    """
+    solicitations = []
+    events = []
+
+    solicitation_id = 0
+    while len(events) < signatures:
+        solicitation_id += 1
+        solicitations.append(
+            (
+                solicitation_id,
+                "TURN_ON",
+                "REACTOR",
+                SUBSTATIONS[solicitation_id % len(SUBSTATIONS)],
+                False,
+                "1",
+            )
+        )
+        for step in range(1 + solicitation_id % len(STATUS_PATH)):
+            events.append(
+                (
+                    len(events) + 1,
+                    "@ons:test",
+                    STATUS_PATH[step],
+                    1500000000 + solicitation_id + step,
+                    solicitation_id,
+                )
+            )
+
+    for i in range(0, len(solicitations), BATCH_SIZE):
+        txn.executemany(
+            "INSERT INTO voltage_control_solicitation"
+            " (id, action_code, equipment_code, substation_code, staggered, amount)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            solicitations[i : i + BATCH_SIZE],
+        )
+    for i in range(0, len(events), BATCH_SIZE):
+        txn.executemany(
+            "INSERT INTO solicitation_status_signature"
+            " (id, user_id, status, time_stamp, solicitation_id)"
+            " VALUES (?, ?, ?, ?, ?)",
+            events[i : i + BATCH_SIZE],
+        )
+
+    txn.execute(
+        "INSERT INTO background_updates (update_name, progress_json) VALUES (?, ?)",
+        ("solicitation_current_status", "{}"),
+    )
+
+    return len(solicitations)
+
+
+@defer.inlineCallbacks
+def _measure(loops, func):
+    """Call `func` `loops` times, and return the mean wall time in
+    milliseconds and the mean number of database transactions per call.
+    """
+    with LoggingContext("synmark") as context:
+        start = perf_counter()
+        for _ in range(loops):
+            yield func()
+        elapsed = perf_counter() - start
+        txn_count = context.get_resource_usage().db_txn_count
+
+    return elapsed * 1000 / loops, txn_count / loops
+
+
+@defer.inlineCallbacks
+def _measure_listings(store, loops, path):
+    """Measure the listings of both companies, and a page of a table.
+
+    Args:
+        store (DataStore)
+        loops (int): how many times to repeat each listing
+        path (str): the name of the query path being measured, for the
+            labels of the results.
+
+    Returns:
+        Deferred[dict[str, str]]: the results, by label
+    """
+    results = {}
+    for company, is_order_by_cteep in (("cteep", True), ("ons", False)):
+        ms, txns = yield _measure(
+            loops, lambda: store.get_solicitations(is_order_by_cteep=is_order_by_cteep)
+        )
+        results["list_%s_%s_ms" % (company, path)] = "%.1f" % (ms,)
+        results["list_%s_%s_txns" % (company, path)] = "%.1f" % (txns,)
+
+    # The second page of a table, as the clients which only care about one
+    # table of substations ask for it.
+    _, next_key = yield store.get_solicitations(
+        is_order_by_cteep=True, substation_codes=TABLE, limit=50
+    )
+    ms, txns = yield _measure(
+        loops,
+        lambda: store.get_solicitations(
+            is_order_by_cteep=True,
+            substation_codes=TABLE,
+            from_key=next_key,
+            limit=50,
+        ),
+    )
+    results["table_page_%s_ms" % (path,)] = "%.1f" % (ms,)
+    results["table_page_%s_txns" % (path,)] = "%.1f" % (txns,)
+
+    return results
+
+
+@defer.inlineCallbacks
+def main(reactor, loops, signatures):
+    hs, cleanup = yield make_homeserver(reactor)
+    store = hs.get_datastore()
+
+    try:
+        with LoggingContext("synmark_seed"):
+            solicitations = yield store.runInteraction(
+                "synmark_seed", _seed_txn, signatures
+            )
+
+        results = {"solicitations": solicitations}
+
+        # Until the backfill has finished, the listings look for the latest
+        # signature of each solicitation.
+        store._solicitation_current_status_up_to_date = False
+        listings = yield _measure_listings(store, loops, "join")
+        results.update(listings)
+
+        with LoggingContext("synmark_backfill"):
+            start = perf_counter()
+            store._all_done = False
+            while not (yield store.has_completed_background_updates()):
+                yield store.do_next_background_update(1000)
+            results["backfill_ms"] = "%.1f" % ((perf_counter() - start) * 1000,)
+
+        # The background update switches the listings to the current status
+        # columns once it has finished.
+        assert store._solicitation_current_status_up_to_date
+        listings = yield _measure_listings(store, loops, "keyset")
+        results.update(listings)
+    finally:
+        cleanup()
+
+    return results
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from synapse.api.constants import Companies
+from synapse.api.errors import SynapseError
+
+from tests import unittest
+
+
+class TableHandlerTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_table_handler()
+
+        for user_id in ("@cteep1:test", "@cteep2:test"):
+            self.get_success(
+                self.store.register_user(user_id, company_code=Companies.CTEEP)
+            )
+
+    def _get_interested_users(self, substation_code):
+        return self.get_success(
+            self.store.get_users_interested_in_substation(substation_code)
+        )
+
+    def test_associate_tables_to_users(self):
+        self.get_success(
+            self.handler.associate_tables_to_users(
+                {"@cteep1:test": ["A1"], "@cteep2:test": ["A1", "A3"]}
+            )
+        )
+        self.assertEqual(
+            frozenset(["@cteep1:test", "@cteep2:test"]),
+            self._get_interested_users("MIR"),
+        )
+
+    def test_invalid_table_rejects_all(self):
+        self.get_failure(
+            self.handler.associate_tables_to_users(
+                {"@cteep1:test": ["A1"], "@cteep2:test": ["A9"]}
+            ),
+            SynapseError,
+        )
+        self.assertEqual(frozenset(), self._get_interested_users("MIR"))
+
+    def test_unknown_user_rejects_all(self):
+        self.get_failure(
+            self.handler.associate_tables_to_users(
+                {"@cteep1:test": ["A1"], "@unknown:test": ["A1"]}
+            ),
+            SynapseError,
+        )
+        self.assertEqual(frozenset(), self._get_interested_users("MIR"))
+
+    def test_user_id_is_matched_case_insensitively(self):
+        self.get_success(
+            self.handler.associate_tables_to_users({"@CTEEP1:test": ["A1"]})
+        )
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import Mock
+
+from twisted.internet import defer
+
+from synapse.api.constants import (
+    Companies,
+    EventTypes,
+    Membership,
+    SolicitationStatus,
+)
+from synapse.api.errors import StoreError
+from synapse.types import create_requester
+from synapse.util.metrics import block_db_txn_count
+
+from tests import unittest
+from tests.utils import create_solicitation
+
+
+class LateSolicitationTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+
+        self.user_id = "@cteep:test"
+        self.get_success(
+            self.store.register_user(self.user_id, company_code=Companies.CTEEP)
+        )
+
+    def _accept(self, solicitation_id):
+        self.get_success(
+            self.handler.change_solicitation_status(
+                SolicitationStatus.ACCEPTED, None, solicitation_id, self.user_id
+            )
+        )
+
+    def _get_status(self, solicitation_id):
+        solicitation = self.get_success(
+            self.store.get_solicitation_by_id(solicitation_id)
+        )
+        return solicitation["events"][0]["status"]
+
+    def test_accepted_solicitation_becomes_late(self):
+        self.get_success(self.handler.start_late_solicitation_timer())
+
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.store, ts=int(self.clock.time()))
+        )
+        self._accept(solicitation_id)
+
+        self.reactor.advance(290)
+        self.assertEqual(SolicitationStatus.ACCEPTED, self._get_status(solicitation_id))
+
+        self.reactor.advance(15)
+        self.assertEqual(SolicitationStatus.LATE, self._get_status(solicitation_id))
+
+    def test_solicitation_accepted_by_another_process_becomes_late(self):
+        self.get_success(self.handler.start_late_solicitation_timer())
+
+        # Accept the solicitation through the store only, as if another
+        # process had handled the request.
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.store, ts=int(self.clock.time()))
+        )
+        self.get_success(
+            self.store.change_solicitation_status(
+                solicitation_id,
+                SolicitationStatus.NEW,
+                SolicitationStatus.ACCEPTED,
+                self.user_id,
+                int(self.clock.time()),
+                None,
+            )
+        )
+
+        self.reactor.advance(290)
+        self.assertEqual(SolicitationStatus.ACCEPTED, self._get_status(solicitation_id))
+
+        self.reactor.advance(15)
+        self.assertEqual(SolicitationStatus.LATE, self._get_status(solicitation_id))
+
+    def test_deadlines_are_loaded_on_start(self):
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.store, ts=int(self.clock.time()))
+        )
+        self._accept(solicitation_id)
+
+        self.reactor.advance(400)
+        self.assertEqual(SolicitationStatus.ACCEPTED, self._get_status(solicitation_id))
+
+        self.get_success(self.handler.start_late_solicitation_timer())
+        self.reactor.advance(2)
+        self.assertEqual(SolicitationStatus.LATE, self._get_status(solicitation_id))
+
+    def test_late_solicitation_is_retried_after_failure(self):
+        self.get_success(self.handler.start_late_solicitation_timer())
+
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.store, ts=int(self.clock.time()))
+        )
+        self._accept(solicitation_id)
+
+        # The first attempt to mark the solicitation late fails...
+        mark_solicitations_late = self.store.mark_solicitations_late
+        self.store.mark_solicitations_late = Mock(
+            side_effect=[defer.fail(StoreError(500, "Deadlock")), defer.succeed(([], 0))]
+        )
+        self.reactor.advance(290)
+        self.reactor.advance(15)
+        self.assertEqual(self.store.mark_solicitations_late.call_count, 1)
+        self.assertEqual(SolicitationStatus.ACCEPTED, self._get_status(solicitation_id))
+
+        # ... and it is tried again on the next tick.
+        self.store.mark_solicitations_late = mark_solicitations_late
+        self.reactor.advance(2)
+        self.assertEqual(SolicitationStatus.LATE, self._get_status(solicitation_id))
+
+    def test_executed_solicitation_is_not_late(self):
+        self.get_success(self.handler.start_late_solicitation_timer())
+
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.store, ts=int(self.clock.time()))
+        )
+        self._accept(solicitation_id)
+        self.get_success(
+            self.handler.change_solicitation_status(
+                SolicitationStatus.EXECUTED, None, solicitation_id, self.user_id
+            )
+        )
+
+        self.reactor.advance(400)
+        self.assertEqual(SolicitationStatus.EXECUTED, self._get_status(solicitation_id))
+
+
+class SolicitationCreatorTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+
+    def test_creators_are_fetched_once(self):
+        self.get_success(
+            self.store.register_user(
+                "@ons:test",
+                company_code=Companies.ONS,
+                create_profile_with_displayname="Operator",
+            )
+        )
+        for _ in range(3):
+            self.get_success(create_solicitation(self.store))
+
+        self.store.get_profiles_for_localparts = Mock(
+            side_effect=self.store.get_profiles_for_localparts
+        )
+
+        solicitations, _ = self.get_success(
+            self.handler.get_solicitations(is_order_by_cteep=False)
+        )
+        self.assertEqual(
+            [{"displayname": "Operator", "avatar_url": None}] * 3,
+            [s["created_by"] for s in solicitations],
+        )
+        self.store.get_profiles_for_localparts.assert_called_once_with(["ons"])
+
+
+class SolicitationRoomTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+
+    def test_users_are_joined_in_one_batch(self):
+        self.get_success(
+            self.store.register_user(
+                "@ons:test",
+                company_code=Companies.ONS,
+                create_profile_with_displayname="Operator",
+            )
+        )
+        users = ["@cteep%d:test" % (i,) for i in range(5)]
+        for user_id in users:
+            self.get_success(
+                self.store.register_user(
+                    user_id,
+                    company_code=Companies.CTEEP,
+                    create_profile_with_displayname=user_id[1:6],
+                )
+            )
+
+        self.store.persist_events = Mock(side_effect=self.store.persist_events)
+
+        room_id = self.get_success(
+            self.handler.create_room_for_solicitation(
+                create_requester("@ons:test"), users + ["@ons:test"], "MIR", "REACTOR"
+            )
+        )
+
+        members = self.get_success(self.store.get_users_in_room(room_id))
+        self.assertCountEqual(users + ["@ons:test"], members)
+
+        # An invite and a join for each user.
+        self.store.persist_events.assert_called_once()
+        events_and_contexts = self.store.persist_events.call_args[0][0]
+        self.assertEqual(10, len(events_and_contexts))
+
+        state = self.get_success(self.store.get_current_state_ids(room_id))
+        member = self.get_success(
+            self.store.get_event(state[(EventTypes.Member, users[0])])
+        )
+        self.assertEqual(Membership.JOIN, member.membership)
+        self.assertEqual("cteep", member.content["displayname"])
+
+
+class SolicitationSummaryTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+
+        for substation in ("MIR", "MIR", "PIR"):
+            self.get_success(create_solicitation(self.store, substation=substation))
+
+    def test_summary(self):
+        summary = self.get_success(self.handler.get_solicitation_summary())
+        self.assertEqual(3, summary["total"])
+        self.assertEqual(3, summary["by_status"][SolicitationStatus.NEW])
+        self.assertEqual(0, summary["by_status"][SolicitationStatus.ACCEPTED])
+        self.assertEqual(
+            {"MIR": {SolicitationStatus.NEW: 2}, "PIR": {SolicitationStatus.NEW: 1}},
+            summary["by_substation"],
+        )
+
+        summary = self.get_success(
+            self.handler.get_solicitation_summary(substation_codes={"PIR"})
+        )
+        self.assertEqual(1, summary["total"])
+        self.assertEqual({"PIR": {SolicitationStatus.NEW: 1}}, summary["by_substation"])
+
+    def test_metrics_are_refreshed(self):
+        self.assertEqual({}, self.handler._solicitation_counts)
+
+        self.reactor.advance(60)
+        self.assertEqual(
+            {"MIR": {SolicitationStatus.NEW: 2}, "PIR": {SolicitationStatus.NEW: 1}},
+            self.handler._solicitation_counts,
+        )
+
+
+class SolicitationListCacheTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+
+        self.solicitation_id, _ = self.get_success(create_solicitation(self.store))
+
+        self.store.get_solicitations = Mock(side_effect=self.store.get_solicitations)
+
+    def test_identical_requests_are_coalesced(self):
+        first = self.handler.get_solicitations(is_order_by_cteep=True)
+        second = self.handler.get_solicitations(is_order_by_cteep=True)
+        self.assertEqual(self.get_success(first), self.get_success(second))
+        self.assertEqual(1, self.store.get_solicitations.call_count)
+
+        # Other parameters get their own result.
+        self.get_success(self.handler.get_solicitations(is_order_by_cteep=False))
+        self.assertEqual(2, self.store.get_solicitations.call_count)
+
+    def test_stages_are_measured(self):
+        def txn_count(block_name):
+            return block_db_txn_count.labels(block_name)._value.get()
+
+        query_txns = txn_count("list_solicitations_query")
+        profile_txns = txn_count("solicitation_creator_profiles")
+
+        self.get_success(self.handler.get_solicitations(is_order_by_cteep=True))
+
+        # The page and its history are loaded in one transaction, and the
+        # profiles of the creators in another.
+        self.assertEqual(query_txns + 1, txn_count("list_solicitations_query"))
+        self.assertEqual(profile_txns + 1, txn_count("solicitation_creator_profiles"))
+
+    def test_stream_change_invalidates(self):
+        self.get_success(self.handler.get_solicitations(is_order_by_cteep=True))
+
+        second_id, _ = self.get_success(create_solicitation(self.store))
+        solicitations, _ = self.get_success(
+            self.handler.get_solicitations(is_order_by_cteep=True)
+        )
+        self.assertEqual(
+            [self.solicitation_id, second_id], [s["id"] for s in solicitations]
+        )
+        self.assertEqual(2, self.store.get_solicitations.call_count)
+
+
+class SolicitationChangesTestCase(unittest.HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.handler = hs.get_voltage_control_handler()
+        self.notifier = hs.get_notifier()
+
+        self.user_id = "@cteep:test"
+
+    def _create_notified_solicitation(self):
+        solicitation_id, token = self.get_success(create_solicitation(self.store))
+        self.notifier.on_new_event("solicitations_key", token, users=[self.user_id])
+        return solicitation_id, token
+
+    def test_without_from_returns_position(self):
+        _, token = self._create_notified_solicitation()
+        result = self.get_success(
+            self.handler.wait_for_solicitation_changes(self.user_id, None, 10000)
+        )
+        self.assertEqual(([], token), result)
+
+    def test_missed_changes_are_returned_immediately(self):
+        from_key = self.store.get_solicitation_stream_token()
+        solicitation_id, token = self._create_notified_solicitation()
+
+        changes, next_key = self.get_success(
+            self.handler.wait_for_solicitation_changes(self.user_id, from_key, 10000)
+        )
+        self.assertEqual([solicitation_id], [s["id"] for s in changes])
+        self.assertEqual(token, next_key)
+
+    def test_waits_for_changes(self):
+        from_key = self.store.get_solicitation_stream_token()
+        d = self.handler.wait_for_solicitation_changes(self.user_id, from_key, 10000)
+        self.pump()
+        self.assertFalse(d.called)
+
+        solicitation_id, token = self._create_notified_solicitation()
+        self.pump()
+        changes, next_key = self.successResultOf(d)
+        self.assertEqual([solicitation_id], [s["id"] for s in changes])
+        self.assertEqual(token, next_key)
+
+    def test_from_ahead_of_notifier(self):
+        # The user's notifier stream is created at the current position...
+        d = self.handler.wait_for_solicitation_changes(
+            self.user_id, self.store.get_solicitation_stream_token(), 1
+        )
+        self.pump()
+        self.reactor.advance(1)
+        self.successResultOf(d)
+
+        # ... and a change the client has seen doesn't reach it, as if this
+        # worker were lagging.
+        _, from_key = self.get_success(create_solicitation(self.store))
+
+        d = self.handler.wait_for_solicitation_changes(self.user_id, from_key, 10000)
+        self.pump()
+
+        # Something else wakes the user's stream up, before it has caught up.
+        self.notifier.on_new_event("typing_key", 1, users=[self.user_id])
+        self.pump()
+        self.assertFalse(d.called)
+
+        # Only the changes after `from_key` are returned.
+        solicitation_id, token = self._create_notified_solicitation()
+        self.pump()
+        changes, next_key = self.successResultOf(d)
+        self.assertEqual([solicitation_id], [s["id"] for s in changes])
+        self.assertEqual(token, next_key)
+
+    def test_timeout(self):
+        from_key = self.store.get_solicitation_stream_token()
+        d = self.handler.wait_for_solicitation_changes(self.user_id, from_key, 10000)
+        self.pump()
+        self.assertFalse(d.called)
+
+        self.reactor.advance(11)
+        self.assertEqual(([], from_key), self.successResultOf(d))
@@ -0,0 +1,78 @@
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from synapse.api.constants import EventTypes, SolicitationStatus
+from synapse.replication.slave.storage.voltage_control import (
+    SlavedVoltageControlStore,
+)
+
+from tests.utils import create_solicitation
+
+from ._base import BaseSlavedStoreTestCase
+
+USER_ID = "@ons:blue"
+
+
+class SlavedVoltageControlStoreTestCase(BaseSlavedStoreTestCase):
+
+    STORE_TYPE = SlavedVoltageControlStore
+
+    def test_solicitation_updates(self):
+        since = self.slaved_store.get_solicitation_stream_token()
+
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.master_store, user_id=USER_ID)
+        )
+        self.get_success(
+            self.master_store.change_solicitation_status(
+                solicitation_id,
+                SolicitationStatus.NEW,
+                SolicitationStatus.ACCEPTED,
+                USER_ID,
+                1001,
+                None,
+            )
+        )
+        self.replicate()
+
+        token = self.master_store.get_solicitation_stream_token()
+        self.assertEqual(token, self.slaved_store.get_solicitation_stream_token())
+
+        self.check("get_all_solicitation_updates", [since, token])
+        updates = self.get_success(
+            self.slaved_store.get_all_solicitation_updates(since, token)
+        )
+        self.assertEqual(
+            [EventTypes.CreateSolicitation, EventTypes.ChangeSolicitationStatus],
+            [u["type"] for u in updates],
+        )
+
+        self.check("get_solicitations", [True])
+        self.check("get_solicitations_by_ids", [[solicitation_id]])
+
+    def test_get_all_solicitation_changes(self):
+        since = self.master_store.get_solicitation_stream_token()
+        solicitation_id, _ = self.get_success(
+            create_solicitation(self.master_store, user_id=USER_ID)
+        )
+        token = self.master_store.get_solicitation_stream_token()
+
+        changes = self.get_success(
+            self.master_store.get_all_solicitation_changes(since, token, 10)
+        )
+        self.assertEqual(
+            [(token, solicitation_id, "MIR", USER_ID, EventTypes.CreateSolicitation)],
+            [change[:5] for change in changes],
+        )
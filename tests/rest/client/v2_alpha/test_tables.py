@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+from synapse.api.constants import Companies
+from synapse.rest.client.v2_alpha import tables
+
+from tests import unittest
+
+
+class BulkAssociateTablesTestCase(unittest.HomeserverTestCase):
+
+    servlets = [tables.register_servlets]
+
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.url = "/_matrix/client/r0/associate_tables"
+
+        self.get_success(self.store.register_user("@admin:test", admin=True))
+        self.token = "admin_token"
+        self.get_success(
+            self.store.add_access_token_to_user("@admin:test", self.token, None, None)
+        )
+        self.get_success(
+            self.store.register_user("@cteep:test", company_code=Companies.CTEEP)
+        )
+
+    def _put(self, content):
+        request, channel = self.make_request(
+            "PUT", self.url, json.dumps(content), access_token=self.token
+        )
+        self.render(request)
+        return channel
+
+    def test_associate_tables(self):
+        channel = self._put({"users": {"@cteep:test": ["A1"]}})
+        self.assertEqual(200, channel.code, channel.json_body)
+        self.assertEqual(
+            frozenset(["@cteep:test"]),
+            self.get_success(self.store.get_users_interested_in_substation("MIR")),
+        )
+
+    def test_tables_must_be_codes(self):
+        channel = self._put({"users": {"@cteep:test": [["A1"]]}})
+        self.assertEqual(400, channel.code, channel.json_body)
+        self.assertEqual("M_BAD_JSON", channel.json_body["errcode"])
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from synapse.api.constants import Companies
+from synapse.rest.client.v2_alpha import voltage_control
+
+from tests import unittest
+from tests.utils import create_solicitation
+
+
+class SolicitationListTestCase(unittest.HomeserverTestCase):
+
+    servlets = [voltage_control.register_servlets]
+
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.url = "/_matrix/client/r0/voltage_control_solicitation"
+
+        self.get_success(
+            self.store.register_user("@ons:test", company_code=Companies.ONS)
+        )
+        self.token = "ons_token"
+        self.get_success(
+            self.store.add_access_token_to_user("@ons:test", self.token, None, None)
+        )
+
+        self.ids = [
+            self.get_success(create_solicitation(self.store, ts=1000 + i))[0]
+            for i in range(3)
+        ]
+
+    def _get(self, query):
+        request, channel = self.make_request(
+            "GET", self.url + query, access_token=self.token
+        )
+        self.render(request)
+        self.assertEqual(200, channel.code, channel.json_body)
+        return channel.json_body
+
+    def test_list(self):
+        # Without pagination, this is a list starting at the `from_id`
+        # solicitation.
+        body = self._get("?from_id=%d" % (self.ids[1],))
+        self.assertEqual(self.ids[1:], [s["id"] for s in body])
+
+    def test_paginate(self):
+        body = self._get("?paginate=true&limit=2")
+        self.assertEqual(self.ids[:2], [s["id"] for s in body["chunk"]])
+
+        body = self._get("?limit=2&from=%s" % (body["next_batch"],))
+        self.assertEqual(self.ids[2:], [s["id"] for s in body["chunk"]])
+        self.assertNotIn("next_batch", body)
@@ -634,3 +634,21 @@ class TestStateResolutionStore(object):
                 stack.append(aid)
 
         return list(result)
+
+    def get_auth_chain_difference(self, state_sets):
+        """Given sets of state events figure out the auth chain difference (as
+        per state res v2 algorithm).
+
+        Args:
+            state_sets (list[set[str]])
+
+        Returns:
+            Deferred[set[str]]: Set of event IDs.
+        """
+
+        auth_chains = [set(self.get_auth_chain(state_set)) for state_set in state_sets]
+
+        intersection = auth_chains[0].intersection(*auth_chains[1:])
+        union = set().union(*auth_chains)
+
+        return union - intersection
@@ -22,8 +22,10 @@ from twisted.internet import defer
 
 from synapse.storage._base import SQLBaseStore
 from synapse.storage.engines import create_engine
+from synapse.util.caches.shared_event_cache import SharedEventCache
 
 from tests import unittest
+from tests.server import get_clock
 from tests.utils import TestHomeServer
 
 
@@ -51,6 +53,8 @@ class SQLBaseStoreTestCase(unittest.TestCase):
         config = Mock()
         config._disable_native_upserts = True
         config.event_cache_size = 1
+        config.cache_expiry = {}
+        config.shared_event_cache_path = None
         config.database_config = {"name": "sqlite3"}
         engine = create_engine(config.database_config)
         fake_engine = Mock(wraps=engine)
@@ -187,3 +191,58 @@ class SQLBaseStoreTestCase(unittest.TestCase):
         self.mock_txn.execute.assert_called_with(
             "DELETE FROM tablename WHERE keycol = ?", ["Go away"]
         )
+
+    def _make_shared_event_cache(self, path):
+        reactor, clock = get_clock()
+        hs = Mock()
+        hs.get_clock.return_value = clock
+        hs.get_reactor.return_value = reactor
+        cache = SharedEventCache(
+            hs, path, 10, mmap_size=0, stream_position_callback=lambda: 0
+        )
+        return cache, reactor
+
+    def test_catch_up_shared_event_cache(self):
+        cache, reactor = self._make_shared_event_cache(self.mktemp())
+        cache.add_rows(
+            [
+                {
+                    "event_id": event_id,
+                    "json": "{}",
+                    "internal_metadata": "{}",
+                    "format_version": 1,
+                    "rejected_reason": None,
+                    "redactions": [],
+                }
+                for event_id in ("$a", "$b")
+            ]
+        )
+        reactor.advance(0)
+        cache.catch_up([], 3)
+
+        self.datastore._shared_event_cache = cache
+        self.datastore._cache_id_gen = Mock()
+        self.datastore._cache_id_gen.get_current_token.return_value = 5
+        self.mock_txn.__iter__ = Mock(return_value=iter([(["$a"],)]))
+
+        self.datastore._catch_up_shared_event_cache_txn(self.mock_txn)
+
+        # the invalidations made since the position of the file are replayed
+        self.mock_txn.execute.assert_called_with(
+            "SELECT keys FROM cache_invalidation_stream"
+            " WHERE ? < stream_id AND stream_id <= ? AND cache_func = ?",
+            (3, 5, "_shared_event_cache"),
+        )
+        self.assertEqual(cache.get_stream_position(), 5)
+        d = cache.get_rows(["$a", "$b"])
+        reactor.advance(0)
+        self.assertEqual(set(self.successResultOf(d)), {"$b"})
+
+        # without a caches stream, the rows are dropped
+        self.datastore._cache_id_gen = None
+        self.datastore._catch_up_shared_event_cache_txn(self.mock_txn)
+
+        self.assertIsNone(cache.get_stream_position())
+        d = cache.get_rows(["$b"])
+        reactor.advance(0)
+        self.assertEqual(self.successResultOf(d), {})
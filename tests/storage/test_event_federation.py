@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from mock import PropertyMock, patch
+
 from twisted.internet import defer
 
 import tests.unittest
@@ -75,3 +77,63 @@ class EventFederationWorkerStoreTestCase(tests.unittest.TestCase):
             el = r[i]
             depth = el[2]
             self.assertLessEqual(5, depth)
+
+    @defer.inlineCallbacks
+    def _insert_auth_dag(self, auth_dag):
+        def insert_event_auth(txn):
+            self.store._simple_insert_many_txn(
+                txn,
+                table="event_auth",
+                values=[
+                    {"event_id": event_id, "auth_id": auth_id, "room_id": "!room:test"}
+                    for event_id, auth_ids in auth_dag.items()
+                    for auth_id in auth_ids
+                ],
+            )
+
+        yield self.store.runInteraction("insert", insert_event_auth)
+
+    @defer.inlineCallbacks
+    def _test_auth_chain(self):
+        #     create
+        #     /    \
+        #   pl1    join
+        #    |  \  /
+        #   pl2  pl3 (auths both pl1 and join)
+        yield self._insert_auth_dag(
+            {
+                "create": [],
+                "pl1": ["create"],
+                "join": ["create"],
+                "pl2": ["pl1"],
+                "pl3": ["pl1", "join"],
+            }
+        )
+
+        chain = yield self.store.get_auth_chain_ids(["pl2", "pl3"])
+        self.assertCountEqual(chain, ["pl1", "join", "create"])
+
+        chain = yield self.store.get_auth_chain_ids(["pl3"], include_given=True)
+        self.assertCountEqual(chain, ["pl3", "pl1", "join", "create"])
+
+        difference = yield self.store.get_auth_chain_difference(
+            [{"pl2"}, {"pl3"}, {"pl3", "join"}]
+        )
+        self.assertEqual(difference, {"pl2", "pl3", "join"})
+
+        difference = yield self.store.get_auth_chain_difference([{"pl2"}, {"pl2"}])
+        self.assertEqual(difference, set())
+
+    def test_auth_chain(self):
+        self.assertTrue(self.store.database_engine.supports_recursive_ctes)
+        return self._test_auth_chain()
+
+    @defer.inlineCallbacks
+    def test_auth_chain_without_recursive_ctes(self):
+        with patch.object(
+            type(self.store.database_engine),
+            "supports_recursive_ctes",
+            new_callable=PropertyMock,
+            return_value=False,
+        ):
+            yield self._test_auth_chain()
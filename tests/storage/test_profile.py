@@ -54,3 +54,17 @@ class ProfileStoreTestCase(unittest.TestCase):
             "http://my.site/here",
             (yield self.store.get_profile_avatar_url(self.u_frank.localpart)),
         )
+
+    @defer.inlineCallbacks
+    def test_get_profiles_for_localparts(self):
+        res = yield self.store.get_profiles_for_localparts(["frank", "bob"])
+        self.assertEquals({"frank": None, "bob": None}, res)
+
+        # The cached misses must be invalidated when the profiles change.
+        yield self.store.create_profile("frank")
+        yield self.store.set_profile_displayname("frank", "Frank")
+
+        res = yield self.store.get_profiles_for_localparts(["frank", "bob"])
+        self.assertEquals(
+            {"frank": {"displayname": "Frank", "avatar_url": None}, "bob": None}, res
+        )
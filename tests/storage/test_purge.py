@@ -104,3 +104,42 @@ class PurgeTests(HomeserverTestCase):
         self.successResultOf(get_second)
         self.successResultOf(get_third)
         self.successResultOf(get_last)
+
+
+class SharedEventCachePurgeTests(PurgeTests):
+    """Runs the purge tests with the shared event cache."""
+
+    def make_homeserver(self, reactor, clock):
+        config = self.default_config()
+        config["shared_event_cache"] = {"path": self.mktemp()}
+        hs = self.setup_test_homeserver("server", config=config, http_client=None)
+        return hs
+
+    def test_purge_invalidates_shared_event_cache(self):
+        """
+        Purging a room drops the purged events from the shared event cache.
+        """
+        first = self.helper.send(self.room_id, body="test1")
+        last = self.helper.send(self.room_id, body="test2")
+
+        storage = self.hs.get_datastore()
+        shared_event_cache = storage._shared_event_cache
+
+        # Read the events from the database, which puts them in the shared cache
+        storage._get_event_cache.invalidate_all()
+        self.get_success(storage.get_events([first["event_id"], last["event_id"]]))
+        rows = self.get_success(
+            shared_event_cache.get_rows([first["event_id"], last["event_id"]])
+        )
+        self.assertEqual(set(rows), {first["event_id"], last["event_id"]})
+
+        # Purge everything before the last event
+        event = self.get_success(
+            storage.get_topological_token_for_event(last["event_id"])
+        )
+        self.get_success(storage.purge_history(self.room_id, event, True))
+
+        rows = self.get_success(
+            shared_event_cache.get_rows([first["event_id"], last["event_id"]])
+        )
+        self.assertEqual(set(rows), {last["event_id"]})
@@ -286,3 +286,44 @@ class RedactionTestCase(unittest.HomeserverTestCase):
         self.assertEqual(
             fetched.unsigned["redacted_because"].event_id, redaction_event_id2
         )
+
+
+class SharedEventCacheRedactionTestCase(RedactionTestCase):
+    """Runs the redaction tests with the shared event cache."""
+
+    def make_homeserver(self, reactor, clock):
+        config = self.default_config()
+        config["shared_event_cache"] = {"path": self.mktemp()}
+        return self.setup_test_homeserver(
+            config=config, resource_for_federation=Mock(), http_client=None
+        )
+
+    def test_shared_event_cache(self):
+        self.inject_room_member(self.room1, self.u_alice, Membership.JOIN)
+        msg_event = self.inject_message(self.room1, self.u_alice, "t")
+
+        # reading the event from the database puts it in the shared cache
+        self.store._get_event_cache.invalidate_all()
+        self.get_success(self.store.get_event(msg_event.event_id))
+        rows = self.get_success(
+            self.store._shared_event_cache.get_rows([msg_event.event_id])
+        )
+        self.assertEqual(rows[msg_event.event_id]["redactions"], [])
+
+        # from where it is read next, rather than from the database
+        self.store._get_event_cache.invalidate_all()
+        self.store._enqueue_events = Mock(side_effect=AssertionError())
+        event = self.get_success(self.store.get_event(msg_event.event_id))
+        self.assertEqual(event.content, {"body": "t", "msgtype": "message"})
+        del self.store._enqueue_events
+
+        # redacting the event drops it from the shared cache
+        self.inject_redaction(self.room1, msg_event.event_id, self.u_alice, "t")
+        rows = self.get_success(
+            self.store._shared_event_cache.get_rows([msg_event.event_id])
+        )
+        self.assertEqual(rows, {})
+
+        self.store._get_event_cache.invalidate_all()
+        event = self.get_success(self.store.get_event(msg_event.event_id))
+        self.assertEqual(event.content, {})
@@ -16,7 +16,7 @@
 
 from twisted.internet import defer
 
-from synapse.api.constants import UserTypes
+from synapse.api.constants import Companies, UserTypes
 
 from tests import unittest
 from tests.utils import setup_test_homeserver
@@ -114,3 +114,21 @@ class RegistrationStoreTestCase(unittest.TestCase):
         )
         res = yield self.store.is_support_user(SUPPORT_USER)
         self.assertTrue(res)
+
+    @defer.inlineCallbacks
+    def test_company_roster(self):
+        res = yield self.store.get_company_code(self.user_id)
+        self.assertIsNone(res)
+        res = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        self.assertEqual(frozenset(), res)
+
+        # Both lookups are cached, and must be invalidated by the registration.
+        yield self.store.register_user(self.user_id, company_code=Companies.ONS)
+        res = yield self.store.get_company_code(self.user_id)
+        self.assertEqual(Companies.ONS, res)
+        res = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        self.assertEqual(frozenset([self.user_id]), res)
+
+        yield self.store.set_user_deactivated_status(self.user_id, True)
+        res = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        self.assertEqual(frozenset(), res)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from twisted.internet import defer
+
+from synapse.api.constants import Companies
+
+import tests.unittest
+import tests.utils
+
+
+class TableStoreTestCase(tests.unittest.TestCase):
+    @defer.inlineCallbacks
+    def setUp(self):
+        hs = yield tests.utils.setup_test_homeserver(self.addCleanup)
+
+        self.store = hs.get_datastore()
+
+    @defer.inlineCallbacks
+    def test_get_users_interested_in_substation(self):
+        users = yield self.store.get_users_interested_in_substation("MIR")
+        self.assertEqual(frozenset(), users)
+
+        # Table A1 covers MIR and PIR, A3 covers SAL.
+        yield self.store.associate_table_to_user("@cteep:test", "A1")
+        yield self.store.associate_table_to_user("@other:test", "A3")
+
+        users = yield self.store.get_users_interested_in_substation("MIR")
+        self.assertEqual(frozenset(["@cteep:test"]), users)
+        users = yield self.store.get_users_interested_in_substation("SAL")
+        self.assertEqual(frozenset(["@other:test"]), users)
+
+    @defer.inlineCallbacks
+    def test_associate_tables_to_users(self):
+        yield self.store.associate_tables_to_users(
+            {"@cteep:test": ["A1"], "@other:test": ["A1", "A3"]}
+        )
+        # Associating a table again is a no-op.
+        yield self.store.associate_tables_to_users({"@cteep:test": ["A1"]})
+
+        users = yield self.store.get_users_interested_in_substation("MIR")
+        self.assertEqual(frozenset(["@cteep:test", "@other:test"]), users)
+        users = yield self.store.get_users_interested_in_substation("SAL")
+        self.assertEqual(frozenset(["@other:test"]), users)
+
+        # Replacing the tables drops those which are not listed any more.
+        yield self.store.associate_tables_to_users(
+            {"@other:test": ["A3"]}, replace=True
+        )
+        users = yield self.store.get_users_interested_in_substation("MIR")
+        self.assertEqual(frozenset(["@cteep:test"]), users)
+        users = yield self.store.get_users_interested_in_substation("SAL")
+        self.assertEqual(frozenset(["@other:test"]), users)
+
+    @defer.inlineCallbacks
+    def test_get_user_ids_by_company_code(self):
+        users = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        self.assertEqual(frozenset(), users)
+
+        yield self.store.register_user("@ons:test", company_code=Companies.ONS)
+        yield self.store.register_user("@cteep:test", company_code=Companies.CTEEP)
+
+        users = yield self.store.get_user_ids_by_company_code(Companies.ONS)
+        self.assertEqual(frozenset(["@ons:test"]), users)
+
+    @defer.inlineCallbacks
+    def test_table_catalogue(self):
+        catalogue = yield self.store.get_table_catalogue()
+        self.assertEqual(frozenset(["MIR", "PIR"]), catalogue["A1"]["substations"])
+        self.assertEqual(frozenset(), catalogue["A2"]["substations"])
+
+        table = yield self.store.get_table_by_company_code_and_table_code(
+            Companies.CTEEP, "A1"
+        )
+        self.assertEqual({"code": "A1", "name": "MIR e PIR"}, table)
+        table = yield self.store.get_table_by_company_code_and_table_code(
+            Companies.ONS, "A1"
+        )
+        self.assertIsNone(table)
+
+        res = yield self.store.get_table_by_code("A9")
+        self.assertEqual([], res)
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from twisted.internet import defer
+
+from synapse.api.constants import (
+    EventTypes,
+    SolicitationSortParams,
+    SolicitationStatus,
+)
+from synapse.api.errors import StoreError
+
+import tests.unittest
+import tests.utils
+from tests.utils import create_solicitation
+
+
+class VoltageControlStoreTestCase(tests.unittest.TestCase):
+    @defer.inlineCallbacks
+    def setUp(self):
+        hs = yield tests.utils.setup_test_homeserver(self.addCleanup)
+
+        self.store = hs.get_datastore()
+        self.user_id = "@ons:test"
+
+    @defer.inlineCallbacks
+    def test_get_all_solicitation_updates(self):
+        first_id, _ = yield create_solicitation(self.store)
+        since = self.store.get_solicitation_stream_token()
+
+        second_id, _ = yield create_solicitation(self.store)
+        yield self.store.create_solicitation_updated_event(
+            EventTypes.ChangeSolicitationStatus,
+            first_id,
+            None,
+            {"status": SolicitationStatus.LATE},
+        )
+        now = self.store.get_solicitation_stream_token()
+
+        updates = yield self.store.get_all_solicitation_updates(since, now)
+        self.assertEqual(
+            [second_id, first_id], [u["solicitation_id"] for u in updates]
+        )
+        self.assertEqual({"status": SolicitationStatus.LATE}, updates[1]["content"])
+
+        updates = yield self.store.get_all_solicitation_updates(now, now)
+        self.assertEqual([], updates)
+
+    @defer.inlineCallbacks
+    def test_get_solicitations_by_ids(self):
+        first_id, _ = yield create_solicitation(self.store, substation="MIR")
+        second_id, _ = yield create_solicitation(self.store, substation="PIR")
+
+        res = yield self.store.get_solicitations_by_ids([second_id, first_id, 999])
+        self.assertEqual([second_id, first_id], [s["id"] for s in res])
+        self.assertEqual("PIR", res[0]["substation_code"])
+        self.assertEqual(SolicitationStatus.NEW, res[0]["events"][0]["status"])
+
+    @defer.inlineCallbacks
+    def test_get_solicitations_uses_latest_status(self):
+        first_id, _ = yield create_solicitation(self.store, ts=1000)
+        second_id, _ = yield create_solicitation(self.store, ts=1001)
+
+        # Accepting in the same second as the creation must still win.
+        yield self.store.create_solicitation_status_signature(
+            first_id, self.user_id, SolicitationStatus.ACCEPTED, 1000, None
+        )
+
+        res, next_key = yield self.store.get_solicitations(is_order_by_cteep=True)
+        self.assertEqual([first_id, second_id], [s["id"] for s in res])
+        self.assertEqual(
+            [SolicitationStatus.ACCEPTED, SolicitationStatus.NEW],
+            [e["status"] for e in res[0]["events"]],
+        )
+        self.assertIsNone(next_key)
+
+        res, next_key = yield self.store.get_solicitations(
+            is_order_by_cteep=False, limit=1
+        )
+        self.assertEqual([second_id], [s["id"] for s in res])
+
+        res, next_key = yield self.store.get_solicitations(
+            is_order_by_cteep=False, from_key=next_key, limit=1
+        )
+        self.assertEqual([first_id], [s["id"] for s in res])
+
+    @defer.inlineCallbacks
+    def test_get_solicitations_filters(self):
+        mir_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        pir_id, _ = yield create_solicitation(self.store, substation="PIR", ts=1001)
+        sal_id, _ = yield create_solicitation(self.store, substation="SAL", ts=1500)
+
+        res, _ = yield self.store.get_solicitations(
+            is_order_by_cteep=True, substation_codes={"MIR", "SAL"}
+        )
+        self.assertEqual([mir_id, sal_id], [s["id"] for s in res])
+
+        res, next_key = yield self.store.get_solicitations(
+            is_order_by_cteep=True, substation_codes=set()
+        )
+        self.assertEqual(([], None), (res, next_key))
+
+        res, _ = yield self.store.get_solicitations(
+            is_order_by_cteep=True, expired_before_ts=1200
+        )
+        self.assertEqual([sal_id], [s["id"] for s in res])
+
+        # Paginate through the listing ordered by substation, then creation.
+        sort = [SolicitationSortParams.SUBSTATION, SolicitationSortParams.CREATION_TIME]
+        res, next_key = yield self.store.get_solicitations(
+            is_order_by_cteep=True, sort=sort, limit=2
+        )
+        self.assertEqual([mir_id, pir_id], [s["id"] for s in res])
+
+        res, next_key = yield self.store.get_solicitations(
+            is_order_by_cteep=True, sort=sort, from_key=next_key, limit=2
+        )
+        self.assertEqual([sal_id], [s["id"] for s in res])
+        self.assertIsNone(next_key)
+
+    @defer.inlineCallbacks
+    def test_current_status_background_update(self):
+        first_id, _ = yield create_solicitation(self.store, ts=1000)
+        second_id, _ = yield create_solicitation(self.store, ts=1001)
+        yield self.store.create_solicitation_status_signature(
+            first_id, self.user_id, SolicitationStatus.ACCEPTED, 1002, None
+        )
+
+        # Forget the current status, as for solicitations created before it
+        # was tracked.
+        yield self.store._simple_update(
+            table="voltage_control_solicitation",
+            keyvalues={},
+            updatevalues={"current_status": None, "current_status_ts": None},
+            desc="test",
+        )
+
+        yield self._run_background_updates()
+
+        rows = yield self.store._simple_select_list(
+            table="voltage_control_solicitation",
+            keyvalues={},
+            retcols=("id", "current_status", "current_status_ts"),
+        )
+        self.assertCountEqual(
+            [
+                {"id": first_id, "current_status": "ACCEPTED", "current_status_ts": 1002},
+                {"id": second_id, "current_status": "NEW", "current_status_ts": 1001},
+            ],
+            rows,
+        )
+
+        self.assertTrue(self.store._solicitation_current_status_up_to_date)
+
+        res, _ = yield self.store.get_solicitations(is_order_by_cteep=True)
+        self.assertEqual([first_id, second_id], [s["id"] for s in res])
+
+        res = yield self.store.get_accepted_solicitations()
+        self.assertEqual([{"id": first_id, "time_stamp": 1002}], res)
+
+    @defer.inlineCallbacks
+    def test_create_solicitation_group_with_solicitations(self):
+        since = self.store.get_solicitation_stream_token()
+        solicitations = [
+            {
+                "action": "TURN_ON",
+                "equipment": "REACTOR",
+                "substation": substation,
+                "staggered": False,
+                "amount": "1",
+                "voltage": None,
+                "at": None,
+                "bt": None,
+            }
+            for substation in ("MIR", "PIR", "ATI")
+        ]
+
+        ids, token = yield self.store.create_solicitation_group_with_solicitations(
+            "10", solicitations, self.user_id, 1000, SolicitationStatus.NEW
+        )
+        self.assertEqual(token, self.store.get_solicitation_stream_token())
+
+        res = yield self.store.get_solicitations_by_ids(ids)
+        self.assertEqual(["MIR", "PIR", "ATI"], [s["substation_code"] for s in res])
+        self.assertEqual(1, len({s["group_id"] for s in res}))
+        self.assertEqual(
+            [[SolicitationStatus.NEW]] * 3,
+            [[e["status"] for e in s["events"]] for s in res],
+        )
+
+        updates = yield self.store.get_all_solicitation_updates(since, token)
+        self.assertEqual(ids, [u["solicitation_id"] for u in updates])
+        self.assertEqual(
+            [EventTypes.CreateSolicitation] * 3, [u["type"] for u in updates]
+        )
+
+    @defer.inlineCallbacks
+    def test_mark_solicitations_late(self):
+        first_id, _ = yield create_solicitation(self.store, ts=1000)
+        second_id, _ = yield create_solicitation(self.store, ts=1000)
+        third_id, _ = yield create_solicitation(self.store, ts=1000)
+        for solicitation_id, ts in ((first_id, 1000), (second_id, 1100)):
+            yield self.store.create_solicitation_status_signature(
+                solicitation_id, self.user_id, SolicitationStatus.ACCEPTED, ts, None
+            )
+
+        res = yield self.store.get_accepted_solicitations()
+        self.assertCountEqual([first_id, second_id], [s["id"] for s in res])
+
+        # Only the first one has been accepted for five minutes, and the third
+        # one was never accepted.
+        since = self.store.get_solicitation_stream_token()
+        late, token = yield self.store.mark_solicitations_late(
+            [first_id, second_id, third_id], 1300
+        )
+        self.assertEqual([{"id": first_id, "substation_code": "MIR"}], late)
+
+        updates = yield self.store.get_all_solicitation_updates(since, token)
+        self.assertEqual([first_id], [u["solicitation_id"] for u in updates])
+
+        res = yield self.store.get_solicitations_by_ids([first_id])
+        self.assertEqual(SolicitationStatus.LATE, res[0]["events"][0]["status"])
+
+        late, _ = yield self.store.mark_solicitations_late([first_id], 1400)
+        self.assertEqual([], late)
+
+    @defer.inlineCallbacks
+    def test_mark_solicitations_late_after_status_change(self):
+        solicitation_id, _ = yield create_solicitation(self.store, ts=1000)
+        yield self.store.change_solicitation_status(
+            solicitation_id,
+            SolicitationStatus.NEW,
+            SolicitationStatus.ACCEPTED,
+            self.user_id,
+            1000,
+            None,
+        )
+
+        # The deadline fires, but the solicitation is executed before the
+        # late transition is written.
+        res = yield self.store.get_accepted_solicitations()
+        self.assertEqual([solicitation_id], [s["id"] for s in res])
+        yield self.store.change_solicitation_status(
+            solicitation_id,
+            SolicitationStatus.ACCEPTED,
+            SolicitationStatus.EXECUTED,
+            self.user_id,
+            1350,
+            None,
+        )
+        since = self.store.get_solicitation_stream_token()
+        late, token = yield self.store.mark_solicitations_late(
+            [s["id"] for s in res], 1400
+        )
+        self.assertEqual([], late)
+
+        updates = yield self.store.get_all_solicitation_updates(since, token)
+        self.assertEqual([], updates)
+
+        res = yield self.store.get_solicitations_by_ids([solicitation_id])
+        self.assertEqual(
+            [
+                SolicitationStatus.EXECUTED,
+                SolicitationStatus.ACCEPTED,
+                SolicitationStatus.NEW,
+            ],
+            [e["status"] for e in res[0]["events"]],
+        )
+
+    @defer.inlineCallbacks
+    def test_change_solicitation_status(self):
+        solicitation_id, _ = yield create_solicitation(self.store, ts=1000)
+        since = self.store.get_solicitation_stream_token()
+
+        token = yield self.store.change_solicitation_status(
+            solicitation_id,
+            SolicitationStatus.NEW,
+            SolicitationStatus.ACCEPTED,
+            self.user_id,
+            1001,
+            None,
+        )
+        updates = yield self.store.get_all_solicitation_updates(since, token)
+        self.assertEqual(
+            [{"status": SolicitationStatus.ACCEPTED}], [u["content"] for u in updates]
+        )
+
+        # A second change validated against the NEW status loses the race.
+        yield self.assertFailure(
+            self.store.change_solicitation_status(
+                solicitation_id,
+                SolicitationStatus.NEW,
+                SolicitationStatus.CONTESTED,
+                self.user_id,
+                1002,
+                "late",
+            ),
+            StoreError,
+        )
+
+        res = yield self.store.get_solicitations_by_ids([solicitation_id])
+        self.assertEqual(
+            [SolicitationStatus.ACCEPTED, SolicitationStatus.NEW],
+            [e["status"] for e in res[0]["events"]],
+        )
+
+    @defer.inlineCallbacks
+    def test_change_solicitation_status_before_backfill(self):
+        solicitation_id, _ = yield create_solicitation(self.store, ts=1000)
+        yield self.store._simple_update(
+            table="voltage_control_solicitation",
+            keyvalues={},
+            updatevalues={"current_status": None, "current_status_ts": None},
+            desc="test",
+        )
+
+        yield self.store.change_solicitation_status(
+            solicitation_id,
+            SolicitationStatus.NEW,
+            SolicitationStatus.ACCEPTED,
+            self.user_id,
+            1001,
+            None,
+        )
+
+        res = yield self.store.get_accepted_solicitations()
+        self.assertEqual([solicitation_id], [s["id"] for s in res])
+
+    @defer.inlineCallbacks
+    def test_archive_finished_solicitations(self):
+        since = self.store.get_solicitation_stream_token()
+        executed_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        canceled_id, _ = yield create_solicitation(self.store, substation="PIR", ts=1000)
+        recent_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        active_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        for solicitation_id, status, ts in (
+            (executed_id, SolicitationStatus.EXECUTED, 1100),
+            (canceled_id, SolicitationStatus.CANCELED, 1200),
+            (recent_id, SolicitationStatus.EXECUTED, 2000),
+            (active_id, SolicitationStatus.ACCEPTED, 1100),
+        ):
+            yield self.store.create_solicitation_status_signature(
+                solicitation_id, self.user_id, status, ts, None
+            )
+
+        # Only the solicitations finished before the cutoff are archived, in
+        # batches of the given size.
+        archived = yield self.store.archive_finished_solicitations(1500, 1)
+        self.assertEqual(1, archived)
+        archived = yield self.store.archive_finished_solicitations(1500, 10)
+        self.assertEqual(1, archived)
+        archived = yield self.store.archive_finished_solicitations(1500, 10)
+        self.assertEqual(0, archived)
+
+        res, _ = yield self.store.get_solicitations(is_order_by_cteep=True)
+        self.assertCountEqual([recent_id, active_id], [s["id"] for s in res])
+        res = yield self.store.get_solicitations_by_ids([executed_id, canceled_id])
+        self.assertEqual([], res)
+
+        res, next_id = yield self.store.get_archived_solicitations()
+        self.assertEqual([canceled_id, executed_id], [s["id"] for s in res])
+        self.assertEqual(
+            [SolicitationStatus.EXECUTED, SolicitationStatus.NEW],
+            [e["status"] for e in res[1]["events"]],
+        )
+        self.assertIsNone(next_id)
+
+        res, next_id = yield self.store.get_archived_solicitations(limit=1)
+        self.assertEqual([canceled_id], [s["id"] for s in res])
+        res, _ = yield self.store.get_archived_solicitations(from_id=next_id, limit=1)
+        self.assertEqual([executed_id], [s["id"] for s in res])
+
+        res, _ = yield self.store.get_archived_solicitations(substation_codes={"MIR"})
+        self.assertEqual([executed_id], [s["id"] for s in res])
+
+        # The updates of the archived solicitations are still replicated.
+        changes = yield self.store.get_all_solicitation_changes(
+            since, self.store.get_solicitation_stream_token(), 10
+        )
+        self.assertEqual(
+            [
+                (executed_id, "MIR"),
+                (canceled_id, "PIR"),
+                (recent_id, "MIR"),
+                (active_id, "MIR"),
+            ],
+            [(change[1], change[2]) for change in changes],
+        )
+
+    @defer.inlineCallbacks
+    def test_get_solicitation_status_counts(self):
+        first_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        yield create_solicitation(self.store, substation="MIR", ts=1000)
+        yield create_solicitation(self.store, substation="PIR", ts=1000)
+
+        counts = yield self.store.get_solicitation_status_counts()
+        self.assertEqual(
+            {"MIR": {SolicitationStatus.NEW: 2}, "PIR": {SolicitationStatus.NEW: 1}},
+            counts,
+        )
+
+        # Status changes invalidate the counts.
+        yield self.store.change_solicitation_status(
+            first_id,
+            SolicitationStatus.NEW,
+            SolicitationStatus.EXECUTED,
+            self.user_id,
+            1001,
+            None,
+        )
+        counts = yield self.store.get_solicitation_status_counts()
+        self.assertEqual(
+            {SolicitationStatus.NEW: 1, SolicitationStatus.EXECUTED: 1}, counts["MIR"]
+        )
+
+        # Archived solicitations are not counted any more.
+        yield self.store.archive_finished_solicitations(2000, 10)
+        counts = yield self.store.get_solicitation_status_counts()
+        self.assertEqual({SolicitationStatus.NEW: 1}, counts["MIR"])
+
+    @defer.inlineCallbacks
+    def test_solicitation_status_counts_are_maintained(self):
+        first_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+        second_id, _ = yield create_solicitation(self.store, substation="MIR", ts=1000)
+
+        # The current status of the second solicitation hasn't been backfilled
+        # yet when it gets a new signature.
+        yield self.store._simple_update(
+            table="voltage_control_solicitation",
+            keyvalues={"id": second_id},
+            updatevalues={"current_status": None, "current_status_ts": None},
+            desc="test",
+        )
+        yield self.store.create_solicitation_status_signature(
+            second_id, self.user_id, SolicitationStatus.ACCEPTED, 1001, None
+        )
+        yield self.store.create_solicitation_status_signature(
+            first_id, self.user_id, SolicitationStatus.ACCEPTED, 1001, None
+        )
+        yield self.store.mark_solicitations_late([first_id], 2000)
+
+        yield create_solicitation(self.store, substation="PIR", ts=2000)
+
+        counts = yield self.store.get_solicitation_status_counts()
+        self.assertEqual(
+            {
+                "MIR": {SolicitationStatus.ACCEPTED: 1, SolicitationStatus.LATE: 1},
+                "PIR": {SolicitationStatus.NEW: 1},
+            },
+            counts,
+        )
+
+    @defer.inlineCallbacks
+    def _run_background_updates(self):
+        self.store._all_done = False
+        while not (yield self.store.has_completed_background_updates()):
+            yield self.store.do_next_background_update(100)
+
+        yield self.store.runInteraction(
+            "_check_safe_solicitation_current_status_updated",
+            self.store._check_safe_solicitation_current_status_updated_txn,
+        )
@@ -21,6 +21,7 @@ import mock
 from twisted.internet import defer, reactor
 
 from synapse.api.errors import SynapseError
+from synapse.config.database import CacheExpiry
 from synapse.logging.context import (
     LoggingContext,
     PreserveLoggingContext,
@@ -30,6 +31,7 @@ from synapse.util.caches import descriptors
 from synapse.util.caches.descriptors import cached
 
 from tests import unittest
+from tests.utils import MockClock
 
 logger = logging.getLogger(__name__)
 
@@ -352,6 +354,42 @@ class DescriptorTestCase(unittest.TestCase):
         d = obj.fn(1)
         self.failureResultOf(d, SynapseError)
 
+    @defer.inlineCallbacks
+    def test_cache_expiry(self):
+        """The entries expire as configured for the cache of the function."""
+        clock = MockClock()
+
+        class Cls(object):
+            def __init__(self):
+                self.mock = mock.Mock(return_value="fish")
+                self.hs = mock.Mock()
+                self.hs.get_clock.return_value = clock
+                self.hs.config.cache_expiry = {
+                    "fn": CacheExpiry(ttl=60 * 1000, idle_time=None)
+                }
+                self.hs.config.cache_sweep_interval = 10 * 1000
+
+            @descriptors.cached()
+            def fn(self, arg1):
+                return self.mock(arg1)
+
+        obj = Cls()
+
+        r = yield obj.fn(1)
+        self.assertEqual(r, "fish")
+        clock.advance_time(30)
+        r = yield obj.fn(1)
+        self.assertEqual(r, "fish")
+        obj.mock.assert_called_once_with(1)
+
+        # the sweeper drops the entry once it is older than the TTL
+        clock.advance_time(31)
+        self.assertEqual(len(obj.fn.cache.cache), 0)
+
+        r = yield obj.fn(1)
+        self.assertEqual(r, "fish")
+        self.assertEqual(obj.mock.call_count, 2)
+
 
 class CachedListDescriptorTestCase(unittest.TestCase):
     @defer.inlineCallbacks
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright 2019 New Vector Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import Mock
+
+from synapse.util.caches.shared_event_cache import (
+    TOMBSTONE_LIFETIME_MS,
+    TRIM_INTERVAL_MS,
+    SharedEventCache,
+)
+
+from tests import unittest
+from tests.server import get_clock
+
+
+def _row(event_id, redactions=[]):
+    return {
+        "event_id": event_id,
+        "json": '{"type": "m.room.message"}',
+        "internal_metadata": "{}",
+        "format_version": 1,
+        "rejected_reason": None,
+        "redactions": redactions,
+    }
+
+
+class SharedEventCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.reactor, self.clock = get_clock()
+        self.path = self.mktemp()
+        self.stream_position = 0
+
+    def _make_cache(self, max_entries=100):
+        hs = Mock()
+        hs.get_clock.return_value = self.clock
+        hs.get_reactor.return_value = self.reactor
+        return SharedEventCache(
+            hs,
+            self.path,
+            max_entries,
+            mmap_size=1024 * 1024,
+            stream_position_callback=lambda: self.stream_position,
+        )
+
+    def _get(self, d):
+        self.reactor.advance(0)
+        return self.successResultOf(d)
+
+    def _advance(self, ms):
+        self.reactor.advance(ms / 1000.0)
+        self.reactor.advance(0)
+
+    def test_shared_between_processes(self):
+        cache1 = self._make_cache()
+        cache2 = self._make_cache()
+
+        self._get(cache1.add_rows([_row("$a:test", ["$r:test"]), _row("$b:test")]))
+
+        rows = self._get(cache2.get_rows(["$a:test", "$c:test"]))
+        self.assertEqual(rows, {"$a:test": _row("$a:test", ["$r:test"])})
+
+    def test_invalidate(self):
+        cache1 = self._make_cache()
+        cache2 = self._make_cache()
+
+        self._get(cache1.add_rows([_row("$a:test"), _row("$b:test")]))
+
+        # The events are missing as soon as they are invalidated.
+        cache2.invalidate(("$a:test", "$b:test"))
+        self.assertEqual(self._get(cache2.get_rows(["$a:test"])), {})
+        self.assertEqual(self._get(cache1.get_rows(["$a:test", "$b:test"])), {})
+
+        # a process which read the event before the invalidation can't put it
+        # back...
+        self._get(cache1.add_rows([_row("$a:test")]))
+        self.assertEqual(self._get(cache1.get_rows(["$a:test"])), {})
+
+        # ... until the tombstone expires
+        self._advance(TOMBSTONE_LIFETIME_MS + TRIM_INTERVAL_MS + 1)
+        self._get(cache1.add_rows([_row("$a:test", ["$r:test"])]))
+        self.assertEqual(
+            self._get(cache1.get_rows(["$a:test"])),
+            {"$a:test": _row("$a:test", ["$r:test"])},
+        )
+
+    def test_trim(self):
+        cache = self._make_cache(max_entries=2)
+
+        self._get(
+            cache.add_rows([_row("$a:test"), _row("$b:test"), _row("$c:test")])
+        )
+
+        self._advance(TRIM_INTERVAL_MS + 1)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(
+            set(self._get(cache.get_rows(["$a:test", "$b:test", "$c:test"]))),
+            {"$b:test", "$c:test"},
+        )
+
+    def test_stream_position(self):
+        cache = self._make_cache()
+        self.assertIsNone(cache.get_stream_position())
+
+        # The position is only recorded once it is known...
+        self.stream_position = 5
+        self._advance(TRIM_INTERVAL_MS + 1)
+        self.assertIsNone(cache.get_stream_position())
+
+        cache.catch_up(None, 3)
+        self.assertEqual(cache.get_stream_position(), 3)
+
+        # ... and then as the invalidations are applied.
+        self._advance(TRIM_INTERVAL_MS + 1)
+        self.assertEqual(cache.get_stream_position(), 5)
+
+    def test_catch_up(self):
+        cache = self._make_cache()
+        self._get(cache.add_rows([_row("$a:test"), _row("$b:test")]))
+
+        # The invalidations made while no process had the file open are
+        # replayed...
+        cache = self._make_cache()
+        cache.catch_up(["$a:test"], 7)
+        self.assertEqual(cache.get_stream_position(), 7)
+        self.assertEqual(
+            set(self._get(cache.get_rows(["$a:test", "$b:test"]))), {"$b:test"}
+        )
+        self._get(cache.add_rows([_row("$a:test")]))
+        self.assertEqual(self._get(cache.get_rows(["$a:test"])), {})
+
+        # ... or, if they aren't known, all the rows are dropped.
+        cache.catch_up(None, None)
+        self.assertEqual(self._get(cache.get_rows(["$b:test"])), {})
@@ -14,11 +14,14 @@
 # limitations under the License.
 
 
-from mock import Mock
+from mock import Mock, patch
 
 from synapse.util.caches.lrucache import LruCache
+from synapse.util.caches.memory_budget import CacheMemoryBudget, estimate_size
 from synapse.util.caches.treecache import TreeCache
 
+from tests.utils import MockClock
+
 from .. import unittest
 
 
@@ -232,6 +235,19 @@ class LruCacheCallbacksTestCase(unittest.TestCase):
         self.assertEquals(m2.call_count, 0)
         self.assertEquals(m3.call_count, 1)
 
+    def test_callbacks_allocated_lazily(self):
+        m = Mock()
+        cache = LruCache(2)
+
+        cache.set("key", "value")
+        self.assertIsNone(cache.cache["key"].callbacks)
+
+        cache.get("key", callbacks=[m])
+        self.assertEquals(cache.cache["key"].callbacks, {m})
+
+        cache.pop("key")
+        self.assertEquals(m.call_count, 1)
+
 
 class LruCacheSizedTestCase(unittest.TestCase):
     def test_evict(self):
@@ -255,3 +271,200 @@ class LruCacheSizedTestCase(unittest.TestCase):
         self.assertEquals(cache["key3"], [3])
         self.assertEquals(cache["key4"], [4])
         self.assertEquals(cache["key5"], [5, 6])
+
+
+class LruCacheMemoryBudgetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.budget = CacheMemoryBudget(max_bytes=10 ** 9)
+
+        # What an entry costs besides its value, which is its own size below.
+        cache = self._make_cache("probe")
+        cache["k0"] = 0
+        self.overhead = self.budget.total_bytes
+        cache.clear()
+        self.assertEquals(self.budget.total_bytes, 0)
+
+    def _make_cache(self, name, **kwargs):
+        return LruCache(
+            100,
+            name=name,
+            memory_size_callback=lambda value: value,
+            memory_budget=self.budget,
+            **kwargs
+        )
+
+    def _set_room_for(self, entries, value_size):
+        self.budget.max_bytes = entries * (self.overhead + value_size)
+
+    def test_evicts_across_caches(self):
+        self._set_room_for(3, 1000)
+        evicted = Mock()
+        cache1 = self._make_cache("cache1", evicted_callback=evicted)
+        cache2 = self._make_cache("cache2")
+
+        cache1["k1"] = 1000
+        cache2["k2"] = 1000
+        cache1["k3"] = 1000
+        self.assertEquals(self.budget.total_bytes, self.budget.max_bytes)
+        self.assertEquals(
+            self.budget.bytes_by_name["cache1"], 2 * (self.overhead + 1000)
+        )
+
+        # cache2 makes room by evicting the oldest entry, from cache1.
+        cache2["k4"] = 1000
+        self.assertNotIn("k1", cache1)
+        self.assertIn("k3", cache1)
+        self.assertEquals(len(cache2), 2)
+        evicted.assert_called_once_with(1)
+        self.assertEquals(self.budget.evictions, 1)
+        self.assertEquals(self.budget.bytes_by_name["cache1"], self.overhead + 1000)
+
+    def test_evicts_largest_of_least_recently_used(self):
+        self._set_room_for(2, 1000)
+        cache = self._make_cache("cache")
+
+        cache["k1"] = 10
+        cache["k2"] = 2000
+        cache["k3"] = 10
+
+        self.assertIn("k1", cache)
+        self.assertNotIn("k2", cache)
+        self.assertIn("k3", cache)
+
+    def test_recency(self):
+        self.budget.sample_size = 1
+        self._set_room_for(2, 100)
+        cache = self._make_cache("cache")
+
+        cache["k1"] = 100
+        cache["k2"] = 100
+        cache.get("k1")
+        cache["k3"] = 100
+
+        self.assertIn("k1", cache)
+        self.assertNotIn("k2", cache)
+        self.assertIn("k3", cache)
+
+    def test_invalidation_callbacks(self):
+        self._set_room_for(1, 100)
+        callback = Mock()
+        cache = self._make_cache("cache")
+
+        cache.set("k1", 100, callbacks=[callback])
+        cache.set("k2", 100)
+
+        callback.assert_called_once_with()
+
+    def test_accounting(self):
+        cache = self._make_cache("cache")
+        tree_cache = self._make_cache("tree_cache", keylen=2, cache_type=TreeCache)
+
+        cache["k1"] = 100
+        cache["k1"] = 300
+        self.assertEquals(self.budget.total_bytes, self.overhead + 300)
+        cache.pop("k1")
+        self.assertEquals(self.budget.total_bytes, 0)
+
+        cache["k1"] = 100
+        cache["k2"] = 100
+        cache.clear()
+        self.assertEquals(self.budget.total_bytes, 0)
+
+        tree_cache[("a", "b")] = 100
+        tree_cache[("a", "c")] = 100
+        self.assertTrue(self.budget.total_bytes > 0)
+        tree_cache.del_multi(("a",))
+        self.assertEquals(self.budget.total_bytes, 0)
+        self.assertEquals(self.budget.bytes_by_name["tree_cache"], 0)
+
+    def test_opt_out(self):
+        cache = LruCache(10, memory_budget=self.budget, use_memory_budget=False)
+        cache["k1"] = "v1"
+        self.assertEquals(self.budget.total_bytes, 0)
+
+    def test_estimate_size(self):
+        small = {"content": {"body": "x"}}
+        large = {"content": {"body": "x" * 10000}}
+        self.assertTrue(estimate_size(large) > estimate_size(small) + 9000)
+
+        recursive = {}
+        recursive["self"] = recursive
+        self.assertTrue(estimate_size(recursive) > 0)
+
+
+class LruCacheExpiryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = MockClock()
+
+    def test_expiry(self):
+        cache = LruCache(10, clock=self.clock, expiry_ms=10 * 1000)
+        cache["key"] = "value"
+
+        self.clock.advance_time(5)
+        self.assertEquals(cache.get("key"), "value")
+
+        # reading it doesn't keep it any longer
+        self.clock.advance_time(6)
+        self.assertEquals(cache.get("key"), None)
+        self.assertNotIn("key", cache)
+        self.assertEquals(len(cache), 0)
+
+        # but setting it again does
+        cache["key"] = "value"
+        self.clock.advance_time(6)
+        cache["key"] = "value2"
+        self.clock.advance_time(6)
+        self.assertEquals(cache.get("key"), "value2")
+
+    def test_idle_expiry(self):
+        cache = LruCache(10, clock=self.clock, idle_expiry_ms=10 * 1000)
+        cache["key"] = "value"
+
+        self.clock.advance_time(6)
+        self.assertEquals(cache.get("key"), "value")
+        self.clock.advance_time(6)
+        self.assertEquals(cache.get("key"), "value")
+
+        self.clock.advance_time(11)
+        self.assertNotIn("key", cache)
+        self.assertEquals(cache.pop("key"), None)
+
+    def test_sweep(self):
+        evicted = Mock()
+        callback = Mock()
+        cache = LruCache(
+            10,
+            clock=self.clock,
+            idle_expiry_ms=10 * 1000,
+            sweep_interval_ms=1000,
+            evicted_callback=evicted,
+        )
+        cache.set("key1", "value1", callbacks=[callback])
+        self.clock.advance_time(5)
+        cache["key2"] = "value2"
+
+        # the sweeps drop the idle entries without them being read
+        self.clock.advance_time(6)
+        self.assertEquals(len(cache), 1)
+        callback.assert_called_once_with()
+        evicted.assert_called_once_with(1)
+
+        self.clock.advance_time(6)
+        self.assertEquals(len(cache), 0)
+
+    @patch("synapse.util.caches.lrucache.SWEEP_BATCH_SIZE", 2)
+    def test_sweep_in_batches(self):
+        cache = LruCache(
+            10, clock=self.clock, expiry_ms=10 * 1000, sweep_interval_ms=1000
+        )
+        for i in range(5):
+            cache[i] = i
+
+        # with a TTL, the entries are not ordered by expiry, so each sweep
+        # carries on from where the previous one stopped
+        self.clock.advance_time(10.5)
+        self.assertEquals(len(cache), 3)
+        self.clock.advance_time(1.5)
+        self.assertEquals(len(cache), 1)
+        self.clock.advance_time(1.5)
+        self.assertEquals(len(cache), 0)
@@ -83,3 +83,13 @@ class TreeCacheTestCase(unittest.TestCase):
         cache[("a",)] = "A"
         self.assertTrue(("a",) in cache)
         self.assertFalse(("b",) in cache)
+
+    def test_dict_values(self):
+        cache = TreeCache()
+        cache[("a", "a")] = {"x": 1}
+        cache[("a", "b")] = "AB"
+        self.assertEquals(cache.get(("a", "a")), {"x": 1})
+        self.assertEquals(sorted(cache.values(), key=str), ["AB", {"x": 1}])
+        popped = cache.pop(("a",))
+        self.assertEquals(popped, {"a": {"x": 1}, "b": "AB"})
+        self.assertEquals(len(cache), 0)
@@ -27,7 +27,7 @@ from six.moves.urllib import parse as urlparse
 
 from twisted.internet import defer, reactor
 
-from synapse.api.constants import EventTypes
+from synapse.api.constants import EventTypes, SolicitationStatus
 from synapse.api.errors import CodeMessageException, cs_error
 from synapse.api.room_versions import RoomVersions
 from synapse.config.homeserver import HomeServerConfig
@@ -673,3 +673,42 @@ def create_room(hs, room_id, creator_id):
     event, context = yield event_creation_handler.create_new_client_event(builder)
 
     yield store.persist_event(event, context)
+
+
+@defer.inlineCallbacks
+def create_solicitation(
+    store, substation="MIR", user_id="@ons:test", ts=1000, status=SolicitationStatus.NEW
+):
+    """Creates a solicitation in a group of its own, along with its creation
+    update, as the voltage control handler does.
+
+    Args:
+        store (DataStore): the master's datastore
+        substation (str)
+        user_id (str): the creator of the solicitation
+        ts (int): the creation time, in seconds
+        status (str): the initial status of the solicitation
+
+    Returns:
+        Deferred[tuple[int, int]]: the id of the solicitation, and the stream
+        id of its creation update.
+    """
+    ids, token = yield store.create_solicitation_group_with_solicitations(
+        "10",
+        [
+            {
+                "action": "TURN_ON",
+                "equipment": "REACTOR",
+                "substation": substation,
+                "staggered": False,
+                "amount": "1",
+                "voltage": None,
+                "at": None,
+                "bt": None,
+            }
+        ],
+        user_id,
+        ts,
+        status,
+    )
+    return ids[0], token